@@ -0,0 +1,161 @@
+import os
+import time
+import socket
+import numpy as np
+import pandas as pd
+from data_pipeline import create_sequences
+from knowledge_store import get_store
+from model_registry import predict_windows
+from model_store import get_model_store
+from compiled import compile_checked
+
+try:
+    import pyRAPL
+    pyRAPL.setup()
+    from energy import EnergyAccountant
+except Exception:
+    pyRAPL = None
+
+# ---------------- Calibration ----------------
+# Measures the latency and energy per prediction of a model on this machine.
+# `tools/calibrate.py` builds the whole profile; `recalibrate` re-measures the
+# models a publish just replaced, in the publishing process (retrain worker).
+
+BATCH_SIZES = [1, 16, 256]
+RECALIBRATE_CALLS = 200
+default_input = "data/pems/flow_data_test.csv"
+
+def load_windows(path=default_input, rows=5000):
+    """Raw (flow-unit) windows to predict on: the test stream, or a synthetic daily pattern if it is missing."""
+    if os.path.exists(path):
+        data = pd.read_csv(path, nrows=rows)["flow"].values
+    else:
+        rng = np.random.default_rng(0)
+        t = np.arange(rows)
+        data = 300 + 200 * np.sin(2 * np.pi * t / 288) + rng.normal(0, 20, rows)
+    X, _ = create_sequences(data, 5)
+    return X
+
+def measure(model_name, model, scaler, windows, batch_size, calls):
+    """Latency percentiles per call and energy per prediction at one batch size."""
+    batches = [windows[(i * batch_size) % (len(windows) - batch_size):][:batch_size] for i in range(calls)]
+    predict_windows(model_name, model, scaler, batches[0])  # Warm-up
+
+    latencies = np.empty(calls)
+    meter = pyRAPL.Measurement("calibrate") if pyRAPL else None
+    if meter:
+        meter.begin()
+    start_time = time.perf_counter()
+    for i, batch in enumerate(batches):
+        t0 = time.perf_counter()
+        predict_windows(model_name, model, scaler, batch)
+        latencies[i] = time.perf_counter() - t0
+    total_time = time.perf_counter() - start_time
+    if meter:
+        meter.end()
+
+    predictions = calls * batch_size
+    return {
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "per_prediction_ms": total_time / predictions * 1000,
+        "energy_uJ": meter.result.pkg[0] / predictions if meter else None
+    }
+
+def serving_predictor(model_name, model, scaler):
+    """The single-window predictor `inference.py` serves with: compiled if it matches, else sklearn/torch."""
+    reference = lambda windows: predict_windows(model_name, model, scaler, windows)
+    predictor = compile_checked(model_name, model, scaler, reference)
+    return predictor or (lambda window: reference(np.reshape(window, (1, -1)))[0])
+
+def measure_serving(model_name, model, scaler, windows, calls):
+    """Latency percentiles and energy per prediction of single-window serving, accounted as `inference.py` does.
+
+    Each window goes through the serving predictor between the
+    `EnergyAccountant` begin/end calls, so the energy is the busy time of
+    each prediction at the metered package power, the figure `predictions.csv`
+    holds for served rows and `within_budget` compares against.
+    """
+    predictor = serving_predictor(model_name, model, scaler)
+    predictor(windows[0])  # Warm-up
+    accountant = EnergyAccountant() if pyRAPL else None
+
+    latencies = np.empty(calls)
+    energies = []
+    for i in range(calls):
+        window = windows[i % len(windows)]
+        if accountant:
+            accountant.begin()
+        t0 = time.perf_counter()
+        predictor(window)
+        latencies[i] = time.perf_counter() - t0
+        if accountant:
+            energies.extend(row[-1] for row in accountant.end([]))
+    if accountant:
+        energies.extend(row[-1] for row in accountant.flush())
+
+    return {
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "energy_uJ": float(np.mean(energies)) if energies else None
+    }
+
+def calibrate(model_name, model, scaler, windows, batch_sizes, calls):
+    by_batch = {str(b): measure(model_name, model, scaler, windows, b, calls) for b in batch_sizes}
+    # Streaming inference predicts one window at a time, so the serving figures drive planning
+    single = measure_serving(model_name, model, scaler, windows, calls)
+    return {"latency_ms": {k: single[k] for k in ("p50_ms", "p95_ms", "p99_ms")},
+            "energy_uJ": single["energy_uJ"], "batches": by_batch}
+
+def new_profile(batch_sizes):
+    return {"created": time.time(), "host": socket.gethostname(), "batch_sizes": batch_sizes,
+            "energy_measured": pyRAPL is not None, "models": {}, "versions": {}}
+
+def recalibrate(models, batch_sizes=(1,), calls=RECALIBRATE_CALLS, windows=None):
+    """Re-measures freshly published versions and updates their entries in the profile.
+
+    `models` maps a family to (version key, model, scaler) as already held in
+    memory by the publisher, so nothing is reloaded. Entries are keyed by
+    version; other families keep their figures. A family whose measurement
+    fails loses its entry, so planning never uses the replaced version's
+    figures. Returns the families that were measured.
+    """
+    windows = load_windows() if windows is None else windows
+    results, failed = {}, []
+    for model_name, (key, model, scaler) in models.items():
+        try:
+            results[model_name] = dict(calibrate(model_name, model, scaler, windows, list(batch_sizes), calls),
+                                       version=key)
+            print(f"🔬 {key:<20} p50 {results[model_name]['latency_ms']['p50_ms']:.3f} ms")
+        except Exception as e:
+            print(f"❌ Calibration of {key} failed: {e}. Dropping {model_name} from the profile.")
+            failed.append(model_name)
+
+    with get_store().transaction() as kb:
+        profile = kb.get("profile") or new_profile(list(batch_sizes))
+        for model_name, result in results.items():
+            profile["models"][model_name] = result
+            profile.setdefault("versions", {})[result["version"]] = result
+        for model_name in failed:
+            profile["models"].pop(model_name, None)
+        kb["profile"] = profile
+    return list(results)
+
+def recalibrate_published(model_names, batch_sizes=(1,), calls=RECALIBRATE_CALLS, windows=None):
+    """`recalibrate` for the versions of `model_names` currently published in the model store (loaded once here)."""
+    store = get_model_store()
+    versions = store.load_manifest()["versions"]
+    models = {}
+    for model_name in model_names:
+        key = store.current(model_name)
+        if key not in versions:
+            print(f"⚠️ No published {model_name} version in the model store, skipping it.")
+            continue
+        model, scaler = store.load_version(versions[key])
+        if scaler is None:
+            print(f"⚠️ {key} has no scaler, skipping it.")
+            continue
+        models[model_name] = (key, model, scaler)
+    return recalibrate(models, batch_sizes, calls, windows)
@@ -0,0 +1,72 @@
+import numpy as np
+
+CASCADE = "cascade"
+
+# Escalation thresholds, relative to the window's mean flow; None disables a signal.
+# Overridden by the "cascade" entry in thresholds.json.
+DEFAULT_CASCADE = {
+    "residual": 0.1,        # Recent relative error of the linear stage (EMA)
+    "volatility": 0.15,     # Standard deviation of the window's step changes
+    "disagreement": None,   # |linear - svm| (costs an SVR prediction per sample)
+    "residual_gamma": 0.3   # EMA weight of the newest residual
+}
+
+def stage_label(stage):
+    """`model_used` value for a sample answered by `stage`, e.g. "cascade:linear"."""
+    return f"{CASCADE}:{stage}"
+
+def model_unit(model_used):
+    """Model (or cascade) a `model_used` value is scored as: "cascade:lstm" → "cascade"."""
+    return model_used.split(":", 1)[0]
+
+class Cascade:
+    """Answers every sample with the Ridge model and escalates to the LSTM only when needed.
+
+    Escalation happens when any enabled confidence signal exceeds its
+    threshold:
+    - residual: EMA of the linear stage's recent relative error, updated by
+      `observe()` once the true value is known
+    - volatility: spread of the step changes inside the input window
+    - disagreement: gap between the linear and SVR predictions
+    Signals are relative to the window's mean flow, so one set of thresholds
+    works across stations and times of day.
+    """
+
+    def __init__(self, config=None):
+        self.config = dict(DEFAULT_CASCADE, **(config or {}))
+        self.residual = 0.0
+        self.pending = None  # (linear prediction, level) awaiting its true value
+        self.samples = 0
+        self.escalations = 0
+
+    def signals(self, window, linear_prediction, predict):
+        level = max(abs(float(np.mean(window))), 1e-6)
+        signals = {"residual": self.residual, "volatility": float(np.std(np.diff(window))) / level}
+        if self.config["disagreement"] is not None:
+            signals["disagreement"] = abs(linear_prediction - predict("svm", window)) / level
+        return signals, level
+
+    def predict(self, window, predict):
+        """Predicts one raw window; `predict(stage, window)` runs a stage. Returns (stage label, prediction)."""
+        linear_prediction = predict("linear", window)
+        signals, level = self.signals(window, linear_prediction, predict)
+        self.pending = (linear_prediction, level)
+        self.samples += 1
+
+        if any(self.config.get(name) is not None and value > self.config[name] for name, value in signals.items()):
+            self.escalations += 1
+            return stage_label("lstm"), predict("lstm", window)
+        return stage_label("linear"), linear_prediction
+
+    def observe(self, true_value):
+        """Updates the residual signal with the true value of the last prediction."""
+        if self.pending is None:
+            return
+        linear_prediction, level = self.pending
+        gamma = self.config["residual_gamma"]
+        self.residual = gamma * abs(true_value - linear_prediction) / level + (1 - gamma) * self.residual
+        self.pending = None
+
+    def stats(self):
+        return {"samples": self.samples, "escalations": self.escalations,
+                "escalation_rate": self.escalations / self.samples if self.samples else None}
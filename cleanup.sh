@@ -1,7 +1,8 @@
 #!/bin/bash
-# Remove all files inside models/ and in subdirectories of versionedMR/
+# Remove all files inside models/ and the versioned model store (blobs, manifest, current pointer)
 rm -rf models/*
-rm -rf versionedMR/*/*
+rm -rf versionedMR/*
+rm -f versionedMR/.lock
 
 # Keep only the first line of knowledge/predictions.csv
 sed -i '2,$d' knowledge/predictions.csv
@@ -10,12 +11,14 @@ sed -i '2,$d' knowledge/predictions.csv
 cat > knowledge/mape_info.json <<EOF
 {
     "last_line": 0,
+    "last_offset": 0,
     "current_energy_threshold": 1,
     "linear_version": 1,
     "lstm_version": 1,
     "svm_version": 1,
     "ema_scores": {
         "lstm": 0.82,
+        "lstm-q": 0.8,
         "linear": 0.75,
         "svm": 0.79
     },
@@ -31,13 +34,50 @@ cat > knowledge/thresholds.json <<EOF
 {
     "min_score": 0.78,
     "max_energy": 1,
+    "latency_budget_ms": null,
     "beta": 0.95,
     "gamma": 0.8,
     "alpha": 0.1,
     "E_m": 0,
-    "E_M": 25000
+    "E_M": 25000,
+    "version_search": "model",
+    "retrain_mode": "full",
+    "drift_retrain": "current",
+    "retrain_pool": {
+        "workers": null,
+        "threads": 1,
+        "variants": false
+    },
+    "retention": {
+        "keep_per_model": 10,
+        "keep_candidates": 10,
+        "max_age_days": null
+    },
+    "shadow": {
+        "sample_rate": 0.2,
+        "batch_size": 64,
+        "cpu_budget": 0.1
+    },
+    "cascade": {
+        "residual": 0.1,
+        "volatility": 0.15,
+        "disagreement": null,
+        "residual_gamma": 0.3
+    }
 }
 EOF
 
+# Drop the knowledge store; it is re-seeded from the files above on next start
+rm -f knowledge/knowledge.db knowledge/knowledge.db-wal knowledge/knowledge.db-shm
+
 # Empty the file mape_log.csv
 > knowledge/mape_log.csv
+
+# Drop the trigger latency log
+rm -f knowledge/trigger_log.csv
+
+# Drop the multi-station predictions and per-station knowledge
+rm -f knowledge/station_predictions.csv knowledge/streams.json
+
+# Drop the shadow scoring log
+rm -f knowledge/shadow_log.csv
@@ -0,0 +1,112 @@
+import numpy as np
+from scipy.special import expit
+
+# Largest allowed gap between a compiled and a reference prediction, as a fraction of the scaler's range
+EQUIVALENCE_TOLERANCE = 1e-4
+
+def affine_scaler(scaler):
+    """(a, c) with scaler.transform(x) == a * x + c for a single-feature affine scaler (MinMax, Standard)."""
+    probe = scaler.transform(np.array([[0.0], [1.0]])).flatten()
+    return float(probe[1] - probe[0]), float(probe[0])
+
+class LinearPredictor:
+    """Ridge / linear-kernel SVR folded with its scaler into one dot product in flow units.
+
+    With x_s = a * x + c, the model's w · x_s + b, and the inverse scaling
+    (y_s - c) / a, the whole pipeline is w · x + (b + (sum(w) - 1) * c) / a.
+    """
+
+    def __init__(self, model, scaler):
+        a, c = affine_scaler(scaler)
+        self.weights = np.asarray(model.coef_, dtype=np.float64).ravel()
+        intercept = float(np.ravel(model.intercept_)[0])
+        self.bias = (intercept + (self.weights.sum() - 1) * c) / a
+
+    def __call__(self, window):
+        return float(np.dot(self.weights, window)) + self.bias
+
+class LSTMPredictor:
+    """The single-layer LSTM as a NumPy cell loop, with preallocated buffers and inline scaling.
+
+    Avoids per-sample tensor creation and the torch dispatcher; weights are
+    `dtype` copies of the trained float32 parameters (PyTorch gate order
+    i, f, g, o). "lstm-q" holds dequantized weights and runs the same float64
+    cell as "lstm".
+    """
+
+    def __init__(self, model, scaler, dtype=np.float64):
+        self.a, self.c = affine_scaler(scaler)
+        lstm, fc = model.lstm, model.fc
+        self.hidden = lstm.hidden_size
+        self.w_ih = lstm.weight_ih_l0.detach().double().numpy()[:, 0].astype(dtype)
+        self.w_hh = lstm.weight_hh_l0.detach().double().numpy().astype(dtype)
+        self.bias = (lstm.bias_ih_l0 + lstm.bias_hh_l0).detach().double().numpy().astype(dtype)
+        self.fc_w = fc.weight.detach().double().numpy()[0].astype(dtype)
+        self.fc_b = float(fc.bias.detach().double().numpy()[0])
+
+        n = self.hidden
+        self.gates = np.empty(4 * n, dtype=dtype)
+        self.step_input = np.empty(4 * n, dtype=dtype)
+        self.h = np.empty(n, dtype=dtype)
+        self.cell = np.empty(n, dtype=dtype)
+        self.scratch = np.empty(n, dtype=dtype)
+        self.i, self.f, self.g, self.o = (self.gates[k * n:(k + 1) * n] for k in range(4))
+
+    def __call__(self, window):
+        h, cell, gates = self.h, self.cell, self.gates
+        h.fill(0.0)
+        cell.fill(0.0)
+        for x in window:
+            np.dot(self.w_hh, h, out=gates)
+            np.multiply(self.w_ih, self.a * x + self.c, out=self.step_input)
+            gates += self.step_input
+            gates += self.bias
+            expit(self.i, out=self.i)
+            expit(self.f, out=self.f)
+            np.tanh(self.g, out=self.g)
+            expit(self.o, out=self.o)
+            cell *= self.f
+            np.multiply(self.i, self.g, out=self.scratch)
+            cell += self.scratch
+            np.tanh(cell, out=h)
+            h *= self.o
+        return (float(np.dot(self.fc_w, h)) + self.fc_b - self.c) / self.a
+
+def compile_predictor(model_name, model, scaler):
+    """Compiled single-window predictor for a model family, or None if the model cannot be compiled."""
+    try:
+        if model_name in ("lstm", "lstm-q"):
+            if model.lstm.num_layers != 1 or model.lstm.bidirectional:
+                return None
+            return LSTMPredictor(model, scaler)
+        if getattr(model, "kernel", "linear") != "linear" or not hasattr(model, "coef_"):
+            return None
+        return LinearPredictor(model, scaler)
+    except (AttributeError, ValueError, IndexError):
+        return None
+
+def probe_windows(scaler, n=64, seq_length=5, seed=0):
+    """Raw windows spread over the scaler's fitted range, for equivalence checks."""
+    scaled = np.random.default_rng(seed).uniform(-0.1, 1.1, (n * seq_length, 1))
+    return scaler.inverse_transform(scaled).reshape(n, seq_length)
+
+def max_deviation(predictor, reference, scaler, windows):
+    """Largest |compiled - reference| over `windows`, relative to the scaler's range.
+
+    `reference(windows)` returns the sklearn/torch predictions (`model_registry.predict_windows`).
+    """
+    reference = reference(windows)
+    compiled = np.array([predictor(window) for window in windows])
+    span = abs(scaler.inverse_transform([[1.0]])[0, 0] - scaler.inverse_transform([[0.0]])[0, 0]) or 1.0
+    return float(np.max(np.abs(compiled - reference)) / span)
+
+def compile_checked(model_name, model, scaler, reference, tolerance=EQUIVALENCE_TOLERANCE):
+    """Compiles a predictor and keeps it only if it matches `reference` within `tolerance`."""
+    predictor = compile_predictor(model_name, model, scaler)
+    if predictor is None:
+        return None
+    deviation = max_deviation(predictor, reference, scaler, probe_windows(scaler))
+    if deviation > tolerance:
+        print(f"⚠️ Compiled {model_name} deviates by {deviation:.2e} of the range; using the reference path.")
+        return None
+    return predictor
@@ -0,0 +1,32 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+def create_sequences(data, seq_length=5):
+    """Creates time series sequences as zero-copy strided views.
+
+    `X[i]` is `data[i:i+seq_length]` and `y[i]` is `data[i+seq_length]`. Both are
+    read-only views into `data`, so no value is copied `seq_length` times.
+    """
+    data = np.asarray(data)
+    if len(data) <= seq_length:
+        return np.empty((0, seq_length), dtype=data.dtype), np.empty(0, dtype=data.dtype)
+    X = sliding_window_view(data[:-1], seq_length)
+    y = data[seq_length:]
+    return X, y
+
+def iter_sequences(chunks, seq_length=5):
+    """Yields (X, y) windows chunk by chunk from an iterator of 1-D arrays.
+
+    The last `seq_length` values of each chunk are carried over, so windows that
+    straddle chunk boundaries are produced exactly once and memory stays bounded
+    by the chunk size.
+    """
+    carry = None
+    for chunk in chunks:
+        chunk = np.asarray(chunk).ravel()
+        if carry is not None and len(carry):
+            chunk = np.concatenate([carry, chunk])
+        X, y = create_sequences(chunk, seq_length)
+        if len(y):
+            yield X, y
+        carry = chunk[-seq_length:]
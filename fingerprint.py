@@ -0,0 +1,60 @@
+import numpy as np
+
+# Version fingerprints live in the model store manifest (see model_store.py)
+
+FINGERPRINT_BINS = 50
+OUT_OF_RANGE_FRACTION = 0.05  # Re-derive the shared edges above this share of clipped values
+
+# ---------------- Fingerprints ----------------
+
+def derive_edges(low, high, bins=FINGERPRINT_BINS, margin=0.5):
+    """Shared bin edges covering [low, high] plus a margin for future drift."""
+    span = (high - low) or 1.0
+    return np.linspace(low - margin * span, high + margin * span, bins + 1)
+
+def histogram(data, edges):
+    """Probability histogram of `data` on the shared edges (out-of-range values clipped into the end bins)."""
+    data = np.clip(np.asarray(data, dtype=np.float64), edges[0], edges[-1])
+    counts, _ = np.histogram(data, bins=edges)
+    return counts / max(counts.sum(), 1)
+
+def out_of_range_fraction(data, edges):
+    data = np.asarray(data)
+    return float(np.mean((data < edges[0]) | (data > edges[-1]))) if len(data) else 0.0
+
+def fingerprint(data, edges):
+    """Shared-edge histogram plus summary statistics of a version's training data."""
+    data = np.asarray(data, dtype=np.float64)
+    return {
+        "hist": histogram(data, edges).tolist(),
+        "count": int(len(data)),
+        "mean": float(data.mean()),
+        "std": float(data.std()),
+        "min": float(data.min()),
+        "max": float(data.max())
+    }
+
+def kl_divergences(data, hist_matrix, edges):
+    """KL(data || version) against every version at once: one (versions x bins) matrix operation."""
+    p = histogram(data, edges) + 1e-10
+    p /= p.sum()
+    q = np.asarray(hist_matrix, dtype=np.float64) + 1e-10
+    q /= q.sum(axis=1, keepdims=True)
+    return np.sum(p * np.log(p / q), axis=1)
+
+def histograms(data_matrix, edges):
+    """`histogram` of every row of a (rows x values) matrix at once."""
+    data = np.clip(np.asarray(data_matrix, dtype=np.float64), edges[0], edges[-1])
+    n_bins = len(edges) - 1
+    bins = np.clip(np.searchsorted(edges, data, side="right") - 1, 0, n_bins - 1)
+    offsets = (np.arange(len(data)) * n_bins)[:, None]
+    counts = np.bincount((bins + offsets).ravel(), minlength=len(data) * n_bins).reshape(len(data), n_bins)
+    return counts / np.maximum(counts.sum(axis=1, keepdims=True), 1)
+
+def kl_divergence_matrix(data_matrix, hist_matrix, edges):
+    """KL(row || version) of every data row against every version: a (rows x versions) matrix."""
+    p = histograms(data_matrix, edges) + 1e-10
+    p /= p.sum(axis=1, keepdims=True)
+    q = np.asarray(hist_matrix, dtype=np.float64) + 1e-10
+    q /= q.sum(axis=1, keepdims=True)
+    return np.sum(p * np.log(p), axis=1)[:, None] - p @ np.log(q).T
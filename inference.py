@@ -1,129 +1,189 @@
 import os
+import sys
 import time
-import pandas as pd
+import atexit
+import argparse
 import numpy as np
-import torch
-import torch.nn as nn
-import pickle
 import pyRAPL
-from sklearn.preprocessing import MinMaxScaler
+from energy import EnergyAccountant, ENERGY_MODES
+from model_registry import ModelRegistry
+from data_pipeline import iter_sequences
+from prediction_writer import PredictionWriter, DURABILITY_POLICIES, PREDICTION_COLUMNS
+from stream_source import open_source, StationCSVSource, ReplayPacer, SOURCE_KINDS
+from prediction_feed import PredictionFeed
+from stations import StationWindows, StationRouter, STATION_COLUMNS, station_predictions_file
+
+parser = argparse.ArgumentParser(description="Streaming inference for HarmonE.")
+parser.add_argument("--flush_rows", type=int, default=100,
+                    help="Flush buffered predictions every N rows (default: 100).")
+parser.add_argument("--flush_ms", type=float, default=1000,
+                    help="Flush buffered predictions at least every M milliseconds (default: 1000).")
+parser.add_argument("--durability", choices=DURABILITY_POLICIES, default="none",
+                    help="fsync policy for predictions.csv: none, flush (per batch) or row (default: none).")
+parser.add_argument("--source", choices=SOURCE_KINDS, default="csv",
+                    help="Stream source: csv (chunked reader), memmap (.npy/raw binary), socket or pipe (default: csv).")
+parser.add_argument("--input", default=None,
+                    help="CSV/binary path, socket address (host:port or Unix path), or pipe path ('-' for stdin) "
+                         "(default: data/pems/flow_data_test.csv, or data/pems/flow_data_stations_test.csv with --stations).")
+parser.add_argument("--chunksize", type=int, default=10000,
+                    help="Rows read per chunk for csv/memmap sources; with --stations, readings per batch (default: 10000).")
+parser.add_argument("--rate", default="realtime",
+                    help="Replay rate: realtime, <N>x (e.g. 10x) or max (default: realtime).")
+parser.add_argument("--interval", type=float, default=0.15,
+                    help="Seconds per sample at realtime rate (default: 0.15).")
+parser.add_argument("--energy_mode", choices=ENERGY_MODES, default="window",
+                    help="window: RAPL readings around a sample of the predictions, attributed per sample by busy time; "
+                         "sample: begin/end around every prediction (debug) (default: window).")
+parser.add_argument("--energy_rows", type=int, default=100,
+                    help="Close an energy window after N predictions (default: 100).")
+parser.add_argument("--energy_ms", type=float, default=1000,
+                    help="Close an energy window after T milliseconds (default: 1000).")
+parser.add_argument("--energy_every", type=int, default=10,
+                    help="Meter one in N predictions' busy segments in window mode (default: 10).")
+parser.add_argument("--predictors", choices=["compiled", "reference"], default="compiled",
+                    help="compiled: dot-product / NumPy LSTM predictors checked against the models at load time; "
+                         "reference: sklearn/torch predict (default: compiled).")
+parser.add_argument("--embedded", action="store_true",
+                    help="Run the MAPE-K loop inside this process on in-memory predictions (edge deployments).")
+parser.add_argument("--stations", action="store_true",
+                    help="Serve many station streams from a (station, flow) CSV, with a model per station "
+                         "and predictions batched across stations (written to knowledge/station_predictions.csv).")
+args = parser.parse_args()
+if args.input is None:
+    args.input = "data/pems/flow_data_stations_test.csv" if args.stations else "data/pems/flow_data_test.csv"
+if args.stations and args.source != "csv":
+    parser.error("--stations reads a (station, flow) CSV; use --source csv")
 
 # Ensure directories exist
 os.makedirs("knowledge", exist_ok=True)
 os.makedirs("models", exist_ok=True)
 
-# Initialize PyRAPL
+# Initialize PyRAPL (energy is measured per window of predictions and attributed per sample)
 pyRAPL.setup()
-energy_meter = pyRAPL.Measurement("inference")
-
-# ---------------- Load Dataset ----------------
-print("Loading synthetic data stream...")
-
-df = pd.read_csv("data/pems/flow_data_test.csv")
-data = df["flow"].values
-
-# Normalize data
-scaler = MinMaxScaler()
-data_scaled = scaler.fit_transform(data.reshape(-1, 1)).flatten()
-
-# Create rolling window sequences (assuming sequence length of 10)
-def create_sequences(data, seq_length=10):
-    X, y = [], []
-    for i in range(len(data) - seq_length):
-        X.append(data[i:i+seq_length])
-        y.append(data[i+seq_length])
-    return np.array(X), np.array(y)
-
+energy = EnergyAccountant(args.energy_mode, window_rows=args.energy_rows, window_ms=args.energy_ms,
+                          meter_every=args.energy_every)
+
+# ---------------- Open Data Stream ----------------
+# Windows are built chunk by chunk, so memory use does not depend on the stream size.
+# Values stay in flow units; each model scales them with the scaler it was trained with.
+print(f"Opening {args.source} stream: {args.input}")
+
+if args.stations:
+    source = StationCSVSource(args.input, chunksize=args.chunksize)
+else:
+    source = open_source(args.source, args.input, chunksize=args.chunksize)
+pacer = ReplayPacer(args.rate, args.interval)
 seq_length = 5
-X_stream, y_stream = create_sequences(data_scaled, seq_length)
-
-print("Data stream prepared. Streaming inference begins...")
-
-# ---------------- Define LSTM Model ----------------
-class LSTMModel(nn.Module):
-    def __init__(self):
-        super(LSTMModel, self).__init__()
-        self.lstm = nn.LSTM(input_size=1, hidden_size=50, batch_first=True)
-        self.fc = nn.Linear(50, 1)
 
-    def forward(self, x):
-        _, (h_n, _) = self.lstm(x)
-        return self.fc(h_n[-1])
+# ---------------- Load Models ----------------
+# All model families stay resident; the active model and `models/*` are only re-read when they change
+registry = ModelRegistry(listen=args.embedded, compiled=args.predictors == "compiled" and not args.stations)
+print(f"Model registry ready: {registry.stats()}")
+# Station mode: the model per station comes from the "streams" knowledge key (mape/streams.py)
+router = StationRouter(registry) if args.stations else None
+
+# ---------------- Embedded MAPE-K ----------------
+# The management loops run as threads of this process and read predictions from
+# memory; model switches reach the registry without polling. predictions.csv is
+# still written by the buffered writer for audit.
+feed = None
+if args.embedded:
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "mape"))
+    import manage
+    feed = PredictionFeed(STATION_COLUMNS if args.stations else PREDICTION_COLUMNS)
+    approach = manage.get_approach_config()
+    print(f"Embedded MAPE-K loop: {approach}")
+    manage.start(approach, feed)
 
 # ---------------- Inference Loop ----------------
-# Create a CSV to store predictions
-predictions_file = "knowledge/predictions.csv"
-print("hi")
-if not os.path.exists(predictions_file):
-    pd.DataFrame(columns=["true_value", "predicted_value", "model_used", "inference_time", "energy_uJ"]).to_csv(predictions_file, index=False)
-
-for i in range(len(X_stream)):  
-    # ---------------- Check Active Model ----------------
-    try:
-        with open("knowledge/model.csv", "r") as f:
-            chosen_model = f.read().strip().lower()  # Read model name (lstm, linear, svm)
-    except FileNotFoundError:
-        print("Error: knowledge/model.csv not found. Defaulting to LSTM.")
-        chosen_model = "lstm"
-
-    print(f"Inference {i+1}/{len(X_stream)}: Using model → {chosen_model.upper()}")
-
-    # ---------------- Load and Use Model ----------------
-    X_input = X_stream[i].reshape(1, -1)  # Reshape input for non-LSTM models
-
-    # Start PyRAPL energy measurement
-    energy_meter.begin()
-
-    start_time = time.time()
-    
-    if chosen_model == "lstm":
-        lstm_model = LSTMModel()
-        lstm_model.load_state_dict(torch.load("models/lstm.pth", weights_only=False))
-        lstm_model.eval()
-
-        X_tensor = torch.tensor(X_input, dtype=torch.float32).unsqueeze(-1)
-        prediction = lstm_model(X_tensor).detach().numpy().flatten()[0]
-
-    elif chosen_model == "linear":
-        with open("models/linear.pkl", "rb") as f:
-            lr_model = pickle.load(f)
-        prediction = lr_model.predict(X_input)[0]
-
-    elif chosen_model == "svm":
-        with open("models/svm.pkl", "rb") as f:
-            svm_model = pickle.load(f)
-        prediction = svm_model.predict(X_input)[0]
-
-    else:
-        print(f"Unknown model '{chosen_model}'. Defaulting to LSTM.")
-        lstm_model = LSTMModel()
-        lstm_model.load_state_dict(torch.load("models/lstm.pth"))
-        lstm_model.eval()
-
-        X_tensor = torch.tensor(X_input, dtype=torch.float32).unsqueeze(-1)
-        prediction = lstm_model(X_tensor).detach().numpy().flatten()[0]
-
-    inference_time = time.time() - start_time
-
-    # Stop PyRAPL measurement and get energy usage
-    energy_meter.end()
-    energy_usage_uJ = energy_meter.result.pkg[0]  # Energy in microjoules (µJ)
-
-    # ---------------- Store Predictions ----------------
-    true_value = y_stream[i]
-    true_value_actual = scaler.inverse_transform([[true_value]])[0, 0]
-    predicted_value_actual = scaler.inverse_transform([[prediction]])[0, 0]
-
-    # Append results to predictions.csv
-    pd.DataFrame([[true_value_actual, predicted_value_actual, chosen_model, inference_time, energy_usage_uJ]], 
-                 columns=["true_value", "predicted_value", "model_used", "inference_time", "energy_uJ"]).to_csv(
-        predictions_file, mode="a", header=False, index=False
-    )
-
-    print(f"True: {true_value_actual:.2f}, Predicted: {predicted_value_actual:.2f}, Model: {chosen_model.upper()}, "
-          f"Inference Time: {inference_time:.6f} sec, Energy: {energy_usage_uJ} µJ")
-
-    # Simulate real-time streaming delay
-    time.sleep(0.15)
-
-print("\nStreaming inference completed. Predictions saved in knowledge/predictions.csv")
+# Buffered writer for predictions (creates the CSV with its header if needed)
+predictions_file = station_predictions_file if args.stations else "knowledge/predictions.csv"
+writer = PredictionWriter(predictions_file, columns=STATION_COLUMNS if args.stations else PREDICTION_COLUMNS,
+                          flush_rows=args.flush_rows, flush_ms=args.flush_ms, durability=args.durability)
+
+def stream_windows():
+    """Yields (raw window, next true value) pairs from the stream source."""
+    for X_chunk, y_chunk in iter_sequences(source.chunks(), seq_length):
+        yield from zip(X_chunk, y_chunk)
+
+def log_predictions(rows):
+    """Queues completed rows for predictions.csv (and the embedded MAPE-K loop)."""
+    if feed is not None:
+        feed.append(rows)
+    for row in rows:
+        writer.append(row)
+        if args.stations:
+            continue  # Batches are summarized in `serve_stations`
+        true_value_actual, predicted_value_actual, chosen_model, inference_time, energy_usage_uJ = row
+        print(f"True: {true_value_actual:.2f}, Predicted: {predicted_value_actual:.2f}, Model: {chosen_model.upper()}, "
+              f"Inference Time: {inference_time:.6f} sec, Energy: {energy_usage_uJ} µJ")
+
+# On exit (including SIGTERM), release rows of an open energy window before the writer closes
+atexit.register(lambda: log_predictions(energy.flush()))
+
+def serve_stream():
+    """One series: predicts each window with the active model as it arrives."""
+    for i, (window, true_value) in enumerate(stream_windows(), start=1):
+        # ---------------- Check Active Model ----------------
+        registry.refresh()
+        chosen_model = registry.active_name
+
+        print(f"Inference {i}: Using model → {chosen_model.upper()}")
+
+        # Start PyRAPL energy accounting for this prediction
+        energy.begin()
+
+        start_time = time.time()
+
+        chosen_model, predicted_value_actual = registry.predict(window)
+
+        inference_time = time.time() - start_time
+
+        # ---------------- Store Predictions ----------------
+        true_value_actual = float(true_value)
+
+        # Rows are released with their energy (µJ) once their measurement window closes
+        completed = energy.end([true_value_actual, predicted_value_actual, chosen_model, inference_time])
+        log_predictions(completed)
+        registry.observe(true_value_actual)  # Feeds the cascade's residual signal
+
+        # Pace the replay (real time, N× speed or as fast as possible)
+        pacer.wait()
+
+def serve_stations():
+    """Many stations: each batch of readings is windowed per station and predicted in one call per model."""
+    windows = StationWindows(seq_length)
+    for i, (stations, values) in enumerate(source.chunks(), start=1):
+        batch_stations, batch_windows, true_values = windows.push(stations, values)
+        if len(batch_stations) == 0:
+            continue
+
+        energy.begin()
+        start_time = time.time()
+        models_used, predictions = router.predict(batch_stations, batch_windows)
+        # Batched: every row is charged an equal share of the batch's time and energy
+        inference_time = (time.time() - start_time) / len(batch_stations)
+
+        completed = energy.end_batch([[station, float(true_value), float(prediction), model_used, inference_time]
+                                      for station, true_value, prediction, model_used
+                                      in zip(batch_stations, true_values, predictions, models_used)])
+        log_predictions(completed)
+
+        counts = dict(zip(*np.unique(models_used.astype(str), return_counts=True)))
+        print(f"Batch {i}: {len(batch_stations)} predictions for {len(set(batch_stations))} stations "
+              f"({', '.join(f'{m.upper()} {n}' for m, n in counts.items())}), "
+              f"{inference_time * 1e6:.1f} µs per prediction")
+
+        pacer.wait()
+
+print("Streaming inference begins...")
+
+if args.stations:
+    serve_stations()
+else:
+    serve_stream()
+
+log_predictions(energy.flush())
+writer.close()
+print(f"\nStreaming inference completed. Predictions saved in {predictions_file}")
+print(f"Model registry stats: {registry.stats()}")
@@ -0,0 +1,313 @@
+import os
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from contextlib import contextmanager
+import pandas as pd
+
+db_file = "knowledge/knowledge.db"
+
+# Inspection/bootstrap files for each knowledge key
+KNOWLEDGE_FILES = {
+    "model": "knowledge/model.csv",
+    "mape_info": "knowledge/mape_info.json",
+    "thresholds": "knowledge/thresholds.json",
+    "drift": "knowledge/drift.csv",
+    "profile": "knowledge/profile.json",
+    "streams": "knowledge/streams.json"
+}
+
+# ---------------- File Import / Export ----------------
+
+def frame_to_value(df):
+    """Stores a DataFrame (e.g. the drift window) as a JSON-friendly value."""
+    return {"columns": list(df.columns), "rows": json.loads(df.to_json(orient="values"))}
+
+def value_to_frame(value):
+    if not value:
+        return pd.DataFrame()
+    return pd.DataFrame(value["rows"], columns=value["columns"])
+
+def read_knowledge_file(key, path):
+    """Parses one knowledge file into its stored value, or None if it is missing/empty."""
+    if not os.path.exists(path):
+        return None
+    if key == "model":
+        with open(path, "r") as f:
+            return f.read().strip() or None
+    if key == "drift":
+        try:
+            return frame_to_value(pd.read_csv(path))
+        except pd.errors.EmptyDataError:
+            return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+def file_mtime(path):
+    return os.stat(path).st_mtime if os.path.exists(path) else None
+
+def merge_values(current, base, new):
+    """Three-way merge of JSON values: the changes from `base` to `new`, applied on top of `current`.
+
+    Dicts are merged field by field (recursively), so two writers that
+    changed different fields of the same key (e.g. two models' EMA scores in
+    `mape_info`) keep both changes; any other value is replaced.
+    """
+    if not (isinstance(current, dict) and isinstance(base, dict) and isinstance(new, dict)):
+        return new
+    merged = dict(current)
+    for field in base.keys() - new.keys():
+        merged.pop(field, None)
+    for field, value in new.items():
+        if field not in base:
+            merged[field] = value
+        elif value != base[field]:
+            merged[field] = merge_values(current.get(field), base[field], value)
+    return merged
+
+def write_knowledge_file(key, value, path):
+    """Writes one stored value back to its inspection file, atomically."""
+    tmp_file = path + ".tmp"
+    if key == "model":
+        with open(tmp_file, "w") as f:
+            f.write(value)
+    elif key == "drift":
+        value_to_frame(value).to_csv(tmp_file, index=False)
+    else:
+        with open(tmp_file, "w") as f:
+            json.dump(value, f, indent=4)
+    os.replace(tmp_file, path)
+
+# ---------------- Store ----------------
+
+class Knowledge:
+    """One transaction's view of the knowledge base.
+
+    Keys are read lazily inside the transaction, so every read sees the same
+    snapshot. Assigned keys are written back once, when the transaction commits.
+    """
+
+    def __init__(self, conn, writable):
+        self.conn = conn
+        self.writable = writable
+        self.values = {}
+        self.loaded = {}
+
+    def _load(self, key):
+        if key not in self.values:
+            row = self.conn.execute("SELECT value FROM knowledge WHERE key = ?", (key,)).fetchone()
+            self.loaded[key] = row[0] if row else None
+            self.values[key] = json.loads(row[0]) if row else None
+        return self.values[key]
+
+    def __getitem__(self, key):
+        return self._load(key)
+
+    def get(self, key, default=None):
+        value = self._load(key)
+        return default if value is None else value
+
+    def __setitem__(self, key, value):
+        if not self.writable:
+            raise RuntimeError("Knowledge snapshot is read-only; use KnowledgeStore.transaction()")
+        self._load(key)
+        self.values[key] = value
+
+    def changes(self):
+        """Keys whose value differs from what was read (mutated in place or reassigned)."""
+        for key, value in self.values.items():
+            text = json.dumps(value)
+            if text != self.loaded.get(key):
+                yield key, text
+
+    def base(self, key):
+        """The value of `key` as it was read, before any change in this view."""
+        text = self.loaded.get(key)
+        return json.loads(text) if text is not None else None
+
+class KnowledgeStore:
+    """Single SQLite (WAL) backend for model choice, MAPE info, thresholds, drift data, calibration and station state.
+
+    WAL lets any number of readers (inference, monitors, retraining) run next
+    to one writer without torn reads. `cycle()` gives a MAPE cycle one
+    consistent snapshot to compute on and a short write-back of its changes;
+    `transaction()` holds the write lock throughout and is meant for short
+    read-modify-writes; `snapshot()` is the read-only form.
+    The store is seeded from the files in `knowledge/` the first time it is
+    created, re-imports a file whenever it is edited (its mtime moves past
+    the last import or export) and can export them again with `export()`.
+    Callbacks registered with `subscribe()` hear about this process's commits
+    without polling.
+    """
+
+    def __init__(self, path=db_file, files=KNOWLEDGE_FILES, file_check_interval=1.0):
+        self.path = path
+        self.files = files
+        self.file_check_interval = file_check_interval
+        self.last_file_check = 0.0
+        self.local = threading.local()
+        self.listeners = []
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS knowledge (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        tracked = conn.execute("SELECT name FROM sqlite_master WHERE name = 'files'").fetchone() is not None
+        conn.execute("CREATE TABLE IF NOT EXISTS files (key TEXT PRIMARY KEY, mtime REAL)")
+        if conn.execute("SELECT COUNT(*) FROM knowledge").fetchone()[0] == 0:
+            self.import_files()
+        elif not tracked:
+            # A store from before file tracking: its current state wins over the files once
+            self._record_mtimes(conn, self.files)
+
+    def _conn(self):
+        """One connection per thread (sqlite3 connections must not be shared across threads)."""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def _record_mtimes(self, conn, keys):
+        for key in keys:
+            conn.execute("INSERT OR REPLACE INTO files (key, mtime) VALUES (?, ?)",
+                         (key, file_mtime(self.files[key])))
+
+    def check_files(self, force=False):
+        """Re-imports knowledge files edited since their last import/export; at most once per `file_check_interval`."""
+        now = time.monotonic()
+        if not force and now - self.last_file_check < self.file_check_interval:
+            return []
+        self.last_file_check = now
+        recorded = dict(self._conn().execute("SELECT key, mtime FROM files").fetchall())
+        edited = [key for key, path in self.files.items()
+                  if file_mtime(path) is not None and file_mtime(path) != recorded.get(key)]
+        if edited:
+            self.import_files(edited)
+            print(f"🔁 Knowledge: re-imported edited {', '.join(self.files[key] for key in edited)}")
+        return edited
+
+    @contextmanager
+    def transaction(self):
+        """Read-modify-write transaction; changed keys are committed atomically on exit."""
+        self.check_files()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        kb = Knowledge(conn, writable=True)
+        try:
+            yield kb
+            changes = list(kb.changes())
+            for key, text in changes:
+                conn.execute("INSERT OR REPLACE INTO knowledge (key, value) VALUES (?, ?)", (key, text))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if changes:
+            for listener in self.listeners:
+                listener([key for key, _ in changes])
+
+    @contextmanager
+    def cycle(self):
+        """Computes on a consistent snapshot, then commits the changes in a short write transaction.
+
+        Unlike `transaction()`, the write lock is only held for the write-back,
+        so slow work in the cycle (log reads, version searches) does not queue
+        the other writers. Changes are merged into the values current at
+        commit time with `merge_values`, so concurrent changes to other fields
+        are kept.
+        """
+        with self.snapshot() as view:
+            kb = Knowledge(view.conn, writable=True)
+            yield kb
+        changes = [key for key, _ in kb.changes()]
+        if changes:
+            with self.transaction() as current:
+                for key in changes:
+                    current[key] = merge_values(current[key], kb.base(key), kb.values[key])
+
+    @contextmanager
+    def snapshot(self):
+        """Read-only, consistent view across several keys."""
+        self.check_files()
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            yield Knowledge(conn, writable=False)
+        finally:
+            conn.execute("COMMIT")
+
+    def get(self, key, default=None):
+        with self.snapshot() as kb:
+            return kb.get(key, default)
+
+    def set(self, key, value):
+        with self.transaction() as kb:
+            kb[key] = value
+
+    def subscribe(self, listener):
+        """Calls `listener(keys)` in the committing thread after each commit in this process that changed keys."""
+        self.listeners.append(listener)
+
+    def data_version(self):
+        """Changes whenever anyone commits; a cheap change check for pollers.
+
+        `PRAGMA data_version` only moves on commits from other connections, so
+        this thread's own changes (`total_changes`) are included as well.
+        """
+        conn = self._conn()
+        return conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes
+
+    def import_files(self, keys=None):
+        """Loads knowledge files into the store (all keys by default)."""
+        keys = keys or list(self.files)
+        self.last_file_check = time.monotonic()  # No nested check from the transaction below
+        with self.transaction() as kb:
+            for key in keys:
+                value = read_knowledge_file(key, self.files[key])
+                if value is not None:
+                    kb[key] = value
+            self._record_mtimes(kb.conn, keys)
+
+    def export(self, keys=None):
+        """Writes the stored values back to the knowledge files for inspection."""
+        keys = keys or list(self.files)
+        with self.snapshot() as kb:
+            values = {key: kb[key] for key in keys}
+        for key, value in values.items():
+            if value is not None:
+                write_knowledge_file(key, value, self.files[key])
+        # Exported files match the store, so they are not re-imported
+        with self.transaction() as kb:
+            self._record_mtimes(kb.conn, keys)
+
+stores = {}
+
+def get_store(path=db_file):
+    """Process-wide store instance for `path` (a forked child gets its own connections)."""
+    key = (path, os.getpid())
+    if key not in stores:
+        stores[key] = KnowledgeStore(path)
+    return stores[key]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import or export the HarmonE knowledge store.")
+    parser.add_argument("action", choices=["import", "export"],
+                        help="import: load knowledge files into the store; export: write the store back to the files.")
+    parser.add_argument("keys", nargs="*",
+                        help=f"Keys to import/export (default: all of {', '.join(KNOWLEDGE_FILES)}).")
+    args = parser.parse_args()
+    unknown = [key for key in args.keys if key not in KNOWLEDGE_FILES]
+    if unknown:
+        parser.error(f"unknown key(s): {', '.join(unknown)}")
+
+    store = get_store()
+    if args.action == "import":
+        store.import_files(args.keys)
+        print(f"✔ Imported {', '.join(args.keys or KNOWLEDGE_FILES)} into {db_file}")
+    else:
+        store.export(args.keys)
+        print(f"✔ Exported {', '.join(args.keys or KNOWLEDGE_FILES)} from {db_file}")
@@ -1,44 +1,28 @@
-import os
 import json
 import numpy as np
-import pandas as pd
-from scipy.stats import entropy
-from monitor import monitor_mape, monitor_drift
+from model_store import get_model_store
+from knowledge_store import value_to_frame
+from monitor import monitor_mape, monitor_drift, export_drift_window
 
-thresholds_file = "knowledge/thresholds.json"
-mape_info_file = "knowledge/mape_info.json"
-
-base_version_dir = "versionedMR"
-current_model_file = "knowledge/model.csv"
 drift_kl_file = "knowledge/drift_kl.json"
-drift_data_file = "knowledge/drift.csv"
-
-def load_mape_info():
-    """Load stored MAPE info including energy debt and recovery cycles."""
-    with open(mape_info_file, "r") as f:
-        return json.load(f)
-
-def save_mape_info(data):
-    """Save updated MAPE info including energy debt and recovery cycles."""
-    with open(mape_info_file, "w") as f:
-        json.dump(data, f, indent=4)
+KL_THRESHOLD = 0.75  #? Threshold for drift detection
 
-def analyse_mape():
+def analyse_mape(kb):
     """Analyze performance and decide if switching is needed, using dynamic energy thresholds."""
-    mape_data = monitor_mape()
+    mape_data = monitor_mape(kb)
     if not mape_data:
         print("⚠️ No MAPE data available for analysis.")
         return None
 
     # Load thresholds
-    with open(thresholds_file, "r") as f:
-        thresholds = json.load(f)
+    thresholds = kb["thresholds"]
 
     min_score = thresholds["min_score"]
     original_energy_threshold = thresholds["max_energy"]
+    latency_budget = thresholds.get("latency_budget_ms")  # None disables the latency check
 
     # Load current MAPE info
-    mape_info = load_mape_info()
+    mape_info = kb["mape_info"]
     current_energy_threshold = mape_info.get("current_energy_threshold", original_energy_threshold)
     recovery_cycles = mape_info["recovery_cycles"]
 
@@ -51,7 +35,14 @@ def analyse_mape():
     switch_needed = False
     threshold_violated = None
 
-    if recovery_cycles > 0:
+    # Tail latency is a hard constraint: checked even in recovery, and it takes precedence over the other violations
+    latency_p99 = mape_data["latency_p99_ms"]
+    if latency_budget is not None and latency_p99 is not None and latency_p99 > latency_budget:
+        print(f"⚠️ Latency budget exceeded! p99: {latency_p99:.3f} ms, Budget: {latency_budget} ms")
+        switch_needed = True
+        threshold_violated = "latency"
+        recovery_cycles = max(recovery_cycles - 1, 0)  # Recovery keeps counting down, it just cannot block this switch
+    elif recovery_cycles > 0:
         recovery_cycles -= 1
         print(f"⏳ Recovery mode active: {recovery_cycles} cycles remaining. No switching allowed.")
     else:
@@ -64,73 +55,45 @@ def analyse_mape():
             print(f"⚠️ Energy threshold exceeded! Used: {used_energy:.4f}, Limit: {current_energy_threshold:.4f}")
             switch_needed = True
             threshold_violated = "energy"
-            recovery_cycles = 3
+            recovery_cycles = 3  # Only an energy-driven switch starts a recovery period
 
-    # Save updated info
+    # Save updated info (committed with the rest of the cycle)
     mape_info["recovery_cycles"] = recovery_cycles
-    save_mape_info(mape_info)
 
     print(f"📊 Updated Energy Threshold: {new_energy_threshold:.4f}")
 
     return {
         "switch_needed": switch_needed,
         "score": mape_data["score"],
-        "threshold_violated": threshold_violated
+        "threshold_violated": threshold_violated,
+        "normalized_energy": used_energy,
+        "latency_p99_ms": mape_data["latency_p99_ms"],
+        "energy_threshold": new_energy_threshold  # Limit the next cycle checks against
     }
 
 
-def get_model_versions(model_name):
-    """Returns available versions for a given model."""
-    model_dir = os.path.join(base_version_dir, model_name)
-    if not os.path.exists(model_dir):
-        print("debug: Hey! this path is incorrect")
-        return []
-    return sorted([d for d in os.listdir(model_dir) if d.startswith("version_")], key=lambda x: int(x.split("_")[-1]))
-
-def get_best_version(model_name):
-    """Finds the version with the lowest KL divergence from past data."""
-    versions = get_model_versions(model_name)
-    if len(versions) <= 1:
-        return None  # No previous versions exist
-
-    if not os.path.exists(drift_data_file):
-        print("⚠️ No drift.csv found. Cannot compare versions.")
-        return None
+def get_best_version(model_name, drift_data, search="model"):
+    """Finds the version with the lowest KL divergence from the drift data.
 
-    # Load current drift data
-    try:
-        drift_data = pd.read_csv(drift_data_file)["true_value"].values
-        drift_hist, _ = np.histogram(drift_data, bins=50, density=True)
-        drift_hist += 1e-10  
-    except Exception as e:
-        print(f"❌ Error reading drift.csv: {e}")
+    Divergences come from the fingerprints in the model store manifest in one
+    vectorized step. `search` is "model" (versions of `model_name` only) or
+    "all" (every model family). Returns the version key (e.g.
+    "lstm/version_3"), or None.
+    """
+    if drift_data is None or len(drift_data) == 0:
+        print("⚠️ No drift data stored. Cannot compare versions.")
         return None
 
-    min_kl_div = float("inf")
-    best_version = None
-
-    for version in versions:
-        version_data_path = os.path.join(base_version_dir, model_name, version, "data.csv")
-        if not os.path.exists(version_data_path):
-            continue
-
-        # Load versioned model's training data
-        try:
-            version_data = pd.read_csv(version_data_path)["train_data"].values
-            version_hist, _ = np.histogram(version_data, bins=50, density=True)
-            version_hist += 1e-10  # ✅ Prevent zero probabilities
-        except Exception as e:
-            print(f"❌ Error reading {version_data_path}: {e}")
-            continue
+    candidates = get_model_store().closest_versions(drift_data, None if search == "all" else model_name)
+    if len(candidates) <= 1:
+        return None  # No previous versions exist
 
-        # Compute KL divergence
-        kl_div = entropy(drift_hist, version_hist)
-        kl_div = np.clip(kl_div, 0, 10) 
-        print(f"🔎 KL divergence for {version}: {kl_div:.4f}")
+    for kl_div, entry in candidates:
+        print(f"🔎 KL divergence for {entry['model']} version_{entry['version']}: {min(kl_div, 10):.4f}")
 
-        if kl_div < min_kl_div:
-            min_kl_div = kl_div
-            best_version = version_data_path  # Return the best version data path
+    min_kl_div, best_entry = candidates[0]
+    min_kl_div = float(np.clip(min_kl_div, 0, 10))
+    best_version = best_entry["key"]
 
     # Store KL divergences for debugging
     with open(drift_kl_file, "w") as f:
@@ -138,29 +101,27 @@ def get_best_version(model_name):
 
     return best_version if min_kl_div < 0.75 else None  # Use version if KL is below threshold
 
-def analyse_drift():
+def analyse_drift(kb):
     """Analyze drift & decide if retraining is needed or if an existing version can be used."""
-    drift_data = monitor_drift()
+    drift_data = monitor_drift(kb)
     if not drift_data:
         return None
 
     kl_div = drift_data["kl_div"]
-    drift_detected = kl_div > 0.75  #? Threshold for drift detection
+    drift_detected = kl_div > KL_THRESHOLD
 
     if drift_detected:
         print(f"🚨 Drift detected! KL divergence = {kl_div:.4f}")
-        try:
-            df = pd.read_csv("knowledge/predictions.csv")
-            df.columns = df.columns.str.strip()
-            df.tail(1200).to_csv(drift_data_file, index=False)
-        except FileNotFoundError:
-            print("No predictions file found to store drift data.")
+        # Current window comes straight from the drift monitor's memory
+        export_drift_window(kb)
+        drift_window = value_to_frame(kb["drift"])
+        drift_values = drift_window["true_value"].values if "true_value" in drift_window else None
 
         # Get the currently used model
-        with open(current_model_file, "r") as f:
-            current_model = f.read().strip()
+        current_model = kb["model"]
 
-        best_version = get_best_version(current_model)
+        version_search = kb.get("thresholds", {}).get("version_search", "model")
+        best_version = get_best_version(current_model, drift_values, version_search)
 
         if best_version:
             print(f"✔ Best version found with lower KL divergence: {best_version}")
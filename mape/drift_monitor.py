@@ -0,0 +1,228 @@
+from collections import deque
+import numpy as np
+import pandas as pd
+from scipy.stats import entropy
+from tail_reader import read_appended, read_last_rows
+
+class StreamingDriftMonitor:
+    """Sliding reference/current windows over `true_value` with O(1) histogram updates.
+
+    The last `2 * window_size` values live in a ring buffer: the newest
+    `window_size` form the current window and the ones before them the reference
+    window. Both histograms share fixed bin edges, so each new row only moves a
+    few counts between bins and KL divergence is computed in O(bins) per check.
+
+    Edges come from `value_range` if given, otherwise from the first full pair of
+    windows (with a margin). Values outside the edges are clipped into the end
+    bins; if too many current values are clipped, the edges are re-derived from
+    the buffered values.
+    """
+
+    def __init__(self, path, window_size=1200, bins=50, value_range=None, rebase_fraction=0.05):
+        self.path = path
+        self.window_size = window_size
+        self.bins = bins
+        self.value_range = value_range
+        self.rebase_fraction = rebase_fraction
+
+        self.capacity = 2 * window_size
+        self.values = np.zeros(self.capacity)
+        self.bin_ring = np.zeros(self.capacity, dtype=np.intp)
+        self.clip_ring = np.zeros(self.capacity, dtype=bool)
+        self.current_rows = deque(maxlen=window_size)
+        self.columns = None
+        self.offset = None
+        self.inode = None
+        self._reset()
+
+    def _reset(self):
+        self.count = 0  # Total values ingested
+        self.low = self.width = None
+        self.ref_counts = np.zeros(self.bins, dtype=np.int64)
+        self.cur_counts = np.zeros(self.bins, dtype=np.int64)
+        self.cur_clipped = 0
+        self.current_rows.clear()
+
+    # ---------------- Binning ----------------
+
+    def _bin(self, values):
+        """Returns (bin index, clipped flag) for each value on the fixed edges."""
+        raw = np.floor((values - self.low) / self.width)
+        clipped = (raw < 0) | (raw >= self.bins)
+        return np.clip(raw, 0, self.bins - 1).astype(np.intp), clipped
+
+    def _rebuild(self):
+        """(Re)derives edges and rebins both windows from the buffered values. O(window)."""
+        n = min(self.count, self.capacity)
+        order = np.arange(self.count - n, self.count) % self.capacity
+        values = self.values[order]
+
+        if self.value_range is not None:
+            low, high = self.value_range
+        else:
+            low, high = float(values.min()), float(values.max())
+            margin = 0.1 * (high - low) or 1.0
+            low, high = low - margin, high + margin
+        self.low, self.width = low, (high - low) / self.bins
+
+        bins, clipped = self._bin(values)
+        self.bin_ring[order] = bins
+        self.clip_ring[order] = clipped
+        split = max(0, n - self.window_size)
+        self.ref_counts = np.bincount(bins[:split], minlength=self.bins)
+        self.cur_counts = np.bincount(bins[split:], minlength=self.bins)
+        self.cur_clipped = int(clipped[split:].sum())
+
+    # ---------------- Ingestion ----------------
+
+    def ingest_values(self, values):
+        """Pushes new `true_value`s, sliding both windows."""
+        values = np.asarray(values, dtype=np.float64)
+        # Chunks of at most one window never overwrite the slots they still need to read
+        for start in range(0, len(values), self.window_size):
+            self._ingest_chunk(values[start:start + self.window_size])
+
+        if self.low is None and self.count >= self.capacity:
+            self._rebuild()
+        elif (self.low is not None and self.value_range is None
+              and self.cur_clipped > self.rebase_fraction * self.window_size):
+            print("🌊 Drift Monitor: values moved outside the histogram edges. Rebasing edges.")
+            self._rebuild()
+
+    def _ingest_chunk(self, values):
+        k = len(values)
+        index = np.arange(self.count, self.count + k)
+        slots = index % self.capacity
+
+        if self.low is not None:
+            new_bins, new_clipped = self._bin(values)
+
+            # Values moving from the current window into the reference window
+            moved = index - self.window_size
+            moved_slots = moved[moved >= 0] % self.capacity
+            moved_bins = self.bin_ring[moved_slots]
+
+            # Values leaving the reference window
+            dropped = index - self.capacity
+            dropped_bins = self.bin_ring[dropped[dropped >= 0] % self.capacity]
+
+            self.cur_counts += np.bincount(new_bins, minlength=self.bins) - np.bincount(moved_bins, minlength=self.bins)
+            self.ref_counts += np.bincount(moved_bins, minlength=self.bins) - np.bincount(dropped_bins, minlength=self.bins)
+            self.cur_clipped += int(new_clipped.sum()) - int(self.clip_ring[moved_slots].sum())
+
+            self.bin_ring[slots] = new_bins
+            self.clip_ring[slots] = new_clipped
+
+        self.values[slots] = values
+        self.count += k
+
+    def ingest(self, df):
+        """Pushes new prediction rows; keeps the current window's rows for export."""
+        if df.empty:
+            return
+        self.columns = list(df.columns)
+        self.current_rows.extend(df.itertuples(index=False, name=None))
+        self.ingest_values(df["true_value"].values)
+
+    def poll(self):
+        """Ingests rows appended to the predictions file since the last poll."""
+        if self.offset is None:
+            # First poll: only the last two windows matter, so skip the rest of the file
+            df, state = read_last_rows(self.path, self.capacity)
+        else:
+            df, state = read_appended(self.path, self.offset, self.inode)
+            if state["reset"]:
+                self._reset()
+        self.offset, self.inode = state["last_offset"], state["last_inode"]
+        self.ingest(df)
+
+    # ---------------- Statistics ----------------
+
+    def ready(self):
+        return self.count >= self.capacity and self.low is not None
+
+    def kl_divergence(self):
+        """KL(reference || current) over the shared-edge density histograms. O(bins)."""
+        norm = self.window_size * self.width
+        return entropy(self.ref_counts / norm + 1e-10, self.cur_counts / norm + 1e-10)
+
+    def current_window(self):
+        """The current window's prediction rows, straight from memory."""
+        return pd.DataFrame(list(self.current_rows), columns=self.columns)
+
+class StationDriftMonitor:
+    """Reference/current windows of `true_value` for many stations, checked in one vectorized step.
+
+    Each station keeps its last `2 * window_size` values in one row of a
+    ring matrix. `kl_divergences()` bins every ready station on its own
+    edges (derived from its buffered values) and computes all KL(reference ||
+    current) divergences with matrix operations, so a check costs
+    O(stations * window) NumPy work instead of a Python loop per station.
+    """
+
+    def __init__(self, window_size=288, bins=20):
+        self.window_size = window_size
+        self.bins = bins
+        self.capacity = 2 * window_size
+        self.index = {}  # Station → row
+        self.values = np.zeros((0, self.capacity))
+        self.count = np.zeros(0, dtype=np.int64)
+
+    def _rows(self, stations):
+        new = [s for s in pd.unique(stations) if s not in self.index]
+        if new:
+            first = len(self.index)
+            self.index.update((s, first + k) for k, s in enumerate(new))
+            self.values = np.vstack([self.values, np.zeros((len(new), self.capacity))])
+            self.count = np.concatenate([self.count, np.zeros(len(new), dtype=np.int64)])
+        return pd.Series(stations).map(self.index).to_numpy()
+
+    def ingest(self, stations, values):
+        """Pushes new (station, true value) readings, in arrival order."""
+        if len(stations) == 0:
+            return
+        rows = self._rows(np.asarray(stations).astype(str))
+        values = np.asarray(values, dtype=np.float64)
+        grouped = pd.Series(rows).groupby(rows)
+        rank = grouped.cumcount().to_numpy()
+        # Only a station's newest `capacity` readings of this batch survive in its ring
+        keep = rank >= grouped.transform("size").to_numpy() - self.capacity
+        slots = (self.count[rows[keep]] + rank[keep]) % self.capacity
+        self.values[rows[keep], slots] = values[keep]
+        self.count += np.bincount(rows, minlength=len(self.count))
+
+    def windows(self, stations=None):
+        """(stations, values) of the ready stations (of `stations`, or all), oldest value first per row."""
+        ready = [s for s in (self.index if stations is None else stations)
+                 if s in self.index and self.count[self.index[s]] >= self.capacity]
+        rows = np.array([self.index[s] for s in ready], dtype=np.intp)
+        slots = (self.count[rows, None] + np.arange(self.capacity)) % self.capacity
+        return ready, self.values[rows[:, None], slots]
+
+    def current_windows(self, stations):
+        """Each station's current window (its newest `window_size` values), for version matching."""
+        ready, values = self.windows(stations)
+        return ready, values[:, self.window_size:]
+
+    def kl_divergences(self, stations=None):
+        """KL(reference || current) per ready station. Returns (stations, divergences)."""
+        ready, values = self.windows(stations)
+        if not ready:
+            return ready, np.empty(0)
+        low, high = values.min(axis=1), values.max(axis=1)
+        margin = np.where(high > low, 0.1 * (high - low), 1.0)
+        low, width = low - margin, (high - low + 2 * margin) / self.bins
+        bins = np.clip(np.floor((values - low[:, None]) / width[:, None]), 0, self.bins - 1).astype(np.intp)
+
+        # One bincount over (station, bin) pairs per window
+        offsets = (np.arange(len(ready)) * self.bins)[:, None]
+        shape = (len(ready), self.bins)
+        ref = np.bincount((bins[:, :self.window_size] + offsets).ravel(), minlength=shape[0] * shape[1]).reshape(shape)
+        cur = np.bincount((bins[:, self.window_size:] + offsets).ravel(), minlength=shape[0] * shape[1]).reshape(shape)
+        # Densities on each station's edges, smoothed as in `StreamingDriftMonitor.kl_divergence`
+        norm = (self.window_size * width)[:, None]
+        p = ref / norm + 1e-10
+        q = cur / norm + 1e-10
+        p /= p.sum(axis=1, keepdims=True)
+        q /= q.sum(axis=1, keepdims=True)
+        return ready, np.sum(p * np.log(p / q), axis=1)
@@ -1,43 +1,58 @@
-import os
-import json
-import time
-import shutil
+from knowledge_store import get_store
+from model_store import get_model_store
+from retrain_worker import get_worker
+from retrain import ALL_FAMILIES
 from plan import plan_mape, plan_drift
 
-model_file = "knowledge/model.csv"
-
 def execute_mape():
-    """Switch to the best model based on MAPE analysis."""
-    decision = plan_mape()
-    if not decision:
-        print("MAPE: No action needed.")
-        return
-
-    print(f"⚡ Switching model to {decision.upper()}")
-    with open("knowledge/model.csv", "w") as f:
-        f.write(decision)
+    """Switch to the best model based on MAPE analysis.
+
+    The whole cycle (monitor → analyse → plan → execute) runs on one knowledge
+    snapshot and commits its updates in a single write-back. Returns the model
+    switched to, or None.
+    """
+    with get_store().cycle() as kb:
+        decision = plan_mape(kb)
+        if not decision:
+            print("MAPE: No action needed.")
+            return None
+
+        print(f"⚡ Switching model to {decision.upper()}")
+        kb["model"] = decision
+    return decision
 
 def execute_drift():
-    """Replaces model with best version or retrains if necessary."""
-    decision = plan_drift()
+    """Replaces model with best version or retrains if necessary.
+
+    Retraining is queued on the retrain worker; instead of blocking, the
+    drift trigger holds the loop for its `cooldown` after an action. Returns
+    the decision ({"action": "replace"/"retrain", ...}), or None.
+    """
+    store = get_store()
+    with store.cycle() as kb:
+        decision = plan_drift(kb)
+        current_model = kb["model"]
+        drift_retrain = kb["thresholds"].get("drift_retrain", "current")
     if not decision:
         print("Drift: No action needed.")
-        return
+        return None
 
     if decision["action"] == "replace":
-        best_version_path = decision["version"]
-        model_name = os.path.basename(best_version_path).split(".")[0]  # Extract model name
-
-        # Determine correct file extension
-        model_extension = ".pkl" if model_name in ["linear", "svm"] else ".pth"
-
-        # Replace the model with the best version
-        model_target_path = os.path.join("models", f"{model_name}{model_extension}")
-        shutil.copy(best_version_path, model_target_path)
-        print(f"✔ Switched to lower KL divergence model: {best_version_path}")
+        # Deploy the version's model and scaler to models/ (atomic pointer swap in the model store)
+        entry = get_model_store().publish(decision["version"])
+        model_name = entry["model"]
+        print(f"✔ Switched to lower KL divergence model: {decision['version']}")
+        # Measured on the retrain worker, so this thread does not wait for it
+        get_worker().submit(model_name, reason="replace", action="calibrate")
+
+        # The closest version may belong to another model family
+        if model_name != current_model:
+            print(f"⚡ Switching model to {model_name.upper()}")
+            store.set("model", model_name)
 
     elif decision["action"] == "retrain":
         print("🚀 Triggering retraining...")
-        os.system("python retrain.py")
+        # "all": train every family in parallel and publish the best candidate of each
+        get_worker().submit(ALL_FAMILIES if drift_retrain == ALL_FAMILIES else current_model, reason="drift")
 
-    time.sleep(400)
+    return decision
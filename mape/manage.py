@@ -3,13 +3,26 @@ import time
 import pyRAPL
 import csv
 import os
-import pandas as pd
+import sys
+import subprocess
+
+# Make the shared modules in the repository root importable when run as `python mape/manage.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge_store import get_store, frame_to_value
+from tail_reader import read_last_rows
+from retrain_worker import get_worker
+import streams
 from execute import execute_mape, execute_drift
+from monitor import attach_feed, monitor_mape
+from triggers import LoopTrigger, load_trigger_config
+from streams import execute_streams
+from shadow import ShadowScorer, shadow_config
+from stations import station_predictions_file
 
 pyRAPL.setup()
 log_file = "knowledge/mape_log.csv"
 predictions_file = "knowledge/predictions.csv"
-drift_file = "knowledge/drift.csv"
 config_file = "approach.conf"
 
 # Ensure log file exists with header
@@ -23,90 +36,170 @@ def log_energy(function_name, energy_joules):
         writer = csv.writer(file)
         writer.writerow([function_name, energy_joules])
 
-def run_execute_mape():
+def log_retrain_job(job):
+    """Attributes a finished worker job's energy (measured in the worker) to its trigger, e.g. `drift_retrain`."""
+    if job["energy"] is not None:
+        log_energy(f"{job['reason']}_{job['action']}", job["energy"])
+
+def run_execute_mape(trigger):
     while True:
-        time.sleep(40)
+        fired = trigger.wait()
         meter = pyRAPL.Measurement("execute_mape")
         meter.begin()
         start_time = time.perf_counter()
-        execute_mape()
+        decision = execute_mape()
         end_time = time.perf_counter()
         meter.end()
         inference_time = end_time - start_time
         print(f"Execution time (overhead) of execute_mape: {inference_time:.4f} seconds")
         print(f"Energy consumption (pkg[0]): {meter.result.pkg[0]} uJ")
         log_energy("execute_mape", meter.result.pkg[0]) 
+        trigger.record(fired, f"switch:{decision}" if decision else None)
+
+def run_monitor_mape(trigger):
+    """Scores the fixed model on each trigger without planning switches (cascade approach)."""
+    while True:
+        fired = trigger.wait()
+        meter = pyRAPL.Measurement("monitor_mape")
+        meter.begin()
+        with get_store().cycle() as kb:
+            monitor_mape(kb)
+        meter.end()
+        log_energy("monitor_mape", meter.result.pkg[0])
+        trigger.record(fired)
+
+def run_shadow(trigger):
+    """Scores the inactive models on a sample of the served windows on each trigger."""
+    scorer = ShadowScorer()
+    while True:
+        fired = trigger.wait()
+        summary = scorer.score()
+        if summary:
+            # Measured per micro-batch, so the pacing sleeps are not charged; serving energy stays in predictions.csv
+            log_energy("shadow_scoring", summary["energy_uJ"])
+        trigger.record(fired, summary and "shadow")
+
+def run_execute_streams(trigger):
+    """Runs the bulk MAPE cycle over all stations on each trigger (stations approach)."""
+    while True:
+        fired = trigger.wait()
+        meter = pyRAPL.Measurement("execute_streams")
+        meter.begin()
+        summary = execute_streams()
+        meter.end()
+        log_energy("execute_streams", meter.result.pkg[0])
+        acted = summary and (summary["switched"] or summary["replaced"])
+        trigger.record(fired, f"switch:{summary['switched']},replace:{summary['replaced']}" if acted else None)
 
-def run_execute_drift():
-    time.sleep(400)
+def run_execute_drift(trigger):
     while True:
-        time.sleep(3)
+        fired = trigger.wait()
         meter = pyRAPL.Measurement("execute_drift")
         meter.begin()
-        execute_drift()
+        decision = execute_drift()
         meter.end()
         log_energy("execute_drift", meter.result.pkg[0])
+        trigger.record(fired, decision and decision["action"])
 
-def run_periodic_retrain():
+def run_periodic_retrain(trigger):
     while True:
-        time.sleep(500)
-        # Ensure `drift.csv` has data by storing the last 1500 rows from `predictions.csv`
+        fired = trigger.wait()
+        # Ensure the stored drift data is fresh by keeping the last 1500 rows from `predictions.csv`
         try:
-            df = pd.read_csv(predictions_file)
-            df.columns = df.columns.str.strip()
+            df, _ = read_last_rows(predictions_file, 1500)
             if not df.empty:
-                df.tail(1500).to_csv(drift_file, index=False)
-                print("✔ Updated drift.csv with the last 1500 rows from predictions.csv")
+                get_store().set("drift", frame_to_value(df))
+                print("✔ Updated drift data with the last 1500 rows from predictions.csv")
             else:
                 print("⚠️ Predictions file is empty. No data available for retraining.")
         except FileNotFoundError:
             print("❌ Error: predictions.csv not found. Cannot update drift.csv.")
 
-        # Run retraining
-        meter = pyRAPL.Measurement("periodic_retrain")
-        meter.begin()
-        os.system("python retrain.py")
-        meter.end()
-        log_energy("periodic_retrain", meter.result.pkg[0])
+        # Queue retraining on the worker; its energy is logged when the job finishes
+        get_worker().submit(get_store().get("model"), reason="periodic")
+        trigger.record(fired, "retrain")
 
 def get_approach_config():
     if not os.path.exists(config_file):
         print(f"Configuration file '{config_file}' not found. Defaulting to 'harmone'.")
         return "harmone"
     with open(config_file, 'r') as f:
-        approach = f.read().strip().lower()
+        approach = f.readline().strip().lower()  # Trigger sections may follow the first line
     return approach
 
-approach = get_approach_config()
-print(f"Running configuration: {approach}")
-
-threads = []
-
-if approach in ["harmone", "switch", "switch+retrain"]:
-    # Always run t1 for these approaches
-    t1 = threading.Thread(target=run_execute_mape, daemon=True)
-    threads.append(t1)
-    
-    if approach == "harmone":
-        # For HarmonE, also run t2 (drift detection)
-        t2 = threading.Thread(target=run_execute_drift, daemon=True)
-        threads.append(t2)
-    elif approach == "switch+retrain":
-        # For Switch + Retrain, run periodic retraining (t3)
-        t3 = threading.Thread(target=run_periodic_retrain, daemon=True)
-        threads.append(t3)
-elif approach in ["single", "single+retrain"]:
-    print("Single model approach selected: No dynamic model switching will be executed.")
-    if approach == "single+retrain":
-        # For single+retrain, run only periodic retraining (t3)
-        t3 = threading.Thread(target=run_periodic_retrain, daemon=True)
-        threads.append(t3)
-else:
-    print("Unknown approach configuration. No management threads will be started.")
-
-for t in threads:
-    t.start()
-
-# Keep the script running indefinitely
-exit_event = threading.Event()
-exit_event.wait()
+def start(approach, feed=None):
+    """Starts the management threads for `approach` and returns them.
+
+    With a `PredictionFeed` (embedded runtime) the monitors and triggers read
+    predictions from memory instead of predictions.csv.
+    """
+    if feed is not None:
+        attach_feed(feed)
+
+    # Each loop runs when one of its triggers fires (new rows, drift, energy budget or max interval)
+    trigger_config = load_trigger_config(approach, config_file)
+    streams.STATION_DRIFT_COOLDOWN = trigger_config["drift"]["cooldown"] or 0
+    path = station_predictions_file if approach == "stations" else predictions_file
+    triggers = {loop: LoopTrigger(loop, feed=feed, path=path, **params) for loop, params in trigger_config.items()}
+    print(f"Triggers: {trigger_config}")
+
+    threads = []
+
+    if approach in ["harmone", "switch", "switch+retrain"]:
+        # Always run t1 for these approaches
+        t1 = threading.Thread(target=run_execute_mape, args=(triggers["mape"],), daemon=True)
+        threads.append(t1)
+
+        if approach == "harmone":
+            # For HarmonE, also run t2 (drift detection)
+            t2 = threading.Thread(target=run_execute_drift, args=(triggers["drift"],), daemon=True)
+            threads.append(t2)
+        elif approach == "switch+retrain":
+            # For Switch + Retrain, run periodic retraining (t3)
+            t3 = threading.Thread(target=run_periodic_retrain, args=(triggers["retrain"],), daemon=True)
+            threads.append(t3)
+
+        thresholds = get_store().get("thresholds") or {}
+        if thresholds.get("shadow", {}).get("sample_rate", 0) > 0:
+            # Keep the EMA scores of the models that are not serving fresh (t4); bad settings fail here
+            shadow_config(thresholds)
+            t4 = threading.Thread(target=run_shadow, args=(triggers["shadow"],), daemon=True)
+            threads.append(t4)
+    elif approach == "cascade":
+        # The cascade (Ridge, escalating to the LSTM per sample) is scored as one unit; no switching
+        t1 = threading.Thread(target=run_monitor_mape, args=(triggers["mape"],), daemon=True)
+        threads.append(t1)
+    elif approach == "stations":
+        # Many stations (inference.py --stations): one bulk MAPE cycle covers every station's model and drift
+        t1 = threading.Thread(target=run_execute_streams, args=(triggers["mape"],), daemon=True)
+        threads.append(t1)
+    elif approach in ["single", "single+retrain"]:
+        print("Single model approach selected: No dynamic model switching will be executed.")
+        if approach == "single+retrain":
+            # For single+retrain, run only periodic retraining (t3)
+            t3 = threading.Thread(target=run_periodic_retrain, args=(triggers["retrain"],), daemon=True)
+            threads.append(t3)
+    else:
+        print("Unknown approach configuration. No management threads will be started.")
+
+    if get_store().get("profile") is None:
+        # Calibrate the deployed models once on this machine so planning can predict their energy
+        print("🔬 No calibration profile found. Running tools/calibrate.py...")
+        subprocess.run([sys.executable, os.path.join("tools", "calibrate.py"), "--no_versions", "--calls", "200"])
+
+    if approach == "harmone" or approach.endswith("+retrain"):
+        # Start the retrain worker before any thread runs, so it is forked from a quiet process
+        get_worker(on_done=log_retrain_job)
+
+    for t in threads:
+        t.start()
+    return threads
+
+if __name__ == "__main__":
+    approach = get_approach_config()
+    print(f"Running configuration: {approach}")
+    start(approach)
+
+    # Keep the script running indefinitely
+    exit_event = threading.Event()
+    exit_event.wait()
@@ -1,60 +1,75 @@
-import pandas as pd
 import numpy as np
 import threading
 import time
-from scipy.stats import entropy
-import json
 import os
 from sklearn.metrics import r2_score
-
-mape_info_file = "knowledge/mape_info.json"
-thresholds_file = "knowledge/thresholds.json"
-model_file = "knowledge/model.csv"
-
-def load_mape_info():
-    with open(mape_info_file, "r") as f:
-        return json.load(f)
-
-def save_mape_info(data):
-    """Save updated MAPE info including model-specific EMA scores."""
-    with open(mape_info_file, "w") as f:
-        json.dump(data, f, indent=4)
-
-def get_current_model():
-    """Fetch the currently active model from knowledge."""
-    try:
-        with open(model_file, "r") as f:
-            return f.read().strip()
-    except FileNotFoundError:
-        return None  # Default behavior if file doesn't exist
-
-
-def monitor_mape():
-    """Monitor R² Score and Normalized Energy, and Compute Score."""
-    info = load_mape_info()
-    last_line = info["last_line"]
-    current_model = get_current_model()
+from knowledge_store import frame_to_value
+from cascade import CASCADE, model_unit
+from tail_reader import read_appended
+from drift_monitor import StreamingDriftMonitor
+
+predictions_file = "knowledge/predictions.csv"
+
+# In-memory prediction feed (embedded runtime); None reads predictions.csv
+prediction_feed = None
+
+def attach_feed(feed):
+    """Makes the monitors read predictions from an in-memory `PredictionFeed` instead of predictions.csv."""
+    global prediction_feed
+    prediction_feed = feed
+
+def read_new_predictions(info):
+    """Rows since the last MAPE cycle, from the feed or by seeking in predictions.csv. Returns (df, tail state)."""
+    if prediction_feed is not None:
+        df = prediction_feed.read("mape")
+        # File offsets no longer match; the row count lets a later file-based run skip these rows
+        return df, {"last_offset": None, "last_inode": None, "last_line": info["last_line"] + len(df), "reset": False}
+    return read_appended(predictions_file, info.get("last_offset"), info.get("last_inode"), info["last_line"])
+
+def latency_percentiles(df):
+    """p50/p95/p99 of `inference_time` in milliseconds, per model used in the window (the cascade as one unit)."""
+    stats = {}
+    for model_name, times in df.groupby(df["model_used"].map(model_unit))["inference_time"]:
+        times_ms = times.values * 1000
+        stats[model_name] = {
+            "p50_ms": float(np.percentile(times_ms, 50)),
+            "p95_ms": float(np.percentile(times_ms, 95)),
+            "p99_ms": float(np.percentile(times_ms, 99)),
+            "rows": len(times_ms),
+            "updated": time.time()
+        }
+    return stats
+
+def monitor_mape(kb):
+    """Monitor R² Score and Normalized Energy, and Compute Score.
+
+    `kb` is the cycle's knowledge transaction; updates are committed by the caller.
+    """
+    info = kb["mape_info"]
+    current_model = kb["model"]
     if current_model is None:
         print("⚠️ No model currently in use.")
         return None
 
     try:
-        df = pd.read_csv("knowledge/predictions.csv", skiprows=range(1, last_line + 1))
-        df.columns = df.columns.str.strip()
-        if df.empty:
-            print("📉 No new data to process in predictions.csv")
-            return None
+        # Only the rows appended since the last cycle
+        df, tail_state = read_new_predictions(info)
     except FileNotFoundError:
         print("⚠️ No predictions.csv file found.")
         return None
 
+    if df.empty:
+        if tail_state["reset"]:
+            info.update(last_offset=tail_state["last_offset"], last_inode=tail_state["last_inode"], last_line=0)
+        print("📉 No new data to process in predictions.csv")
+        return None
+
     print(f"🆕 Processing {len(df)} new rows from predictions.csv for {current_model.upper()}")
 
     r2 = r2_score(df["true_value"], df["predicted_value"])
 
     # Compute Normalized Energy
-    with open(thresholds_file, "r") as f:
-        thresholds = json.load(f)
+    thresholds = kb["thresholds"]
     energy_min, energy_max = thresholds["E_m"], thresholds["E_M"]
     print(df["energy"].mean() ,energy_min,energy_max)
     energy_normalized = (df["energy"].mean() - energy_min)/(energy_max - energy_min)
@@ -64,53 +79,93 @@ def monitor_mape():
 
     # Compute Exponential Moving Average (EMA)
     gamma = thresholds.get("gamma", 0.8)
-    prev_score = info["ema_scores"][current_model]
+    prev_score = info["ema_scores"].get(current_model, model_score)
     final_score = gamma * model_score + (1 - gamma) * prev_score
 
+    # Observed tail latency per model, kept so the planner knows it before switching back
+    latency = latency_percentiles(df)
+    info.setdefault("latency", {}).update(latency)
+    latency_p99 = latency[current_model]["p99_ms"] if current_model in latency else None
+
     # Log computed values
     info["ema_scores"][current_model] = final_score
-    info["last_line"] += len(df)
+    info.setdefault("served_energy", {})[current_model] = energy_normalized  # Energy term for its shadow scores
+    info["last_line"] = tail_state["last_line"]
+    info["last_offset"] = tail_state["last_offset"]
+    info["last_inode"] = tail_state["last_inode"]
 
     # Log computed values
     print(f"🔹 R² Score: {r2:.4f}")
     print(f"🔹 Normalized Energy: {energy_normalized:.4f}")
     print(f"🔹 Model Score for {current_model.upper()}: {model_score:.4f}")
     print(f"🔹 Updated EMA Score for {current_model.upper()}: {final_score:.4f}")
-
-    save_mape_info(info)
+    if current_model == CASCADE:
+        # The cascade is scored as one unit; record how often it needed the LSTM
+        escalation_rate = float((df["model_used"] == f"{CASCADE}:lstm").mean())
+        info["cascade_escalation_rate"] = escalation_rate
+        print(f"🔹 Cascade escalated {escalation_rate:.1%} of samples to the LSTM")
+    if latency_p99 is not None:
+        print(f"🔹 Latency for {current_model.upper()}: p50 {latency[current_model]['p50_ms']:.3f} ms, "
+              f"p99 {latency_p99:.3f} ms")
 
     return {
         "r2_score": r2,
         "normalized_energy": energy_normalized,
-        "score": final_score
+        "score": final_score,
+        "latency_p99_ms": latency_p99
     }
 
 
 
-def monitor_drift():
+# Stateful drift monitor, kept across checks by the drift thread
+drift_monitor = None
+
+def get_drift_monitor(thresholds):
+    """Creates the streaming drift monitor on first use, configured from the stored thresholds."""
+    global drift_monitor
+    if drift_monitor is None:
+        drift_monitor = StreamingDriftMonitor(
+            predictions_file,
+            window_size=thresholds.get("drift_window", 1200),
+            bins=thresholds.get("drift_bins", 50),
+            value_range=thresholds.get("drift_range")
+        )
+    return drift_monitor
+
+def refresh_drift_monitor(monitor):
+    """Ingests new predictions into the drift monitor, from the feed or predictions.csv."""
+    if prediction_feed is not None:
+        monitor.ingest(prediction_feed.read("drift"))
+    else:
+        monitor.poll()
+
+def monitor_drift(kb):
     """Monitor data drift without enforcing immediate retraining."""
+    monitor = get_drift_monitor(kb.get("thresholds", {}))
     try:
-        df = pd.read_csv("knowledge/predictions.csv")
-        df.columns = df.columns.str.strip()
-        if df.empty:
-            print("Drift Monitor: No predictions yet.")
-            return None
-
-        window_size = 1200
-        if len(df) >= window_size * 2:
-            reference_window = df['true_value'].iloc[-2*window_size:-window_size]
-            current_window = df['true_value'].iloc[-window_size:]
-            kl_div = entropy(
-                np.histogram(reference_window, bins=50, density=True)[0] + 1e-10,
-                np.histogram(current_window, bins=50, density=True)[0] + 1e-10
-            )
-            #? energy_dist = wasserstein_distance(reference_window, current_window)
-            print(f"🌊 Drift: KL={kl_div:.4f}")
-            return {"kl_div": kl_div}#?, "energy_distance": energy_dist}
-        else:
-            print(f"Not enough data for drift detection. Have {len(df)} samples, need {window_size * 2}")
-            return None
-    
+        # Only rows appended since the last check are read
+        refresh_drift_monitor(monitor)
     except FileNotFoundError:
         print("Drift Monitor: No predictions found.")
         return None
+
+    if monitor.count == 0:
+        print("Drift Monitor: No predictions yet.")
+        return None
+
+    if not monitor.ready():
+        print(f"Not enough data for drift detection. Have {monitor.count} samples, need {monitor.capacity}")
+        return None
+
+    kl_div = monitor.kl_divergence()
+    #? energy_dist = wasserstein_distance(reference_window, current_window)
+    print(f"🌊 Drift: KL={kl_div:.4f}")
+    return {"kl_div": kl_div}#?, "energy_distance": energy_dist}
+
+def export_drift_window(kb):
+    """Stores the current drift window (last `drift_window` predictions) from memory in the knowledge base."""
+    monitor = get_drift_monitor(kb.get("thresholds", {}))
+    if monitor.count == 0:
+        print("No predictions available to store drift data.")
+        return
+    kb["drift"] = frame_to_value(monitor.current_window())
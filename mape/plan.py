@@ -1,46 +1,95 @@
-import json
+import time
 import random
 import pandas as pd
 import numpy as np
 from sklearn.metrics import r2_score
 from analyse import analyse_mape, analyse_drift
+from model_registry import MODEL_FILES
 
 
-import json
-import random
-from analyse import analyse_mape
-
-thresholds_file = "knowledge/thresholds.json"
-model_file = "knowledge/model.csv"
-mape_info_file = "knowledge/mape_info.json"
-
 MODEL_ENERGY_EFFICIENCY = {
     "lstm": 0.7,    
     "linear": 0.3,  
     "svm": 0.5      
 }
 
-def load_mape_info():
-    """Load stored MAPE info including model-specific EMA scores."""
-    try:
-        with open(mape_info_file, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {
-            "ema_scores": {"lstm": 0.5, "linear": 0.5, "svm": 0.5}
-        }
-
-def plan_mape():
+# Seconds an observed p99 is trusted; older observations fall back to the calibration profile,
+# so a model that was slow once is not excluded forever
+LATENCY_OBSERVATION_TTL = 1800
+
+DEFAULT_MAPE_INFO = {
+    "ema_scores": {"lstm": 0.5, "lstm-q": 0.5, "linear": 0.5, "svm": 0.5}
+}
+
+def predicted_energy(model_name, kb, observed_energy=None):
+    """Normalized energy `model_name` is expected to use, known before switching to it.
+
+    Comes from the calibration profile (`tools/calibrate.py`) when it has an
+    energy figure; otherwise the current model's observed normalized energy
+    is scaled by MODEL_ENERGY_EFFICIENCY (models without a figure there, such
+    as "lstm-q", are only known once calibrated). Returns None if neither is
+    known.
+    """
+    thresholds = kb["thresholds"]
+    calibrated = kb.get("profile", {}).get("models", {}).get(model_name, {})
+    if calibrated.get("energy_uJ") is not None:
+        return (calibrated["energy_uJ"] - thresholds["E_m"]) / (thresholds["E_M"] - thresholds["E_m"])
+    current_model = kb["model"]
+    if observed_energy is None or current_model not in MODEL_ENERGY_EFFICIENCY or model_name not in MODEL_ENERGY_EFFICIENCY:
+        return None
+    return observed_energy * MODEL_ENERGY_EFFICIENCY[model_name] / MODEL_ENERGY_EFFICIENCY[current_model]
+
+def within_budget(candidates, kb, energy_threshold, observed_energy=None):
+    """Candidates whose predicted energy fits the threshold (unknown predictions are kept)."""
+    fitting = []
+    for model_name in candidates:
+        energy = predicted_energy(model_name, kb, observed_energy)
+        if energy is None or energy <= energy_threshold:
+            fitting.append(model_name)
+        else:
+            print(f"🔮 {model_name.upper()} predicted energy {energy:.4f} exceeds threshold {energy_threshold:.4f}")
+    return fitting
+
+def expected_p99(model_name, kb):
+    """p99 latency (ms) `model_name` is expected to have: observed in a recent MAPE window, else calibrated.
+
+    Returns None if neither is known.
+    """
+    observed = kb["mape_info"].get("latency", {}).get(model_name)
+    if observed and time.time() - observed.get("updated", 0) < LATENCY_OBSERVATION_TTL:
+        return observed["p99_ms"]
+    calibrated = (kb.get("profile") or {}).get("models", {}).get(model_name, {})
+    return calibrated.get("latency_ms", {}).get("p99_ms")
+
+def within_latency(candidates, kb):
+    """Candidates whose expected p99 fits `latency_budget_ms` (all of them without a budget; unknown ones are kept)."""
+    budget = kb["thresholds"].get("latency_budget_ms")
+    if budget is None:
+        return list(candidates)
+    fitting = []
+    for model_name in candidates:
+        p99 = expected_p99(model_name, kb)
+        if p99 is None or p99 <= budget:
+            fitting.append(model_name)
+        else:
+            print(f"⏱️ {model_name.upper()} p99 {p99:.3f} ms exceeds latency budget {budget} ms")
+    return fitting
+
+def plan_mape(kb):
     # Load exploration probability (alpha
-    with open(thresholds_file, "r") as f:
-        thresholds = json.load(f)
+    thresholds = kb["thresholds"]
     alpha = thresholds.get("alpha", 0.1)
     if random.random() < alpha:
-        chosen_model = random.choice(["lstm", "linear", "svm"])
+        # Explore only models expected to fit the latency budget and the energy threshold
+        energy_threshold = kb["mape_info"].get("current_energy_threshold", thresholds["max_energy"])
+        models = list(MODEL_FILES)
+        candidates = within_latency(models, kb) or models
+        candidates = within_budget(candidates, kb, energy_threshold) or candidates
+        chosen_model = random.choice(candidates)
         print(f"🎲 Exploratory switching active! Randomly selecting {chosen_model.upper()}.")
         return chosen_model
     
-    analysis = analyse_mape()
+    analysis = analyse_mape(kb)
     if not analysis or not analysis["switch_needed"]:
         print("✅ No model switch needed (Thresholds not violated).")
         return None
@@ -48,29 +97,54 @@ def plan_mape():
     threshold_violated = analysis["threshold_violated"]
 
     # Load model-specific EMA scores
-    mape_info = load_mape_info()
+    mape_info = kb.get("mape_info", DEFAULT_MAPE_INFO)
     ema_scores = mape_info["ema_scores"]
 
     # Get currently used model
-    try:
-        with open(model_file, "r") as f:
-            current_model = f.read().strip()
-    except FileNotFoundError:
-        current_model = None   
+    current_model = kb["model"]
         
-    # If energy threshold was exceeded, choose highest-scoring model not currently in use
-    if threshold_violated == "energy":
-        best_alternative = sorted(ema_scores.items(), key=lambda x: x[1], reverse=True)
-        chosen_model = next((m for m, _ in best_alternative if m != current_model), None)
-        if chosen_model:
-            print(f"⚡ Energy threshold violated. Switching to best available model: {chosen_model.upper()}")
+    energy_threshold = analysis["energy_threshold"]
+    observed_energy = analysis["normalized_energy"]
+    ranked = [m for m, _ in sorted(ema_scores.items(), key=lambda x: x[1], reverse=True)]
+
+    # If the latency budget was exceeded, choose the highest-scoring other model within it
+    # (preferring ones that fit the energy threshold), else the one with the lowest p99
+    if threshold_violated == "latency":
+        alternatives = [m for m in ranked if m != current_model]
+        fast = within_latency(alternatives, kb)
+        if fast:
+            chosen_model = (within_budget(fast, kb, energy_threshold, observed_energy) or fast)[0]
         else:
+            chosen_model = min(alternatives, key=lambda m: expected_p99(m, kb), default=None)
+            if chosen_model is None or expected_p99(chosen_model, kb) >= analysis["latency_p99_ms"]:
+                print(f"⚠️ No faster model available. Staying on {current_model.upper()}.")
+                return None
+        print(f"⏱️ Latency budget violated. Switching to fastest suitable model: {chosen_model.upper()}")
+
+    # If energy threshold was exceeded, choose highest-scoring model not currently in use
+    # that is predicted to fit the threshold (else the one predicted to use the least energy)
+    elif threshold_violated == "energy":
+        alternatives = [m for m in ranked if m != current_model]
+        if not alternatives:
             print(f"⚠️ No alternative models available. Staying on {current_model.upper()}.")
             return None
+        # Never trade the energy violation for a latency one
+        alternatives = within_latency(alternatives, kb)
+        if not alternatives:
+            print(f"⚠️ No alternative fits the latency budget. Staying on {current_model.upper()}.")
+            return None
+        fitting = within_budget(alternatives, kb, energy_threshold, observed_energy)
+        if fitting:
+            chosen_model = fitting[0]
+        else:
+            chosen_model = min(alternatives, key=lambda m: predicted_energy(m, kb, observed_energy))
+        print(f"⚡ Energy threshold violated. Switching to best available model: {chosen_model.upper()}")
 
-    # Otherwise, choose the highest-scoring model
+    # Otherwise, choose the highest-scoring model expected to fit the latency budget and energy threshold
     else:
-        chosen_model = max(ema_scores, key=ema_scores.get)
+        fast = within_latency(ranked, kb) or ranked
+        fitting = within_budget(fast, kb, energy_threshold, observed_energy)
+        chosen_model = (fitting or fast)[0]
         print(f"🏆 Choosing best model based on EMA scores: {chosen_model.upper()}")
 
     # Check if already using the chosen model
@@ -82,9 +156,9 @@ def plan_mape():
 
 
 
-def plan_drift():
+def plan_drift(kb):
     """Decide if retraining is needed or if an older version can be used."""
-    drift = analyse_drift()
+    drift = analyse_drift(kb)
     if not drift or not drift["drift_detected"]:
         print("✅ No drift detected. No action required.")
         return None
@@ -0,0 +1,166 @@
+import os
+import csv
+import time
+import numpy as np
+import pyRAPL
+from sklearn.metrics import r2_score
+from data_pipeline import create_sequences
+from knowledge_store import get_store
+from model_registry import ModelRegistry, predict_windows
+from tail_reader import read_appended, read_last_rows
+from plan import predicted_energy
+import monitor
+
+# ---------------- Shadow Scoring ----------------
+# `monitor_mape` only scores the model that is serving, so the EMA scores of
+# the other models go stale until exploration switches to them. The shadow
+# stage replays the served windows through the inactive models in the MAPE
+# process, off the inference path, and updates their EMA scores.
+
+shadow_log_file = "knowledge/shadow_log.csv"
+SHADOW_LOG_COLUMNS = ["timestamp", "model", "rows", "r2_score", "normalized_energy", "score", "ema_score",
+                      "served", "energy_uJ", "busy_s"]
+DEFAULT_SHADOW = {"sample_rate": 0.2, "batch_size": 64, "cpu_budget": 0.1}
+
+def shadow_config(thresholds):
+    """`shadow` settings from thresholds over DEFAULT_SHADOW. Raises ValueError on values the scorer cannot run with."""
+    config = dict(DEFAULT_SHADOW, **thresholds.get("shadow", {}))
+    if not 0 <= config["sample_rate"] <= 1:
+        raise ValueError(f"shadow.sample_rate must be between 0 and 1, got {config['sample_rate']}.")
+    if not 0 < config["cpu_budget"] <= 1:
+        raise ValueError(f"shadow.cpu_budget must be above 0 and at most 1, got {config['cpu_budget']}.")
+    if int(config["batch_size"]) != config["batch_size"] or config["batch_size"] < 1:
+        raise ValueError(f"shadow.batch_size must be a positive integer, got {config['batch_size']}.")
+    return config
+
+def log_shadow(row):
+    """Appends one model's shadow score and cost to `shadow_log.csv` (kept apart from serving energy)."""
+    new_file = not os.path.exists(shadow_log_file)
+    with open(shadow_log_file, "a", newline="") as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(SHADOW_LOG_COLUMNS)
+        writer.writerow([row.get(c) for c in SHADOW_LOG_COLUMNS])
+
+class ShadowScorer:
+    """Scores the inactive models on a sample of the windows the active model served.
+
+    Windows are rebuilt from the `true_value` column of new prediction rows
+    (the last `seq_length` values are carried across cycles) and a
+    `sample_rate` share of them is predicted by each inactive model in
+    micro-batches of `batch_size`. After each micro-batch the scorer sleeps
+    so that its busy time stays within `cpu_budget` of the wall time. Each
+    model's score uses the same formula as `monitor_mape`. For a model that
+    has served, the energy term is its own measured served energy
+    (`mape_info["served_energy"]`, recorded by `monitor_mape`), the source
+    its served scores use, and the score updates its EMA. A model that has
+    never served has no such figure; its score uses the predicted energy
+    (`plan.predicted_energy`) and is kept apart under
+    `mape_info["shadow_scores"]`, so the planner never ranks it against
+    measured scores. The measured shadow energy is only logged. Settings
+    come from `shadow` in thresholds (see `shadow_config`).
+    """
+
+    def __init__(self, registry=None, seq_length=5, seed=None):
+        self.registry = registry
+        self.seq_length = seq_length
+        self.rng = np.random.default_rng(seed)
+        self.carry = np.empty(0)
+        self.tail = None  # read_appended state; starts at the end of predictions.csv
+
+    def read_new_rows(self):
+        """Prediction rows since the last cycle, from the feed or predictions.csv."""
+        if monitor.prediction_feed is not None:
+            return monitor.prediction_feed.read("shadow")
+        if self.tail is None:
+            df, self.tail = read_last_rows(monitor.predictions_file, self.seq_length)
+            self.carry = df["true_value"].values.astype(float) if not df.empty else np.empty(0)
+        df, self.tail = read_appended(monitor.predictions_file, self.tail["last_offset"], self.tail["last_inode"],
+                                      self.tail["last_line"])
+        return df
+
+    def sample_windows(self, df, sample_rate):
+        """(windows, next values) for a `sample_rate` share of the new rows."""
+        series = np.concatenate([self.carry, df["true_value"].values.astype(float)])
+        self.carry = series[-self.seq_length:]
+        X, y = create_sequences(series, self.seq_length)
+        keep = self.rng.random(len(X)) < sample_rate
+        return X[keep], y[keep]
+
+    def predict_within_budget(self, model_name, windows, batch_size, cpu_budget):
+        """Predicts in micro-batches, pacing to `cpu_budget`. Returns (predictions, energy in µJ, busy seconds)."""
+        model, scaler = self.registry.models[model_name], self.registry.scalers[model_name]
+        predictions = np.empty(len(windows))
+        energy, busy = 0.0, 0.0
+        for start in range(0, len(windows), batch_size):
+            meter = pyRAPL.Measurement("shadow")
+            meter.begin()
+            start_time = time.perf_counter()
+            batch = slice(start, start + batch_size)
+            predictions[batch] = predict_windows(model_name, model, scaler, windows[batch])
+            elapsed = time.perf_counter() - start_time
+            meter.end()
+            energy += meter.result.pkg[0]
+            busy += elapsed
+            time.sleep(elapsed * (1 / cpu_budget - 1))
+        return predictions, energy, busy
+
+    def score(self):
+        """Runs one shadow cycle. Returns {"scores": {model: shadow score}, "energy_uJ"}, or None if nothing was scored."""
+        store = get_store()
+        with store.snapshot() as kb:
+            thresholds = kb["thresholds"]
+            current_model = kb["model"]
+        config = shadow_config(thresholds)
+
+        try:
+            df = self.read_new_rows()
+        except FileNotFoundError:
+            print("⚠️ Shadow: no predictions.csv file found.")
+            return None
+        if df.empty:
+            return None
+        windows, y_true = self.sample_windows(df, config["sample_rate"])
+        if len(windows) < 2:
+            return None
+
+        if self.registry is None:
+            self.registry = ModelRegistry(compiled=False)
+        self.registry.refresh()
+        inactive = [m for m in self.registry.models if m != current_model]
+        energy_min, energy_max = thresholds["E_m"], thresholds["E_M"]
+        observed_energy = (df["energy"].mean() - energy_min) / (energy_max - energy_min)
+
+        results = {}
+        for model_name in inactive:
+            predictions, energy, busy = self.predict_within_budget(model_name, windows, config["batch_size"],
+                                                                   config["cpu_budget"])
+            results[model_name] = (float(r2_score(y_true, predictions)), energy, busy)
+
+        beta, gamma = thresholds.get("beta", 0.5), thresholds.get("gamma", 0.8)
+        scores = {}
+        with store.cycle() as kb:
+            info = kb["mape_info"]
+            for model_name, (r2, energy, busy) in results.items():
+                if model_name == kb["model"]:
+                    continue  # Switched to while being shadowed; its served rows score it from now on
+                energy_normalized = info.get("served_energy", {}).get(model_name)
+                served = energy_normalized is not None
+                if not served:
+                    energy_normalized = predicted_energy(model_name, kb, observed_energy)
+                if energy_normalized is None:
+                    # No profile or efficiency figure: fall back to the (batched) shadow energy per prediction
+                    energy_normalized = (energy / len(windows) - energy_min) / (energy_max - energy_min)
+                model_score = beta * r2 + (1 - beta) * (1 - energy_normalized)
+                ema = info["ema_scores"] if served else info.setdefault("shadow_scores", {})
+                prev_score = ema.get(model_name, model_score)
+                ema[model_name] = gamma * model_score + (1 - gamma) * prev_score
+                scores[model_name] = model_score
+                log_shadow({"timestamp": time.time(), "model": model_name, "rows": len(windows), "r2_score": r2,
+                            "normalized_energy": energy_normalized, "score": model_score,
+                            "ema_score": ema[model_name], "served": served, "energy_uJ": energy, "busy_s": busy})
+            kb["mape_info"] = info
+
+        print(f"👥 Shadow: scored {', '.join(f'{m.upper()} {s:.4f}' for m, s in scores.items())} "
+              f"on {len(windows)} windows")
+        return {"scores": scores, "energy_uJ": sum(energy for _, energy, _ in results.values())}
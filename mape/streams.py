@@ -0,0 +1,200 @@
+import time
+import numpy as np
+import pandas as pd
+from knowledge_store import get_store, frame_to_value
+from model_store import get_model_store
+from stations import station_predictions_file, stations_table, version_family
+from tail_reader import read_appended
+from drift_monitor import StationDriftMonitor
+from analyse import KL_THRESHOLD
+from model_registry import MODEL_FILES
+from plan import MODEL_ENERGY_EFFICIENCY
+import monitor
+
+# ---------------- Multi-Station MAPE ----------------
+# One cycle monitors, analyses and plans every station at once: per-station
+# statistics come from grouped sums over the new rows and decisions from
+# (stations x models) score matrices, so a cycle costs a few NumPy/pandas
+# operations instead of one single-stream MAPE cycle per station.
+
+MODELS = list(MODEL_FILES)
+# Seconds a station is held after a drift action (the drift trigger's `cooldown`, set by manage.py).
+# The stations loop runs on the MAPE trigger, which cannot hold single stations.
+STATION_DRIFT_COOLDOWN = 400
+EMA_COLUMNS = [f"ema_{m}" for m in MODELS]
+# Per-station knowledge, stored as one table under the "streams" key
+STATION_TABLE_COLUMNS = ["model", "version"] + EMA_COLUMNS + ["energy_threshold", "recovery_cycles", "kl_div",
+                                                              "hold_until"]
+DEFAULT_EMA_SCORE = 0.5
+
+station_drift_monitor = None
+
+def get_station_drift_monitor(thresholds):
+    """Creates the per-station drift monitor on first use (a day of 5-minute readings per window by default)."""
+    global station_drift_monitor
+    if station_drift_monitor is None:
+        station_drift_monitor = StationDriftMonitor(window_size=thresholds.get("station_drift_window", 288),
+                                                    bins=thresholds.get("station_drift_bins", 20))
+    return station_drift_monitor
+
+def read_new_station_predictions(streams):
+    """Rows since the last cycle, from the feed or by seeking in station_predictions.csv. Returns (df, tail state)."""
+    if monitor.prediction_feed is not None:
+        df = monitor.prediction_feed.read("streams")
+        return df, {"last_offset": None, "last_inode": None, "last_line": streams.get("last_line", 0) + len(df),
+                    "reset": False}
+    return read_appended(station_predictions_file, streams.get("last_offset"), streams.get("last_inode"),
+                         streams.get("last_line", 0))
+
+def score_stations(df, thresholds):
+    """R², normalized energy and model score of every station in the window, from one grouped sum.
+
+    R² is 1 - SSE / SST with SST = Σy² - (Σy)² / n, so no per-station
+    Python loop is needed. Returns a frame indexed by station, with the
+    model that served each station's latest row.
+    """
+    station = df["station"].values
+    true_value = df["true_value"].astype(float)
+    error = true_value - df["predicted_value"].astype(float)
+    sums = pd.DataFrame({"rows": 1, "sse": error ** 2, "sum_y": true_value, "sum_y2": true_value ** 2,
+                         "energy": df["energy"].astype(float)}).groupby(station).sum()
+
+    sst = sums["sum_y2"] - sums["sum_y"] ** 2 / sums["rows"]
+    energy_min, energy_max = thresholds["E_m"], thresholds["E_M"]
+    beta = thresholds.get("beta", 0.5)
+    stats = pd.DataFrame(index=sums.index)
+    stats["rows"] = sums["rows"]
+    stats["r2"] = (1 - sums["sse"] / sst.where(sst > 0)).fillna(0.0)
+    stats["normalized_energy"] = (sums["energy"] / sums["rows"] - energy_min) / (energy_max - energy_min)
+    stats["score"] = beta * stats["r2"] + (1 - beta) * (1 - stats["normalized_energy"])
+    stats["model"] = df.groupby(station)["model_used"].last()
+    return stats
+
+def update_scores(table, stats, thresholds):
+    """Monitor + analyse for all stations: EMA scores, dynamic energy thresholds and recovery cycles.
+
+    Returns (energy violated, score violated) masks over `stats.index`.
+    """
+    gamma = thresholds.get("gamma", 0.8)
+    max_energy = thresholds["max_energy"]
+    stations = stats.index
+
+    for model_name, column in zip(MODELS, EMA_COLUMNS):
+        served = stations[(stats["model"] == model_name).values]
+        previous = table.loc[served, column].astype(float).fillna(stats.loc[served, "score"])
+        table.loc[served, column] = gamma * stats.loc[served, "score"] + (1 - gamma) * previous
+
+    threshold = table.loc[stations, "energy_threshold"].astype(float).fillna(max_energy)
+    table.loc[stations, "energy_threshold"] = threshold + 0.95 * (max_energy - stats["normalized_energy"])
+    recovery = table.loc[stations, "recovery_cycles"].astype(float).fillna(0)
+    recovering = recovery > 0
+    energy_violated = ~recovering & (stats["normalized_energy"] > threshold)
+    score_violated = ~recovering & (stats["score"] < thresholds["min_score"])
+    table.loc[stations, "recovery_cycles"] = np.where(recovering, recovery - 1, np.where(energy_violated, 3, 0))
+    return energy_violated.values, score_violated.values
+
+def plan_switches(table, stations, energy_violated, score_violated, alpha):
+    """Chooses a model for every station in one (stations x models) matrix step. Returns the number switched.
+
+    As in `plan_mape`: on an energy violation the best-scoring model that is
+    cheaper than the current one (else the cheapest), on a low score the
+    best-scoring model, and with probability `alpha` a random model. A model
+    without a MODEL_ENERGY_EFFICIENCY figure counts as the most expensive.
+    """
+    current = table.loc[stations, "model"].to_numpy(dtype=object)
+    scores = table.loc[stations, EMA_COLUMNS].astype(float).fillna(DEFAULT_EMA_SCORE).to_numpy()
+    efficiency = np.array([MODEL_ENERGY_EFFICIENCY.get(m, np.inf) for m in MODELS])
+    current_efficiency = np.array([MODEL_ENERGY_EFFICIENCY.get(m, np.inf) for m in current])
+
+    cheaper = efficiency[None, :] < current_efficiency[:, None]
+    energy_scores = np.where(cheaper, scores, -np.inf)
+    energy_choice = np.where(cheaper.any(axis=1), energy_scores.argmax(axis=1), efficiency.argmin())
+    choice = np.where(energy_violated, energy_choice, scores.argmax(axis=1))
+
+    rng = np.random.default_rng()
+    explore = rng.random(len(stations)) < alpha
+    choice = np.where(explore, rng.integers(len(MODELS), size=len(stations)), choice)
+
+    chosen = np.array(MODELS, dtype=object)[choice]
+    switch = (energy_violated | score_violated | explore) & (chosen != current)
+    switched = stations[switch]
+    table.loc[switched, "model"] = chosen[switch]
+    table.loc[switched, "version"] = None  # Back to the deployed version of the new family
+    return int(switch.sum())
+
+def plan_replacements(table, drift_monitor, thresholds, now):
+    """Drift analysis for all stations: KL per station, then the closest stored version for the drifted ones.
+
+    Versions are matched for all drifted stations in one matrix operation
+    and assigned per station; nothing is published to `models/`, so other
+    stations keep their models. Drifted stations without a close version
+    keep their model (retraining serves the shared families). Each drift
+    action holds the station for the drift cooldown. Returns (replaced,
+    drifted without a close version).
+    """
+    stations, kl = drift_monitor.kl_divergences()
+    if not stations:
+        return 0, 0
+    table.loc[stations, "kl_div"] = kl
+    hold = table.loc[stations, "hold_until"].astype(float).fillna(0).to_numpy()
+    drifted = np.array(stations, dtype=object)[(kl > KL_THRESHOLD) & (hold <= now)]
+    if len(drifted) == 0:
+        return 0, 0
+
+    drifted, windows = drift_monitor.current_windows(list(drifted))
+    search = thresholds.get("version_search", "model")
+    families = None if search == "all" else [version_family(m) for m in table.loc[drifted, "model"]]
+    matches = get_model_store().best_versions(windows, families)
+    kl_best = np.array([np.inf if kl_div is None else kl_div for kl_div, _ in matches])
+    keys = np.array([key for _, key in matches], dtype=object)
+
+    close = kl_best < KL_THRESHOLD
+    replaced = np.array(drifted, dtype=object)[close]
+    table.loc[replaced, "version"] = keys[close]
+    table.loc[replaced, "model"] = [version_family(key) for key in keys[close]]
+    table.loc[drifted, "hold_until"] = now + STATION_DRIFT_COOLDOWN
+    return int(close.sum()), int((~close).sum())
+
+def execute_streams():
+    """Runs one MAPE cycle over every station and commits the station table in one write-back.
+
+    Returns {"stations", "switched", "replaced", "unmatched"} counts, or None
+    if there were no new rows.
+    """
+    start_time = time.perf_counter()
+    with get_store().cycle() as kb:
+        streams = kb.get("streams") or {}
+        thresholds = kb["thresholds"]
+        try:
+            df, tail_state = read_new_station_predictions(streams)
+        except FileNotFoundError:
+            print("⚠️ No station_predictions.csv file found.")
+            return None
+        streams.update(last_offset=tail_state["last_offset"], last_inode=tail_state["last_inode"],
+                       last_line=tail_state["last_line"])
+        if df.empty:
+            kb["streams"] = streams
+            print("📉 No new station data to process.")
+            return None
+
+        df["station"] = df["station"].astype(str)
+        drift_monitor = get_station_drift_monitor(thresholds)
+        drift_monitor.ingest(df["station"].values, df["true_value"].values)
+
+        stats = score_stations(df, thresholds)
+        table = stations_table(streams).set_index("station").reindex(columns=STATION_TABLE_COLUMNS)
+        table = table.reindex(table.index.union(stats.index))
+        table[["model", "version"]] = table[["model", "version"]].astype(object)
+        table["model"] = table["model"].fillna(stats["model"].map(version_family))
+
+        energy_violated, score_violated = update_scores(table, stats, thresholds)
+        switched = plan_switches(table, stats.index, energy_violated, score_violated, thresholds.get("alpha", 0.1))
+        replaced, unmatched = plan_replacements(table, drift_monitor, thresholds, time.time())
+
+        streams["stations"] = frame_to_value(table.rename_axis("station").reset_index())
+        kb["streams"] = streams
+
+    summary = {"stations": len(stats), "switched": switched, "replaced": replaced, "unmatched": unmatched}
+    print(f"🛰️ Stations: {len(df)} rows from {len(stats)} stations, {switched} switched, {replaced} replaced by a "
+          f"closer version, {unmatched} drifted without one ({(time.perf_counter() - start_time) * 1000:.1f} ms)")
+    return summary
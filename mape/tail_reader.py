@@ -0,0 +1,94 @@
+import io
+import os
+import pandas as pd
+
+def read_header(f):
+    """Reads the CSV header line. Returns (column names, byte offset where data starts)."""
+    f.seek(0)
+    header = f.readline()
+    if not header.endswith(b"\n"):
+        return None, 0  # Header not fully written yet
+    columns = [c.strip() for c in header.decode().strip().split(",")]
+    return columns, len(header)
+
+def offset_after_lines(f, data_start, n_lines):
+    """Byte offset after skipping `n_lines` data rows (one-off migration from `last_line`)."""
+    f.seek(data_start)
+    for _ in range(n_lines):
+        if not f.readline():
+            break
+    return f.tell()
+
+def read_appended(path, offset=None, inode=None, last_line=0):
+    """Parses only the complete rows appended to a CSV since `offset`.
+
+    Returns (df, state) where `state` holds the new "last_offset", "last_inode",
+    "last_line" and whether the file was "reset". If the file was rotated (new
+    inode) or truncated (smaller than `offset`), reading restarts after the
+    header. When no offset is known yet, the first `last_line` rows are skipped
+    once to migrate from line-based bookkeeping.
+    Raises FileNotFoundError if the file does not exist.
+    """
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        columns, data_start = read_header(f)
+        state = {"last_offset": offset, "last_inode": st.st_ino, "last_line": last_line, "reset": False}
+        if columns is None:
+            state["last_offset"] = 0
+            return pd.DataFrame(), state
+
+        if not offset:
+            offset = offset_after_lines(f, data_start, last_line)
+        elif (inode is not None and inode != st.st_ino) or st.st_size < offset or offset < data_start:
+            print(f"🔁 {path} was rotated or truncated. Reading from the start.")
+            offset = data_start
+            state["last_line"] = 0
+            state["reset"] = True
+
+        f.seek(offset)
+        data = f.read(st.st_size - offset)
+
+    # Leave a partially written last row for the next cycle
+    end = data.rfind(b"\n") + 1
+    state["last_offset"] = offset + end
+    if end == 0:
+        return pd.DataFrame(columns=columns), state
+
+    df = pd.read_csv(io.BytesIO(data[:end]), header=None, names=columns)
+    state["last_line"] += len(df)
+    return df, state
+
+def read_last_rows(path, n_rows, block_size=65536):
+    """Parses the last `n_rows` complete rows without scanning the whole file.
+
+    Returns (df, state) with the same state keys as `read_appended`, so that
+    subsequent reads can continue from the end of the file.
+    """
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        columns, data_start = read_header(f)
+        state = {"last_offset": data_start, "last_inode": st.st_ino, "last_line": 0, "reset": False}
+        if columns is None:
+            return pd.DataFrame(), state
+
+        # Walk backwards block by block until enough newlines are buffered
+        end = st.st_size
+        position, data = end, b""
+        while position > data_start and data.count(b"\n") <= n_rows:
+            step = min(block_size, position - data_start)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+
+    # Drop the partially written last row, then keep only whole rows
+    complete = data[:data.rfind(b"\n") + 1]
+    state["last_offset"] = position + len(complete)
+    lines = complete.split(b"\n")[:-1]
+    if position > data_start:
+        lines = lines[1:]  # First line may be cut in the middle
+    lines = lines[-n_rows:] if n_rows else []
+    if not lines:
+        return pd.DataFrame(columns=columns), state
+
+    df = pd.read_csv(io.BytesIO(b"\n".join(lines) + b"\n"), header=None, names=columns)
+    return df, state
@@ -0,0 +1,203 @@
+import os
+import csv
+import time
+import configparser
+from knowledge_store import get_store
+from tail_reader import read_appended
+from monitor import get_drift_monitor, refresh_drift_monitor
+from analyse import KL_THRESHOLD
+
+predictions_file = "knowledge/predictions.csv"
+trigger_log_file = "knowledge/trigger_log.csv"
+
+# Per-loop defaults. The max intervals match the old fixed timers; at the default
+# replay interval (0.15 s per row) 270 rows are the 40 s of the old MAPE cycle.
+DEFAULT_TRIGGERS = {
+    "mape": {"rows": 270, "energy": True, "min_interval": 5, "max_interval": 40},
+    "drift": {"drift": KL_THRESHOLD, "warmup": 400, "max_interval": 60, "cooldown": 400},
+    "retrain": {"max_interval": 500, "check_interval": 5},
+    "shadow": {"rows": 270, "min_interval": 10, "max_interval": 120}
+}
+
+def parse_value(value):
+    """approach.conf values: off/none/false disable a trigger, on/true enable it, anything else is a number."""
+    value = value.strip().lower()
+    if value in ("off", "none", "false", "no", ""):
+        return None
+    if value in ("on", "true", "yes"):
+        return True
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+def load_trigger_config(approach, path="approach.conf"):
+    """Trigger settings for each loop: defaults, then `[<loop>]`, then `[<approach>.<loop>]` sections.
+
+    The first line of approach.conf is the approach name; the optional
+    sections after it are INI-style, e.g.
+
+        [mape]
+        rows = 500
+        [harmone.drift]
+        warmup = off
+    """
+    parser = configparser.ConfigParser()
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            parser.read_string("".join(f.readlines()[1:]), source=path)
+
+    config = {}
+    for loop, defaults in DEFAULT_TRIGGERS.items():
+        config[loop] = dict(defaults)
+        for section in (loop, f"{approach}.{loop}"):
+            if parser.has_section(section):
+                config[loop].update({key: parse_value(value) for key, value in parser.items(section)})
+    return config
+
+def log_trigger(loop, trigger, latency, action):
+    """Appends one violation → action latency to the trigger log (created with a header on first use)."""
+    new_file = not os.path.exists(trigger_log_file)
+    with open(trigger_log_file, mode="a", newline="") as file:
+        writer = csv.writer(file)
+        if new_file:
+            writer.writerow(["timestamp", "loop", "trigger", "latency_s", "action"])
+        writer.writerow([time.time(), loop, trigger, f"{latency:.3f}", action])
+
+class LoopTrigger:
+    """Decides when one MAPE loop runs, instead of a fixed sleep.
+
+    Fires on the first of:
+    - `rows`: at least N rows appended to predictions.csv since the last run
+    - `energy`: the mean normalized energy of those rows (at least
+      `energy_rows` of them) exceeds the current energy threshold
+    - `drift`: the streaming drift monitor's KL divergence exceeds this value
+      (`True` uses the analysis threshold)
+    - `max_interval`: seconds since the last run, as a fallback; only fires if
+      new rows arrived, so an idle stream does not wake the loop
+
+    Conditions are checked every `check_interval` seconds, starting with a
+    stat() of predictions.csv, so an idle check costs one system call. With a
+    `feed` (embedded runtime) rows are counted from memory and the check runs
+    as soon as new rows arrive. No
+    trigger fires within `min_interval` seconds of the last run, during the
+    initial `warmup`, or for `cooldown` seconds after a run that took action.
+
+    `wait()` returns the trigger name and the time the violating data was
+    written; `record()` logs the violation → action latency to
+    knowledge/trigger_log.csv.
+    """
+
+    def __init__(self, name, rows=None, energy=None, energy_rows=50, drift=None, min_interval=0,
+                 max_interval=None, check_interval=1, warmup=0, cooldown=0, path=predictions_file,
+                 feed=None):
+        self.name = name
+        self.rows = rows
+        self.energy = energy
+        self.energy_rows = energy_rows
+        self.drift = KL_THRESHOLD if drift is True else drift
+        self.min_interval = min_interval or 0
+        self.max_interval = max_interval
+        self.check_interval = check_interval or 1
+        self.cooldown = cooldown or 0
+        self.path = path
+        self.feed = feed
+        self.consumer = f"{name}_trigger"
+
+        self.last_run = time.monotonic()
+        self.hold_until = self.last_run + (warmup or 0)
+        self.offset = self.inode = self.size = None
+        self.new_rows = 0
+        self.energy_sum = 0.0
+        self.data_time = None  # Write time of the newest rows seen
+        self.violation = None  # (trigger, write time of the violating rows), kept until the loop runs
+
+    def _probe(self):
+        """Counts rows appended since the last probe. Returns True if there were any."""
+        if self.feed is not None:
+            return self._count(self.feed.read(self.consumer), time.time())
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if self.offset is None:
+            # Only rows arriving after the loop starts count
+            self.offset, self.inode, self.size = st.st_size, st.st_ino, st.st_size
+            return False
+        if st.st_size == self.size and st.st_ino == self.inode:
+            return False
+
+        df, state = read_appended(self.path, self.offset, self.inode)
+        self.offset, self.inode, self.size = state["last_offset"], state["last_inode"], st.st_size
+        return self._count(df, st.st_mtime)
+
+    def _count(self, df, data_time):
+        if df.empty:
+            return False
+        self.new_rows += len(df)
+        if "energy" in df:
+            self.energy_sum += float(df["energy"].sum())
+        self.data_time = data_time
+        return True
+
+    def _energy_exceeded(self):
+        thresholds = get_store().get("thresholds") or {}
+        mape_info = get_store().get("mape_info") or {}
+        energy_min, energy_max = thresholds.get("E_m", 0), thresholds.get("E_M", 25000)
+        used_energy = (self.energy_sum / self.new_rows - energy_min) / (energy_max - energy_min)
+        limit = mape_info.get("current_energy_threshold", thresholds.get("max_energy", 1))
+        return used_energy > limit
+
+    def _drift_exceeded(self):
+        monitor = get_drift_monitor(get_store().get("thresholds") or {})
+        try:
+            refresh_drift_monitor(monitor)
+        except FileNotFoundError:
+            return False
+        return monitor.ready() and monitor.kl_divergence() > self.drift
+
+    def check(self):
+        """Evaluates the triggers once. Returns (trigger, violation time) if the loop should run now."""
+        now = time.monotonic()
+        new_data = self._probe()
+
+        if self.violation is None:
+            trigger = None
+            if self.rows and self.new_rows >= self.rows:
+                trigger = "rows"
+            elif self.energy and new_data and self.new_rows >= self.energy_rows and self._energy_exceeded():
+                trigger = "energy"
+            elif self.drift and new_data and self._drift_exceeded():
+                trigger = "drift"
+            elif self.max_interval and now - self.last_run >= self.max_interval and self.new_rows > 0:
+                trigger = "interval"
+            if trigger:
+                self.violation = (trigger, time.time() if trigger == "interval" else self.data_time)
+
+        if self.violation and now - self.last_run >= self.min_interval:
+            return self.violation
+        return None
+
+    def wait(self):
+        """Blocks until a trigger fires. Returns (trigger, violation time)."""
+        while True:
+            hold = self.hold_until - time.monotonic()
+            if self.feed is not None and hold <= 0:
+                self.feed.wait(self.consumer, self.check_interval)
+            else:
+                time.sleep(max(self.check_interval, hold))
+            fired = self.check()
+            if fired:
+                return fired
+
+    def record(self, fired, action=None):
+        """Logs the latency from violation to `action` (None if the run did nothing) and resets the counters."""
+        trigger, violated_at = fired
+        latency = time.time() - violated_at
+        log_trigger(self.name, trigger, latency, action or "none")
+        print(f"⏱️ {self.name} trigger '{trigger}' → {action or 'no action'} in {latency:.2f} s")
+
+        self.last_run = time.monotonic()
+        if action:
+            self.hold_until = self.last_run + self.cooldown
+        self.new_rows = 0
+        self.energy_sum = 0.0
+        self.violation = None
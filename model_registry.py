@@ -0,0 +1,324 @@
+import os
+import time
+import pickle
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+from sklearn.preprocessing import MinMaxScaler
+from knowledge_store import get_store
+from cascade import CASCADE, Cascade
+from compiled import compile_checked
+
+model_dir = "models"
+train_data_file = "data/pems/flow_data_train.csv"
+
+MODEL_FILES = {
+    "lstm": "lstm.pth",
+    "lstm-q": "lstm-q.pth",
+    "linear": "linear.pkl",
+    "svm": "svm.pkl"
+}
+
+# Families that run LSTMModel; "lstm-q" stores its weights as int8 (see `quantize_lstm`)
+LSTM_FAMILIES = ("lstm", "lstm-q")
+QUANTIZED_LSTM = "lstm-q"
+
+def scaler_file(model_name):
+    """File name of the scaler a model family was trained with."""
+    return f"{model_name}_scaler.pkl"
+
+# ---------------- Define LSTM Model ----------------
+class LSTMModel(nn.Module):
+    def __init__(self):
+        super(LSTMModel, self).__init__()
+        self.lstm = nn.LSTM(input_size=1, hidden_size=50, batch_first=True)
+        self.fc = nn.Linear(50, 1)
+
+    def forward(self, x):
+        _, (h_n, _) = self.lstm(x)
+        return self.fc(h_n[-1])
+
+def quantized_state(model):
+    """An LSTMModel's state dict with every weight matrix as (int8 values, float32 scale per row); biases stay float32."""
+    state = {}
+    for key, tensor in model.state_dict().items():
+        tensor = tensor.detach().float()
+        if tensor.dim() == 2:
+            scale = tensor.abs().amax(dim=1, keepdim=True).clamp(min=1e-12) / 127
+            state[key] = (torch.round(tensor / scale).clamp(-127, 127).to(torch.int8), scale)
+        else:
+            state[key] = tensor.clone()
+    return state
+
+def dequantize_state(state):
+    return {key: value[0].float() * value[1] if isinstance(value, tuple) else value for key, value in state.items()}
+
+def quantize_lstm(model):
+    """The "lstm-q" version of a trained LSTMModel: weights rounded to int8 with one scale per row.
+
+    Returns a float32 LSTMModel holding the dequantized weights, so it runs
+    through the same torch and compiled paths as "lstm"; only the int8
+    values and scales are saved (see `model_state`).
+    """
+    quantized = LSTMModel()
+    quantized.load_state_dict(dequantize_state(quantized_state(model)))
+    quantized.eval()
+    return quantized
+
+def model_state(model_name, model):
+    """What is saved for an LSTM family: the state dict, int8-quantized for "lstm-q"."""
+    if model_name == QUANTIZED_LSTM:
+        return quantized_state(model)
+    return model.state_dict()
+
+def model_from_state(model_name, state):
+    model = LSTMModel()
+    model.load_state_dict(dequantize_state(state) if model_name == QUANTIZED_LSTM else state)
+    model.eval()
+    return model
+
+def file_signature(path):
+    """Returns a cheap change signature (mtime, size) for a file, or None if missing."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def load_model(model_name, path):
+    """Deserializes one model family from disk."""
+    if model_name in LSTM_FAMILIES:
+        return model_from_state(model_name, torch.load(path, weights_only=False))
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+def predict_windows(model_name, model, scaler, windows):
+    """Predicts the next value after each raw window (batch, seq) with one model, in flow units."""
+    windows = np.asarray(windows, dtype=np.float64)
+    X_input = scaler.transform(windows.reshape(-1, 1)).reshape(len(windows), -1)
+    if model_name in LSTM_FAMILIES:
+        X_tensor = torch.tensor(X_input, dtype=torch.float32).unsqueeze(-1)
+        with torch.inference_mode():
+            predictions = model(X_tensor).numpy().reshape(-1, 1)
+    else:
+        predictions = model.predict(X_input).reshape(-1, 1)
+    return scaler.inverse_transform(predictions).flatten()
+
+def save_scaler(scaler, path):
+    with open(path, "wb") as f:
+        pickle.dump(scaler, f)
+
+def load_scaler(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+def fit_fallback_scaler():
+    """Scaler for models trained before scalers were saved: fitted on the training split, as in `tools/train_models.py`."""
+    data = pd.read_csv(train_data_file)["flow"].values
+    return MinMaxScaler().fit(data.reshape(-1, 1))
+
+class ModelRegistry:
+    """Keeps every model family resident in memory and hot-swaps on change.
+
+    The active model name comes from the knowledge store and is only re-read
+    when the store's `data_version` moves; the files in `models/` are only
+    re-read when their (mtime, size) signature changes, so the per-sample cost
+    is a dictionary lookup plus `predict`.
+    Each family keeps the scaler it was trained with (`models/<name>_scaler.pkl`),
+    so raw stream windows are scaled per model instead of by a scaler fitted on
+    the stream.
+    With `listen=True` (embedded runtime, where the MAPE loop commits in this
+    process) the active model is also re-read as soon as the store reports a
+    change to "model", so a switch applies from the next sample; the
+    `data_version` poll stays on for commits from other processes.
+    The active model may also be "cascade" (see `cascade.Cascade`): Ridge on
+    every sample, escalating to the LSTM when a confidence signal fires.
+    With `compiled=True` each family is also compiled at load time (see
+    `compiled.py`) and predicts through that path if it matches the
+    sklearn/torch output.
+    """
+
+    def __init__(self, model_dir=model_dir, store=None, poll_interval=0.05, listen=False, compiled=True):
+        self.model_dir = model_dir
+        self.store = store if store is not None else get_store()
+        self.poll_interval = poll_interval
+        self.listen = listen
+        self.model_changed = False
+        self.use_compiled = compiled
+
+        self.models = {}
+        self.scalers = {}
+        self.compiled = {}
+        self.signatures = {}
+        self.fallback_scaler = None
+        self.load_counts = {name: 0 for name in MODEL_FILES}
+        self.swap_count = 0
+        self.swap_time = 0.0  # Running total (seconds) and last value; a long-running server keeps no history
+        self.last_swap_time = None
+        self.generation = 0
+
+        self.active_name = None
+        self.cascade = None
+        self.knowledge_version = None
+        self.last_poll = 0.0
+
+        for name in MODEL_FILES:
+            self._reload(name)
+        if listen:
+            self.store.subscribe(self._on_knowledge_change)
+        self._read_active(force=True)
+
+    def _on_knowledge_change(self, keys):
+        if "model" in keys:
+            self.model_changed = True
+
+    def _reload(self, model_name):
+        """Loads a model family if its model or scaler file changed. Returns True if it was (re)loaded."""
+        path = os.path.join(self.model_dir, MODEL_FILES[model_name])
+        scaler_path = os.path.join(self.model_dir, scaler_file(model_name))
+        signature = (file_signature(path), file_signature(scaler_path))
+        if signature[0] is None:
+            if model_name not in self.models:
+                print(f"⚠️ Registry: {path} not found, {model_name} unavailable.")
+            return False
+        if signature == self.signatures.get(model_name):
+            return False
+
+        try:
+            model = load_model(model_name, path)
+            if signature[1] is not None:
+                scaler = load_scaler(scaler_path)
+            else:
+                if self.fallback_scaler is None:
+                    print(f"⚠️ Registry: {scaler_path} not found, using a scaler fitted on {train_data_file}.")
+                    self.fallback_scaler = fit_fallback_scaler()
+                scaler = self.fallback_scaler
+        except Exception as e:
+            # A writer may still be replacing the file; keep the old model and retry next poll
+            print(f"❌ Registry: failed to load {path}: {e}")
+            return False
+
+        self.models[model_name] = model
+        self.scalers[model_name] = scaler
+        if self.use_compiled:
+            self.compiled[model_name] = compile_checked(
+                model_name, model, scaler, lambda windows: predict_windows(model_name, model, scaler, windows))
+        self.signatures[model_name] = signature
+        self.load_counts[model_name] += 1
+        return True
+
+    def _read_active(self, force=False):
+        """Re-reads the active model if the knowledge store changed. Returns True if the name changed."""
+        if self.listen and self.model_changed:
+            # Committed in this process; the poll below still hears other processes (e.g. set_approach.sh)
+            self.model_changed = False
+            self.knowledge_version = self.store.data_version()
+        else:
+            version = self.store.data_version()
+            if version == self.knowledge_version and not force:
+                return False
+            self.knowledge_version = version
+
+        chosen_model = self.store.get("model")  # Model name (lstm, lstm-q, linear, svm)
+        if chosen_model is None:
+            print("Error: no model in the knowledge store. Defaulting to LSTM.")
+            chosen_model = "lstm"
+        chosen_model = chosen_model.strip().lower()
+
+        if chosen_model not in MODEL_FILES and chosen_model != CASCADE:
+            print(f"Unknown model '{chosen_model}'. Defaulting to LSTM.")
+            chosen_model = "lstm"
+
+        if chosen_model == self.active_name:
+            return False
+        if chosen_model == CASCADE:
+            self.cascade = Cascade((self.store.get("thresholds") or {}).get("cascade"))
+        self.active_name = chosen_model
+        return True
+
+    def refresh(self, force=False):
+        """Polls the knowledge store and `models/*` for changes; at most once per `poll_interval`."""
+        now = time.monotonic()
+        force = force or self.model_changed  # A switch committed in this process applies right away
+        if not force and now - self.last_poll < self.poll_interval:
+            return False
+        self.last_poll = now
+
+        start_time = time.perf_counter()
+        changed = False
+        for name in MODEL_FILES:
+            changed |= self._reload(name)
+        changed |= self._read_active()
+
+        if changed:
+            self.generation += 1
+            self.swap_count += 1
+            self.last_swap_time = time.perf_counter() - start_time
+            self.swap_time += self.last_swap_time
+        return changed
+
+    def active(self):
+        """Returns the (name, model) pair currently selected for inference.
+
+        Does not poll: callers run `refresh()` once per sample, outside the
+        timed prediction. If the selected family is not loaded, falls back to
+        the LSTM, else to any loaded family.
+        """
+        name = self.active_name
+        if name == CASCADE and "linear" in self.models and "lstm" in self.models:
+            return name, self.cascade
+        if name not in self.models:
+            if not self.models:
+                raise RuntimeError(f"No model could be loaded from {self.model_dir}/.")
+            name = "lstm" if "lstm" in self.models else next(iter(self.models))
+        return name, self.models[name]
+
+    def predict(self, window):
+        """Predicts the next value after one raw window with the active model (in flow units).
+
+        Returns (model used, prediction); for the cascade the model used names
+        the stage that answered, e.g. "cascade:linear".
+        """
+        name, model = self.active()
+        if name == CASCADE:
+            return model.predict(window, self.predict_with)
+        return name, self.predict_with(name, window)
+
+    def observe(self, true_value):
+        """Reports the true value of the last prediction (feeds the cascade's residual signal)."""
+        if self.active_name == CASCADE and self.cascade is not None:
+            self.cascade.observe(true_value)
+
+    def predict_with(self, name, window):
+        """Predicts one raw window with model family `name`, through its compiled predictor if it has one."""
+        predictor = self.compiled.get(name)
+        if predictor is not None:
+            return predictor(window)
+        return self.predict_reference(name, window)
+
+    def predict_reference(self, name, window):
+        """Predicts one raw window through sklearn/torch."""
+        model = self.models[name]
+        scaler = self.scalers[name]
+        X_input = scaler.transform(np.reshape(window, (-1, 1))).reshape(1, -1)
+        if name in LSTM_FAMILIES:
+            X_tensor = torch.tensor(X_input, dtype=torch.float32).unsqueeze(-1)
+            with torch.inference_mode():
+                prediction = model(X_tensor).numpy().flatten()[0]
+        else:
+            prediction = model.predict(X_input)[0]
+        return scaler.inverse_transform([[prediction]])[0, 0]
+
+    def stats(self):
+        """Load counts and swap latency, to confirm that models are not reloaded per sample."""
+        return {
+            "generation": self.generation,
+            "active_model": self.active_name,
+            "cascade": self.cascade.stats() if self.cascade else None,
+            "load_counts": dict(self.load_counts),
+            "compiled": sorted(name for name, predictor in self.compiled.items() if predictor is not None),
+            "swap_count": self.swap_count,
+            "last_swap_ms": self.last_swap_time * 1000 if self.swap_count else None,
+            "mean_swap_ms": self.swap_time / self.swap_count * 1000 if self.swap_count else None
+        }
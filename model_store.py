@@ -0,0 +1,432 @@
+import os
+import io
+import json
+import time
+import fcntl
+import pickle
+import hashlib
+import argparse
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import torch
+from fingerprint import (derive_edges, fingerprint, kl_divergences, kl_divergence_matrix, out_of_range_fraction,
+                         OUT_OF_RANGE_FRACTION)
+from model_registry import MODEL_FILES, LSTM_FAMILIES, scaler_file, model_state, model_from_state
+
+store_dir = "versionedMR"
+deploy_dir = "models"
+
+# Default retention policy; override with "retention" in thresholds.json
+RETENTION = {"keep_per_model": 10, "keep_candidates": 10, "max_age_days": None}
+
+def version_key(model_name, version):
+    return f"{model_name}/version_{version}"
+
+def serialize_model(model_name, model):
+    buf = io.BytesIO()
+    if model_name in LSTM_FAMILIES:
+        torch.save(model_state(model_name, model), buf)
+    else:
+        pickle.dump(model, buf)
+    return buf.getvalue()
+
+def deserialize_model(model_name, data):
+    if model_name in LSTM_FAMILIES:
+        return model_from_state(model_name, torch.load(io.BytesIO(data), weights_only=False))
+    return pickle.loads(data)
+
+def serialize_data(train_data):
+    """Training data as compressed float32 `.npz` (a fraction of the old text `data.csv`)."""
+    buf = io.BytesIO()
+    np.savez_compressed(buf, train_data=np.asarray(train_data, dtype=np.float32))
+    return buf.getvalue()
+
+def atomic_write(path, data):
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(data)
+    os.replace(tmp_file, path)
+
+class ModelStore:
+    """Versioned model repository with content-addressed, deduplicated blobs.
+
+    Layout under `versionedMR/`:
+      - `blobs/<xx>/<sha256>`: read-only model, scaler and training-data blobs
+        (identical content is stored once)
+      - `manifest.json`: every version's blobs, metrics and data fingerprint,
+        plus the shared fingerprint edges and the next version number per model
+      - `current.json`: the version deployed per model family
+
+    The deployed files in `models/` are hard links to the current blobs,
+    swapped in atomically with `os.replace`, so the inference registry keeps
+    watching `models/` unchanged. Manifest updates are serialized with a lock
+    file; readers see whole files only.
+    """
+
+    def __init__(self, root=store_dir, deploy_dir=deploy_dir):
+        self.root = root
+        self.deploy_dir = deploy_dir
+        self.blob_dir = os.path.join(root, "blobs")
+        self.manifest_file = os.path.join(root, "manifest.json")
+        self.current_file = os.path.join(root, "current.json")
+        self.lock_file = os.path.join(root, ".lock")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(deploy_dir, exist_ok=True)
+
+    @contextmanager
+    def locked(self):
+        """Exclusive lock across processes (retrain worker, MAPE threads, tools)."""
+        with open(self.lock_file, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # ---------------- Blobs ----------------
+
+    def blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def put_blob(self, data):
+        """Stores `data` under its SHA-256 digest (once) and returns the digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write(path, data)
+            os.chmod(path, 0o444)  # Deployed hard links must never be written in place
+        return digest
+
+    def read_blob(self, digest):
+        with open(self.blob_path(digest), "rb") as f:
+            return f.read()
+
+    def has_blobs(self, entry):
+        return all(os.path.exists(self.blob_path(entry[k])) for k in ("model_blob", "data_blob"))
+
+    # ---------------- Manifest ----------------
+
+    def load_manifest(self):
+        """Loads the manifest, importing legacy `versionedMR/<model>/version_N/` directories on first use."""
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, "r") as f:
+                return json.load(f)
+        manifest = {"edges": None, "next_version": {}, "versions": {}}
+        legacy = self.scan_legacy()
+        if legacy:
+            manifest = self.import_legacy(manifest, legacy)
+            self.save_manifest(manifest)
+        return manifest
+
+    def save_manifest(self, manifest):
+        atomic_write(self.manifest_file, json.dumps(manifest).encode())
+
+    def load_current(self):
+        if not os.path.exists(self.current_file):
+            return {}
+        with open(self.current_file, "r") as f:
+            return json.load(f)
+
+    def entries(self, model_name=None):
+        """Version entries (of `model_name`, or all), oldest first."""
+        versions = self.load_manifest()["versions"].values()
+        return sorted((e for e in versions if model_name is None or e["model"] == model_name),
+                      key=lambda e: (e["model"], e["version"]))
+
+    def load_version(self, entry):
+        """The (model, scaler) of a stored version; scaler is None for legacy versions saved without one."""
+        model = deserialize_model(entry["model"], self.read_blob(entry["model_blob"]))
+        scaler = pickle.loads(self.read_blob(entry["scaler_blob"])) if entry.get("scaler_blob") else None
+        return model, scaler
+
+    def load_data(self, entry):
+        with np.load(io.BytesIO(self.read_blob(entry["data_blob"]))) as npz:
+            return npz["train_data"].astype(np.float64)
+
+    # ---------------- Versions ----------------
+
+    def add_version(self, model_name, model, scaler, train_data, metrics=None, publish=True, candidate=False,
+                    retention=None):
+        """Stores a trained model with its scaler, training data, metrics and fingerprint.
+
+        Publishes it to `models/` unless `publish` is False, then applies the
+        retention policy. A `candidate` (an unpublished retrain variant) is
+        retained under `keep_candidates` instead of `keep_per_model`, so it
+        never evicts published versions. Returns the manifest entry.
+        """
+        train_data = np.asarray(train_data, dtype=np.float64)
+        model_bytes = serialize_model(model_name, model)
+        scaler_bytes = pickle.dumps(scaler)
+        data_bytes = serialize_data(train_data)
+
+        with self.locked():
+            manifest = self.load_manifest()
+            version = manifest["next_version"].get(model_name, 1)
+            manifest["next_version"][model_name] = version + 1
+
+            entry = {
+                "model": model_name,
+                "version": version,
+                "created": time.time(),
+                "model_blob": self.put_blob(model_bytes),
+                "scaler_blob": self.put_blob(scaler_bytes),
+                "data_blob": self.put_blob(data_bytes),
+                "metrics": metrics or {}
+            }
+            if candidate:
+                entry["candidate"] = True
+            if manifest["edges"] is None:
+                manifest["edges"] = derive_edges(train_data.min(), train_data.max()).tolist()
+            entry.update(fingerprint(train_data, np.asarray(manifest["edges"])))
+            manifest["versions"][version_key(model_name, version)] = entry
+
+            if out_of_range_fraction(train_data, manifest["edges"]) > OUT_OF_RANGE_FRACTION:
+                self.rebuild_fingerprints(manifest)
+            self.save_manifest(manifest)
+            if publish:
+                self._publish(entry)
+
+        print(f"✔ {model_name} stored as {version_key(model_name, version)}"
+              f"{' and published to ' + self.deploy_dir if publish else ''}")
+        self.gc(**(retention or RETENTION))
+        return entry
+
+    def _deploy(self, digest, target):
+        """Atomically points `target` at a blob (hard link, or a copy across file systems)."""
+        tmp_file = f"{target}.{os.getpid()}.tmp"
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        try:
+            os.link(self.blob_path(digest), tmp_file)
+        except OSError:
+            atomic_write(tmp_file, self.read_blob(digest))
+        os.replace(tmp_file, target)
+
+    def _publish(self, entry):
+        model_name = entry["model"]
+        self._deploy(entry["model_blob"], os.path.join(self.deploy_dir, MODEL_FILES[model_name]))
+        if entry.get("scaler_blob"):
+            self._deploy(entry["scaler_blob"], os.path.join(self.deploy_dir, scaler_file(model_name)))
+        current = self.load_current()
+        current[model_name] = version_key(model_name, entry["version"])
+        atomic_write(self.current_file, json.dumps(current, indent=4).encode())
+
+    def publish(self, key):
+        """Deploys version `key` (e.g. "lstm/version_3") to `models/`. Returns its entry."""
+        with self.locked():
+            manifest = self.load_manifest()
+            entry = manifest["versions"][key]
+            if entry.pop("candidate", False):
+                self.save_manifest(manifest)  # Once deployed it is retained like any published version
+            self._publish(entry)
+        return entry
+
+    def current(self, model_name):
+        return self.load_current().get(model_name)
+
+    # ---------------- Fingerprints ----------------
+
+    def rebuild_fingerprints(self, manifest, extra_data=None):
+        """Re-derives shared edges from all versions (and `extra_data`) and recomputes every fingerprint."""
+        entries = [e for e in manifest["versions"].values() if self.has_blobs(e)]
+        lows = [e["min"] for e in entries]
+        highs = [e["max"] for e in entries]
+        if extra_data is not None and len(extra_data):
+            lows.append(float(np.min(extra_data)))
+            highs.append(float(np.max(extra_data)))
+        if not lows:
+            return manifest
+
+        edges = derive_edges(min(lows), max(highs))
+        manifest["edges"] = edges.tolist()
+        for entry in entries:
+            entry.update(fingerprint(self.load_data(entry), edges))
+        print(f"🔧 Rebuilt fingerprints over {len(entries)} versions")
+        return manifest
+
+    def closest_versions(self, data, model_name=None):
+        """KL divergence of `data` against every stored version (of `model_name`, or of all families).
+
+        Returns a list of (kl_div, entry) sorted from closest to farthest.
+        """
+        manifest = self.load_manifest()
+        if manifest["edges"] is None:
+            return []
+
+        if out_of_range_fraction(data, manifest["edges"]) > OUT_OF_RANGE_FRACTION:
+            with self.locked():
+                manifest = self.rebuild_fingerprints(self.load_manifest(), extra_data=data)
+                self.save_manifest(manifest)
+
+        entries = [dict(e, key=k) for k, e in manifest["versions"].items()
+                   if (model_name is None or e["model"] == model_name) and self.has_blobs(e)]
+        if not entries:
+            return []
+
+        kl = kl_divergences(data, [e["hist"] for e in entries], np.asarray(manifest["edges"]))
+        order = np.argsort(kl)
+        return [(float(kl[i]), entries[i]) for i in order]
+
+    def best_versions(self, data_matrix, model_names=None):
+        """Closest stored version for every row of `data_matrix` (e.g. one station's window per row).
+
+        All rows are compared with all versions in one matrix operation.
+        `model_names[i]` restricts row i to versions of that family; None
+        searches every family. Returns (kl_div, version key) per row, or
+        (None, None) where no version qualifies.
+        """
+        manifest = self.load_manifest()
+        keys = [k for k, e in manifest["versions"].items() if self.has_blobs(e)]
+        if manifest["edges"] is None or not keys or len(data_matrix) == 0:
+            return [(None, None)] * len(data_matrix)
+
+        versions = [manifest["versions"][k] for k in keys]
+        kl = kl_divergence_matrix(data_matrix, [e["hist"] for e in versions], np.asarray(manifest["edges"]))
+        if model_names is not None:
+            families = np.array([e["model"] for e in versions], dtype=object)
+            kl = np.where(families[None, :] == np.asarray(model_names, dtype=object)[:, None], kl, np.inf)
+        best = np.argmin(kl, axis=1)
+        return [(float(kl[i, b]), keys[b]) if np.isfinite(kl[i, b]) else (None, None) for i, b in enumerate(best)]
+
+    # ---------------- Retention ----------------
+
+    def gc(self, keep_per_model=10, max_age_days=None, keep_candidates=10):
+        """Drops versions outside the retention policy, then deletes unreferenced blobs.
+
+        Per model, the newest `keep_per_model` versions (all if None) are kept,
+        and separately the newest `keep_candidates` unpublished candidates,
+        minus those older than `max_age_days`; the current version is always
+        kept. Returns (versions removed, bytes freed).
+        """
+        with self.locked():
+            manifest = self.load_manifest()
+            current = set(self.load_current().values())
+            cutoff = time.time() - max_age_days * 86400 if max_age_days else None
+
+            removed = []
+            groups = {(e["model"], e.get("candidate", False)) for e in manifest["versions"].values()}
+            for model_name, candidate in groups:
+                newest_first = sorted((e for e in manifest["versions"].values()
+                                       if e["model"] == model_name and e.get("candidate", False) == candidate),
+                                      key=lambda e: e["version"], reverse=True)
+                keep = keep_candidates if candidate else keep_per_model
+                for rank, entry in enumerate(newest_first):
+                    key = version_key(model_name, entry["version"])
+                    expired = (keep is not None and rank >= keep) or \
+                              (cutoff is not None and entry["created"] < cutoff)
+                    if expired and key not in current:
+                        del manifest["versions"][key]
+                        removed.append(key)
+            if removed:
+                self.save_manifest(manifest)
+
+            referenced = {e[k] for e in manifest["versions"].values()
+                          for k in ("model_blob", "scaler_blob", "data_blob") if e.get(k)}
+            freed = 0
+            for prefix in os.listdir(self.blob_dir):
+                for digest in os.listdir(os.path.join(self.blob_dir, prefix)):
+                    if digest not in referenced and not digest.endswith(".tmp"):
+                        path = self.blob_path(digest)
+                        freed += os.path.getsize(path)
+                        os.remove(path)
+
+        if removed or freed:
+            print(f"🧹 Model store GC: removed {len(removed)} versions, freed {freed / 1024:.1f} KiB")
+        return removed, freed
+
+    # ---------------- Legacy Import ----------------
+
+    def scan_legacy(self):
+        """Legacy `versionedMR/<model>/version_N/` directories with a model file and `data.csv`."""
+        found = []
+        for model_name, model_file in MODEL_FILES.items():
+            model_path = os.path.join(self.root, model_name)
+            if not os.path.isdir(model_path):
+                continue
+            for d in os.listdir(model_path):
+                version_path = os.path.join(model_path, d)
+                if d.startswith("version_") and os.path.exists(os.path.join(version_path, "data.csv")) \
+                        and os.path.exists(os.path.join(version_path, model_file)):
+                    found.append((model_name, int(d.split("_")[-1]), version_path))
+        return sorted(found)
+
+    def import_legacy(self, manifest, legacy):
+        """Moves legacy version directories into blobs (kept on disk; delete them once migrated)."""
+        deployed = {}
+        for model_name, model_file in MODEL_FILES.items():
+            path = os.path.join(self.deploy_dir, model_file)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    deployed[model_name] = hashlib.sha256(f.read()).hexdigest()
+
+        current = self.load_current()
+        for model_name, version, version_path in legacy:
+            with open(os.path.join(version_path, MODEL_FILES[model_name]), "rb") as f:
+                model_blob = self.put_blob(f.read())
+            scaler_path = os.path.join(version_path, scaler_file(model_name))
+            scaler_blob = None
+            if os.path.exists(scaler_path):
+                with open(scaler_path, "rb") as f:
+                    scaler_blob = self.put_blob(f.read())
+            train_data = pd.read_csv(os.path.join(version_path, "data.csv"))["train_data"].values
+
+            entry = {
+                "model": model_name,
+                "version": version,
+                "created": os.path.getmtime(version_path),
+                "model_blob": model_blob,
+                "scaler_blob": scaler_blob,
+                "data_blob": self.put_blob(serialize_data(train_data)),
+                "metrics": {},
+                "min": float(train_data.min()),
+                "max": float(train_data.max())
+            }
+            manifest["versions"][version_key(model_name, version)] = entry
+            manifest["next_version"][model_name] = max(manifest["next_version"].get(model_name, 1), version + 1)
+            if deployed.get(model_name) == model_blob:
+                current[model_name] = version_key(model_name, version)
+
+        self.rebuild_fingerprints(manifest)
+        atomic_write(self.current_file, json.dumps(current, indent=4).encode())
+        print(f"📦 Imported {len(legacy)} legacy versions into {self.manifest_file}. "
+              f"The old version directories can be deleted.")
+        return manifest
+
+stores = {}
+
+def get_model_store(root=store_dir):
+    """Process-wide model store for `root`."""
+    if root not in stores:
+        stores[root] = ModelStore(root)
+    return stores[root]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and maintain the versioned model store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="List stored versions.")
+    publish_parser = subparsers.add_parser("publish", help="Deploy a stored version to models/.")
+    publish_parser.add_argument("key", help='Version key, e.g. "lstm/version_3".')
+    gc_parser = subparsers.add_parser("gc", help="Apply a retention policy and delete unreferenced blobs.")
+    gc_parser.add_argument("--keep_per_model", type=int, default=RETENTION["keep_per_model"],
+                           help="Newest versions to keep per model (default: %(default)s).")
+    gc_parser.add_argument("--keep_candidates", type=int, default=RETENTION["keep_candidates"],
+                           help="Newest unpublished retrain candidates to keep per model (default: %(default)s).")
+    gc_parser.add_argument("--max_age_days", type=float, default=RETENTION["max_age_days"],
+                           help="Drop versions older than this (default: no age limit).")
+    args = parser.parse_args()
+
+    store = get_model_store()
+    if args.command == "list":
+        current = set(store.load_current().values())
+        for entry in store.entries():
+            key = version_key(entry["model"], entry["version"])
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["created"]))
+            print(f"{'*' if key in current else ' '} {key:<20} {created}  n={entry['count']:<7} "
+                  f"mean={entry['mean']:.1f}  {entry['metrics']}")
+    elif args.command == "publish":
+        store.publish(args.key)
+        print(f"✔ Published {args.key} to {store.deploy_dir}; re-run tools/calibrate.py --models {args.key.split('/')[0]}")
+    else:
+        store.gc(args.keep_per_model, args.max_age_days, args.keep_candidates)
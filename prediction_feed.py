@@ -0,0 +1,53 @@
+import itertools
+import threading
+from collections import deque
+import pandas as pd
+from prediction_writer import PREDICTION_COLUMNS
+
+class PredictionFeed:
+    """In-memory stream of completed prediction rows for the embedded runtime.
+
+    Inference appends the rows it also hands to the `PredictionWriter`; the
+    MAPE monitors and triggers read them from here instead of re-parsing
+    predictions.csv. Each consumer (e.g. "mape", "drift") has its own cursor,
+    so a read returns only the rows that consumer has not seen yet. The last
+    `capacity` rows are kept; a consumer that falls further behind skips the
+    oldest rows with a warning.
+    """
+
+    def __init__(self, columns=PREDICTION_COLUMNS, capacity=10000):
+        self.columns = list(columns)
+        self.rows = deque(maxlen=capacity)
+        self.start = 0  # Stream index of rows[0]
+        self.cursors = {}
+        self.cond = threading.Condition()
+
+    def _end(self):
+        return self.start + len(self.rows)
+
+    def append(self, rows):
+        """Adds completed rows and wakes consumers waiting for them."""
+        if not rows:
+            return
+        with self.cond:
+            for row in rows:
+                if len(self.rows) == self.rows.maxlen:
+                    self.start += 1
+                self.rows.append(row)
+            self.cond.notify_all()
+
+    def read(self, consumer):
+        """Rows appended since `consumer`'s last read, as a DataFrame (every buffered row on the first read)."""
+        with self.cond:
+            cursor = self.cursors.get(consumer, self.start)
+            if cursor < self.start:
+                print(f"⚠️ Feed: {consumer} fell behind, skipping {self.start - cursor} rows.")
+                cursor = self.start
+            rows = list(itertools.islice(self.rows, cursor - self.start, None))
+            self.cursors[consumer] = self._end()
+        return pd.DataFrame(rows, columns=self.columns)
+
+    def wait(self, consumer, timeout):
+        """Blocks until there are rows `consumer` has not read, or `timeout` seconds pass. Returns True if there are."""
+        with self.cond:
+            return self.cond.wait_for(lambda: self.cursors.get(consumer, self.start) < self._end(), timeout)
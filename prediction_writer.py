@@ -0,0 +1,149 @@
+import os
+import csv
+import time
+import atexit
+import signal
+import threading
+
+# Columns consumed by `mape/monitor.py`
+PREDICTION_COLUMNS = ["true_value", "predicted_value", "model_used", "inference_time", "energy"]
+
+DURABILITY_POLICIES = ("none", "flush", "row")
+
+class PredictionWriter:
+    """Buffered appender for `knowledge/predictions.csv`.
+
+    Rows are kept in a fixed-size in-memory ring buffer and written in one
+    batch every `flush_rows` rows or `flush_ms` milliseconds, whichever comes
+    first. The durability policy decides when the OS is asked to persist data:
+      - "none":  rely on the OS page cache (fastest)
+      - "flush": fsync after every batch
+      - "row":   write and fsync every row (no batching)
+    Pending rows are flushed on `close()`, at interpreter exit and on SIGTERM.
+    """
+
+    def __init__(self, path, columns=PREDICTION_COLUMNS, flush_rows=100, flush_ms=1000, durability="none"):
+        if durability not in DURABILITY_POLICIES:
+            raise ValueError(f"Unknown durability policy '{durability}', expected one of {DURABILITY_POLICIES}")
+
+        self.path = path
+        self.columns = list(columns)
+        self.flush_rows = 1 if durability == "row" else max(1, int(flush_rows))
+        self.flush_interval = flush_ms / 1000.0
+        self.durability = durability
+
+        # Ring buffer: slots are reused, `count` rows starting at `head` are pending
+        self.buffer = [None] * self.flush_rows
+        self.head = 0
+        self.count = 0
+        self.rows_written = 0
+        self.flushes = 0
+
+        self.lock = threading.Lock()
+        self.closed = False
+        self.flushing = False  # True while the main thread is inside a flush
+        self.pending_signal = None  # SIGTERM that arrived during such a flush
+
+        write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", newline="")
+        self.writer = csv.writer(self.file)
+        if write_header:
+            self.writer.writerow(self.columns)
+            self._sync()
+        self.last_flush = time.monotonic()
+
+        # Time-based flushes also happen while the stream is idle
+        self.stop_event = threading.Event()
+        self.flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self.flusher.start()
+
+        atexit.register(self.close)
+        self._install_sigterm_handler()
+
+    def _install_sigterm_handler(self):
+        """Turn SIGTERM into a normal exit so the atexit hook flushes pending rows."""
+        self.previous_handler = None
+        if threading.current_thread() is not threading.main_thread():
+            return
+        previous = signal.getsignal(signal.SIGTERM)
+
+        def handle_sigterm(signum, frame):
+            if self.flushing:
+                # Exit once the interrupted flush has written its rows
+                self.pending_signal = signum
+                return
+            # Closing here could re-enter a flush interrupted by the signal; unwind first
+            if callable(previous):
+                previous(signum, frame)
+            raise SystemExit(128 + signum)
+        self.previous_handler = previous
+
+        signal.signal(signal.SIGTERM, handle_sigterm)
+
+    def _sync(self):
+        self.file.flush()
+        if self.durability != "none":
+            os.fsync(self.file.fileno())
+
+    def append(self, row):
+        """Queues one row (in `columns` order) and flushes if the buffer is due."""
+        with self.lock:
+            if self.closed:
+                raise ValueError("PredictionWriter is closed")
+            self.buffer[(self.head + self.count) % self.flush_rows] = row
+            self.count += 1
+            if self.count >= self.flush_rows or time.monotonic() - self.last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        in_main = threading.current_thread() is threading.main_thread()
+        if in_main:
+            self.flushing = True
+        try:
+            if self.count:
+                # The ring state advances row by row, so an interrupted flush never writes a row twice or loses one
+                while self.count:
+                    self.writer.writerow(self.buffer[self.head])
+                    self.buffer[self.head] = None
+                    self.head = (self.head + 1) % self.flush_rows
+                    self.count -= 1
+                    self.rows_written += 1
+                self.flushes += 1
+                self._sync()
+            self.last_flush = time.monotonic()
+        finally:
+            if in_main:
+                self.flushing = False
+        if in_main and self.pending_signal is not None:
+            signum, self.pending_signal = self.pending_signal, None
+            if callable(self.previous_handler):
+                self.previous_handler(signum, None)
+            raise SystemExit(128 + signum)
+
+    def flush(self):
+        """Writes all pending rows now."""
+        with self.lock:
+            if not self.closed:
+                self._flush_locked()
+
+    def _flush_periodically(self):
+        while not self.stop_event.wait(self.flush_interval):
+            with self.lock:
+                if not self.closed and self.count and time.monotonic() - self.last_flush >= self.flush_interval:
+                    self._flush_locked()
+
+    def close(self):
+        """Flushes pending rows and closes the file. Safe to call more than once."""
+        self.stop_event.set()
+        with self.lock:
+            if self.closed:
+                return
+            self._flush_locked()
+            self.file.close()
+            self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,139 +1,383 @@
 import os
+import csv
+import time
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 import torch
-import torch.nn as nn
-import torch.optim as optim
-import pickle
 from sklearn.svm import SVR
-from sklearn.linear_model import Ridge
+from sklearn.linear_model import Ridge, SGDRegressor
 from sklearn.preprocessing import MinMaxScaler
-from torch.utils.data import DataLoader, TensorDataset
+from threadpoolctl import threadpool_limits
+from data_pipeline import create_sequences
+import training
+import calibration
+from model_registry import (MODEL_FILES, LSTM_FAMILIES, QUANTIZED_LSTM, LSTMModel, scaler_file, load_model,
+                            load_scaler, quantize_lstm)
+from model_store import get_model_store, version_key, RETENTION
+from knowledge_store import get_store, value_to_frame
 
-# Ensure directories exist
-base_dir = "versionedMR"
-os.makedirs(base_dir, exist_ok=True)
 model_dir = "models"
-os.makedirs(model_dir, exist_ok=True)
-
-drift_file = "knowledge/drift.csv"
-model_file = "knowledge/model.csv"
-
-def get_next_version(model_name):
-    """Finds the next version number for a given model."""
-    model_dir = os.path.join(base_dir, model_name)
-    os.makedirs(model_dir, exist_ok=True)
-    existing_versions = [d for d in os.listdir(model_dir) if d.startswith("version_")]
-
-    if existing_versions:
-        existing_versions = sorted([int(v.split("_")[-1]) for v in existing_versions])
-        return existing_versions[-1] + 1
-    return 1
-
-def save_model_and_data(model, model_name, train_data):
-    """Saves trained model and its data in `models/` and `versionedMR/`."""
-    version = get_next_version(model_name)
-    version_path = os.path.join(base_dir, model_name, f"version_{version}")
-    os.makedirs(version_path, exist_ok=True)
-
-    # Save model
-    if model_name == "lstm":
-        model_path = os.path.join(model_dir, f"{model_name}.pth")
-        torch.save(model.state_dict(), model_path)
-        torch.save(model.state_dict(), os.path.join(version_path, f"{model_name}.pth"))
+
+retrain_log_file = "knowledge/retrain_log.csv"
+RETRAIN_LOG_COLUMNS = ["timestamp", "model", "mode", "epochs", "full_epochs", "epochs_saved",
+                       "wall_time", "est_wall_time_saved", "val_mse"]
+
+RETRAIN_MODES = ("full", "warm")
+FULL_EPOCHS = 50        # Epoch budget of a from-scratch retrain (and cap for warm starts)
+HOLDOUT_FRACTION = 0.2  # Most recent share of the drift window used for early stopping
+PATIENCE = 3            # Epochs without validation improvement before stopping
+
+# Drift retrain of every family at once (`--model all`): candidates per family,
+# the first one being the configuration `retrain` uses
+ALL_FAMILIES = "all"
+CANDIDATES = {
+    "lstm": [{"lr": 0.003}, {"lr": 0.001}],
+    "linear": [{"alpha": 200}, {"alpha": 50}, {"alpha": 800}],
+    "svm": [{"C": 0.05}, {"C": 0.5}],
+}
+
+def save_model_and_data(model, model_name, train_data, scaler, metrics=None, retention=None):
+    """Stores the trained model, its scaler and its data as a new version and deploys it to `models/`. Returns its entry."""
+    return get_model_store().add_version(model_name, model, scaler, train_data["train_data"].values,
+                                  metrics=metrics, retention=retention)
+
+def recalibrate(models):
+    """Re-measures just-published versions in the calibration profile, if there is one.
+
+    `models` maps a family to (version key, model, scaler), as held in memory
+    after training. Returns True if all of them were measured.
+    """
+    if not models or get_store().get("profile") is None:
+        return False
+    return len(calibration.recalibrate(models)) == len(models)
+
+def recalibrate_published(model_names):
+    """`recalibrate` for the versions of `model_names` published in the model store (after a version replacement)."""
+    if not model_names or get_store().get("profile") is None:
+        return False
+    return len(calibration.recalibrate_published(model_names)) == len(model_names)
+
+def train_lstm(X_train, y_train, model=None, X_val=None, y_val=None):
+    """Trains an LSTM model with the shared training engine, from scratch or by fine-tuning `model`.
+
+    With a validation set, training stops after `PATIENCE` epochs without
+    improvement and the best weights are kept. Returns (model, epochs run).
+    """
+    if model is None:
+        model, history = training.train_lstm(LSTMModel(), X_train, y_train, epochs=FULL_EPOCHS)
     else:
-        model_path = os.path.join(model_dir, f"{model_name}.pkl")
-        with open(model_path, "wb") as f:
-            pickle.dump(model, f)
-        with open(os.path.join(version_path, f"{model_name}.pkl"), "wb") as f:
-            pickle.dump(model, f)
-
-    # Save training data
-    train_data.to_csv(os.path.join(version_path, "data.csv"), index=False)
-    print(f"✔ {model_name} saved at {version_path} and {model_path}")
-
-def create_sequences(data, seq_length=5):
-    """Creates time series sequences for training."""
-    X, y = [], []
-    for i in range(len(data) - seq_length):
-        X.append(data[i:i+seq_length])
-        y.append(data[i+seq_length])
-    return np.array(X), np.array(y)
-
-class LSTMModel(nn.Module):
-    """LSTM model architecture"""
-    def __init__(self):
-        super(LSTMModel, self).__init__()
-        self.lstm = nn.LSTM(input_size=1, hidden_size=50, batch_first=True)
-        self.fc = nn.Linear(50, 1)
-
-    def forward(self, x):
-        _, (h_n, _) = self.lstm(x)
-        return self.fc(h_n[-1])
-
-def train_lstm(X_train, y_train):
-    """Trains an LSTM model."""
-    X_train_tensor = torch.tensor(X_train, dtype=torch.float32).unsqueeze(-1)
-    y_train_tensor = torch.tensor(y_train, dtype=torch.float32).unsqueeze(-1)
-    
-    model = LSTMModel()
-    criterion = nn.MSELoss()
-    optimizer = optim.Adam(model.parameters(), lr=0.001)
-    train_loader = DataLoader(TensorDataset(X_train_tensor, y_train_tensor), batch_size=16, shuffle=True)
-
-    num_epochs = 50
-    for epoch in range(num_epochs):
-        for X_batch, y_batch in train_loader:
-            optimizer.zero_grad()
-            output = model(X_batch)
-            loss = criterion(output, y_batch)
-            loss.backward()
-            optimizer.step()
-
-    return model
-
-def retrain():
-    """Retrains the current model using `drift.csv`."""
-    if not os.path.exists(drift_file) or not os.path.exists(model_file):
-        print("❌ Missing required files: `drift.csv` or `model.csv`.")
-        return
-
-    try:
-        drift_data = pd.read_csv(drift_file)["true_value"].values
-        with open(model_file, "r") as f:
-            model_name = f.read().strip()
-    except Exception as e:
-        print(f"❌ Error loading files: {e}")
-        return
-
-    print(f"🚀 Retraining {model_name} using drift data...")
-
-    # Preprocess data
-    scaler = MinMaxScaler()
-    data_scaled = scaler.fit_transform(drift_data.reshape(-1, 1)).flatten()
+        # Fine-tuning: the original learning rate, no annealing, early stopping on the held-out tail;
+        # the deployed weights are kept if fine-tuning only makes the validation loss worse
+        model, history = training.train_lstm(model, X_train, y_train, epochs=FULL_EPOCHS, lr=0.001,
+                                             scheduler=None, X_val=X_val, y_val=y_val, patience=PATIENCE,
+                                             keep_initial=True)
+    print(f"🏋️ LSTM: {history['epochs']} epochs at {history['samples_per_s']:,.0f} samples/s")
+    return model, history["epochs"]
+
+def warm_start_linear(model_name, model, X_train, y_train, X_val, y_val):
+    """Continues a Ridge/SVR (or earlier warm-started) model with `SGDRegressor.partial_fit`.
+
+    The SGD objective matches the original family: squared loss with Ridge's
+    alpha=200, or epsilon-insensitive loss with SVR's C=0.05, both rescaled to
+    SGD's per-sample regularization. Returns (model, epochs run).
+    """
+    n_samples = len(X_train)
+    if model_name == "linear":
+        sgd = SGDRegressor(loss="squared_error", alpha=200 / n_samples,
+                           learning_rate="constant", eta0=0.001)
+    else:
+        sgd = SGDRegressor(loss="epsilon_insensitive", epsilon=0.1, alpha=1 / (0.05 * n_samples),
+                           learning_rate="constant", eta0=0.001)
+    # Start from the active model's coefficients instead of zero
+    sgd.coef_ = np.ravel(model.coef_).astype(np.float64)
+    sgd.intercept_ = np.ravel(model.intercept_).astype(np.float64)
+
+    best_loss = np.mean((model.predict(X_val) - y_val) ** 2)
+    best_coef, best_intercept, stale = sgd.coef_.copy(), sgd.intercept_.copy(), 0
+    for epoch in range(FULL_EPOCHS):
+        sgd.partial_fit(X_train, y_train)
+        val_loss = np.mean((sgd.predict(X_val) - y_val) ** 2)
+        if val_loss < best_loss:
+            best_loss, best_coef, best_intercept, stale = val_loss, sgd.coef_.copy(), sgd.intercept_.copy(), 0
+        else:
+            stale += 1
+            if stale >= PATIENCE:
+                break
+
+    sgd.coef_, sgd.intercept_ = best_coef, best_intercept
+    return sgd, epoch + 1
+
+def load_active(model_name):
+    """The model and scaler currently deployed in `models/`, or (None, None) if either is missing."""
+    path = os.path.join(model_dir, MODEL_FILES[model_name])
+    scaler_path = os.path.join(model_dir, scaler_file(model_name))
+    if not os.path.exists(path) or not os.path.exists(scaler_path):
+        return None, None
+    return load_model(model_name, path), load_scaler(scaler_path)
+
+def log_retrain(row):
+    """Appends one retrain's cost to `retrain_log.csv` (warm vs. full comparison)."""
+    new_file = not os.path.exists(retrain_log_file)
+    with open(retrain_log_file, "a", newline="") as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(RETRAIN_LOG_COLUMNS)
+        writer.writerow([row.get(c) for c in RETRAIN_LOG_COLUMNS])
+
+def validation_mse(model_name, model, X_val, y_val):
+    if model_name in LSTM_FAMILIES:
+        with torch.inference_mode():
+            predictions = model(torch.tensor(X_val, dtype=torch.float32).unsqueeze(-1)).numpy().flatten()
+    else:
+        predictions = model.predict(X_val)
+    return float(np.mean((predictions - y_val) ** 2))
+
+def retrain(model_name=None, mode=None):
+    """Retrains `model_name` (default: the current model) using the drift data in the knowledge store.
+
+    `mode` (default: `retrain_mode` in thresholds) is "full" to train from
+    scratch or "warm" to fine-tune the model deployed in `models/` with its
+    own scaler and early stopping on the most recent `HOLDOUT_FRACTION` of
+    the drift window. Returns True if a new version was saved.
+    """
+    with get_store().snapshot() as kb:
+        drift_window = value_to_frame(kb["drift"])
+        model_name = model_name or kb["model"]
+        thresholds = kb.get("thresholds", {})
+        mode = mode or thresholds.get("retrain_mode", "full")
+        retention = thresholds.get("retention", RETENTION)
+
+    if drift_window.empty or "true_value" not in drift_window or not model_name:
+        print("❌ Missing knowledge: no drift data or no current model.")
+        return False
+    if model_name not in MODEL_FILES:
+        print(f"❌ Unknown model type: {model_name}")
+        return False
+    drift_data = drift_window["true_value"].values
+
+    active_model, scaler = load_active(model_name) if mode == "warm" else (None, None)
+    if mode == "warm" and active_model is None:
+        print(f"⚠️ No deployed {model_name} to warm-start from. Retraining from scratch.")
+        mode = "full"
+    print(f"🚀 Retraining {model_name} using drift data ({mode})...")
+
+    # Preprocess data (a warm start keeps the scaler the deployed model was trained with)
+    if mode == "full":
+        scaler = MinMaxScaler().fit(drift_data.reshape(-1, 1))
+    data_scaled = scaler.transform(drift_data.reshape(-1, 1)).flatten()
     seq_length = 5
     X_train, y_train = create_sequences(data_scaled, seq_length)
 
     # Train model
-    if model_name == "linear":
+    start_time = time.perf_counter()
+    val_mse = None
+    if mode == "warm":
+        split = int(len(X_train) * (1 - HOLDOUT_FRACTION))
+        X_fit, y_fit, X_val, y_val = X_train[:split], y_train[:split], X_train[split:], y_train[split:]
+        if model_name in LSTM_FAMILIES:
+            model, epochs = train_lstm(X_fit, y_fit, active_model, X_val, y_val)
+        else:
+            model, epochs = warm_start_linear(model_name, active_model, X_fit, y_fit, X_val, y_val)
+    elif model_name == "linear":
         model = Ridge(alpha=200)
         model.fit(X_train, y_train)
+        epochs = None
     elif model_name == "svm":
         model = SVR(kernel="linear", C=0.05, tol=0.16)
         model.fit(X_train, y_train)
-    elif model_name == "lstm":
-        model = train_lstm(X_train, y_train)
+        epochs = None
     else:
-        print(f"❌ Unknown model type: {model_name}")
-        return
+        model, epochs = train_lstm(X_train, y_train)
+    if model_name == QUANTIZED_LSTM:
+        # Trained (or fine-tuned) in float32 like the LSTM, then rounded to int8 weights
+        model = quantize_lstm(model)
+    if mode == "warm":
+        val_mse = validation_mse(model_name, model, X_val, y_val)
+    wall_time = time.perf_counter() - start_time
+
+    # Epochs and (estimated) time saved against the full epoch budget
+    iterative = mode == "warm" or model_name in LSTM_FAMILIES
+    epochs_saved = FULL_EPOCHS - epochs if iterative else None
+    cost = {
+        "timestamp": time.time(), "model": model_name, "mode": mode, "epochs": epochs,
+        "full_epochs": FULL_EPOCHS if iterative else None, "epochs_saved": epochs_saved,
+        "wall_time": wall_time, "val_mse": val_mse,
+        "est_wall_time_saved": wall_time / epochs * epochs_saved if iterative else None
+    }
+    log_retrain(cost)
+    print(f"⏱️ {model_name} trained in {wall_time:.2f} s ({epochs or '-'} epochs)")
 
     # Inverse transform before saving
     train_data_original = scaler.inverse_transform(data_scaled.reshape(-1, 1)).flatten()
     train_df = pd.DataFrame({"train_data": train_data_original})
 
     # Save retrained model
-    save_model_and_data(model, model_name, train_df)
+    metrics = {k: cost[k] for k in ("mode", "epochs", "wall_time", "val_mse")}
+    entry = save_model_and_data(model, model_name, train_df, scaler, metrics, retention)
+    recalibrate({model_name: (version_key(model_name, entry["version"]), model, scaler)})
     print(f"✔ {model_name} retraining completed.")
+    return True
+
+# ---------------- Parallel Candidate Training ----------------
+
+def limit_threads(threads):
+    """Process pool initializer: `threads` torch and BLAS/OpenMP threads per worker, so workers do not oversubscribe."""
+    training.set_thread_budget(threads)
+    limit_threads.limits = threadpool_limits(threads)
+
+def train_candidate(family, params, X_fit, y_fit, X_val, y_val, threads=None):
+    """Trains one candidate from scratch and scores it on the held-out tail. Runs in a pool worker.
+
+    `threads` is the worker's budget; it is passed on so the LSTM engine keeps it.
+    """
+    start_time = time.perf_counter()
+    epochs = None
+    if family == "linear":
+        model = Ridge(alpha=params["alpha"]).fit(X_fit, y_fit)
+    elif family == "svm":
+        model = SVR(kernel="linear", C=params["C"], tol=0.16).fit(X_fit, y_fit)
+    else:
+        model, history = training.train_lstm(LSTMModel(), X_fit, y_fit, epochs=FULL_EPOCHS, lr=params["lr"],
+                                             X_val=X_val, y_val=y_val, patience=PATIENCE, threads=threads)
+        epochs = history["epochs"]
+    wall_time = time.perf_counter() - start_time
+    return {"model_name": family, "params": params, "model": model, "epochs": epochs, "wall_time": wall_time,
+            "val_mse": validation_mse(family, model, X_val, y_val)}
+
+def held_out_score(model_name, val_r2, kb):
+    """EMA seed for a newly published version: the `monitor_mape` score with its held-out R².
+
+    The energy term uses the family's calibrated energy, or the middle of the
+    E_m..E_M range if it was never calibrated.
+    """
+    thresholds = kb["thresholds"]
+    energy = kb.get("profile", {}).get("models", {}).get(model_name, {}).get("energy_uJ")
+    energy_normalized = 0.5 if energy is None else (energy - thresholds["E_m"]) / (thresholds["E_M"] - thresholds["E_m"])
+    beta = thresholds.get("beta", 0.5)
+    return beta * val_r2 + (1 - beta) * (1 - energy_normalized)
+
+def retrain_all(variants=None, workers=None, threads=None):
+    """Retrains every model family on the drift data concurrently and versions all candidates.
+
+    Each family is trained from scratch with its default configuration
+    (with `variants`, every configuration in `CANDIDATES`) in a process pool
+    of `workers` processes with `threads` threads each, so the wall time
+    stays close to that of the slowest job. Candidates are scored on the
+    most recent `HOLDOUT_FRACTION` of the drift window; the best one per
+    family is published to `models/` (and quantized for `lstm-q`), the others
+    are stored unpublished for version matching (outside `keep_per_model`).
+    The scores are recorded in the version metrics and under
+    `mape_info["candidates"]`, and each published family's EMA score restarts
+    from its held-out score, so the planner does not rank the new version by
+    its predecessor's history. Defaults come from `retrain_pool` in
+    thresholds. Returns True if any version was saved.
+    """
+    with get_store().snapshot() as kb:
+        drift_window = value_to_frame(kb["drift"])
+        thresholds = kb.get("thresholds", {})
+        retention = thresholds.get("retention", RETENTION)
+    pool_config = thresholds.get("retrain_pool", {})
+    variants = pool_config.get("variants", False) if variants is None else variants
+    threads = threads or pool_config.get("threads") or 1
+
+    if drift_window.empty or "true_value" not in drift_window:
+        print("❌ Missing knowledge: no drift data.")
+        return False
+    drift_data = drift_window["true_value"].values
+    candidates = [(family, params) for family, configs in CANDIDATES.items()
+                  for params in (configs if variants else configs[:1])]
+    workers = workers or pool_config.get("workers") or max(1, min(len(candidates), (os.cpu_count() or 1) // threads))
+
+    scaler = MinMaxScaler().fit(drift_data.reshape(-1, 1))
+    data_scaled = scaler.transform(drift_data.reshape(-1, 1)).flatten()
+    X_train, y_train = create_sequences(data_scaled, 5)
+    split = int(len(X_train) * (1 - HOLDOUT_FRACTION))
+    X_fit, y_fit, X_val, y_val = X_train[:split], y_train[:split], X_train[split:], y_train[split:]
+    print(f"🚀 Training {len(candidates)} candidates on drift data ({workers} workers x {threads} threads)...")
+
+    start_time = time.perf_counter()
+    # Forked like the retrain worker, so that the caller's __main__ is not re-executed in the pool
+    with ProcessPoolExecutor(workers, mp_context=mp.get_context("fork"), initializer=limit_threads,
+                             initargs=(threads,)) as pool:
+        futures = [pool.submit(train_candidate, family, params, X_fit, y_fit, X_val, y_val, threads)
+                   for family, params in candidates]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"⚠️ A candidate failed: {e}")
+    wall_time = time.perf_counter() - start_time
+    if not results:
+        print("❌ No candidate could be trained.")
+        return False
+    slowest = max(r["wall_time"] for r in results)
+    total = sum(r["wall_time"] for r in results)
+
+    # The quantized family is derived from the best LSTM instead of being trained again
+    best = {}
+    for result in results:
+        if result["model_name"] not in best or result["val_mse"] < best[result["model_name"]]["val_mse"]:
+            best[result["model_name"]] = result
+    if "lstm" in best:
+        model = quantize_lstm(best["lstm"]["model"])
+        results.append(dict(best["lstm"], model_name=QUANTIZED_LSTM, model=model,
+                            val_mse=validation_mse(QUANTIZED_LSTM, model, X_val, y_val)))
+        best[QUANTIZED_LSTM] = results[-1]
+
+    # All candidates are versioned; the best of each family is saved last so that it is the one published
+    train_df = pd.DataFrame({"train_data": drift_data})
+    y_var = float(np.var(y_val))
+    candidates_info, published_models = {}, {}
+    for result in sorted(results, key=lambda r: r is best[r["model_name"]]):
+        model_name, published = result["model_name"], result is best[result["model_name"]]
+        val_r2 = 1 - result["val_mse"] / y_var if y_var > 0 else 0.0
+        metrics = {"mode": "candidates", "params": result["params"], "epochs": result["epochs"],
+                   "wall_time": result["wall_time"], "val_mse": result["val_mse"], "val_r2": val_r2}
+        entry = get_model_store().add_version(model_name, result["model"], scaler, train_df["train_data"].values,
+                                            metrics=metrics, publish=published, candidate=not published,
+                                            retention=retention)
+        log_retrain({"timestamp": time.time(), "model": model_name, "mode": "candidates", "epochs": result["epochs"],
+                     "wall_time": result["wall_time"], "val_mse": result["val_mse"]})
+        print(f"{'✔' if published else '·'} {model_name} {result['params']}: val MSE {result['val_mse']:.5f}, "
+              f"R² {val_r2:.3f} ({result['wall_time']:.2f} s){' → published' if published else ''}")
+        if published:
+            published_models[model_name] = (version_key(model_name, entry["version"]), result["model"], scaler)
+            candidates_info[model_name] = {"version": version_key(model_name, entry["version"]), "params": result["params"], "val_mse": result["val_mse"],
+                                           "val_r2": val_r2, "timestamp": time.time()}
+
+    # Measured before seeding the EMA scores, which use the calibrated energy
+    recalibrate(published_models)
+    with get_store().transaction() as kb:
+        mape_info = kb["mape_info"]
+        mape_info.setdefault("candidates", {}).update(candidates_info)
+        for model_name, info in candidates_info.items():
+            mape_info["ema_scores"][model_name] = held_out_score(model_name, info["val_r2"], kb)
+        kb["mape_info"] = mape_info
+    print(f"🔄 EMA scores restarted from held-out scores: {', '.join(candidates_info)}")
+
+    print(f"⏱️ {len(candidates)} candidates in {wall_time:.2f} s (slowest job {slowest:.2f} s, "
+          f"{total:.2f} s if run one after another)")
+    return True
 
 if __name__ == "__main__":
-    retrain()
+    parser = argparse.ArgumentParser(description="Retrain a model on the drift data in the knowledge store.")
+    parser.add_argument("--model", choices=list(MODEL_FILES) + [ALL_FAMILIES], default=None,
+                        help="Model family to retrain (default: the current model); "
+                             "'all' trains every family in parallel and publishes the best candidate of each.")
+    parser.add_argument("--mode", choices=RETRAIN_MODES, default=None,
+                        help="full: train from scratch; warm: fine-tune the deployed model (default: retrain_mode in thresholds).")
+    parser.add_argument("--variants", action="store_true", default=None,
+                        help="With --model all: also train the hyperparameter variants in CANDIDATES.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="With --model all: pool processes (default: CPUs / threads, at most one per candidate).")
+    parser.add_argument("--threads", type=int, default=None, help="With --model all: threads per worker (default: 1).")
+    args = parser.parse_args()
+    if args.model == ALL_FAMILIES:
+        saved = retrain_all(args.variants, args.workers, args.threads)
+    else:
+        saved = retrain(args.model, args.mode)
+    raise SystemExit(0 if saved else 1)
@@ -0,0 +1,152 @@
+import sys
+import time
+import queue
+import subprocess
+import itertools
+import threading
+import traceback
+import multiprocessing as mp
+
+JOB_STATES = ("queued", "running", "done", "skipped", "failed")
+
+def worker_loop(jobs, results):
+    """Runs retraining (and recalibration) jobs one at a time in a long-lived process."""
+    # torch/sklearn/pandas are imported once per worker, not once per retrain
+    from retrain import retrain, recalibrate_published, ALL_FAMILIES
+    try:
+        import pyRAPL
+        pyRAPL.setup()
+    except Exception as e:
+        print(f"⚠️ Retrain worker: pyRAPL unavailable ({e}). Retrain energy will not be recorded.")
+        pyRAPL = None
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        results.put({"id": job["id"], "status": "running"})
+
+        meter = pyRAPL.Measurement("retrain") if pyRAPL else None
+        if meter:
+            meter.begin()
+        start_time = time.perf_counter()
+        try:
+            if job["action"] == "calibrate":
+                status = "done" if recalibrate_published([job["model"]]) else "skipped"
+            elif job["model"] == ALL_FAMILIES:
+                # The candidate pool runs in its own process: a daemonic worker cannot have children
+                returncode = subprocess.run([sys.executable, "retrain.py", "--model", ALL_FAMILIES]).returncode
+                status = "done" if returncode == 0 else "skipped"
+            else:
+                status = "done" if retrain(job["model"]) else "skipped"
+            error = None
+        except Exception:
+            status, error = "failed", traceback.format_exc()
+        duration = time.perf_counter() - start_time
+        if meter:
+            meter.end()
+
+        results.put({
+            "id": job["id"], "status": status, "duration": duration, "error": error,
+            "energy": meter.result.pkg[0] if meter else None
+        })
+
+class RetrainWorker:
+    """Long-lived retraining process fed through a job queue.
+
+    `submit()` returns immediately with a job id; a job for a model that is
+    already queued or running is coalesced into that job. Besides retrains
+    ("retrain") it runs recalibrations of published versions ("calibrate"),
+    so the MAPE threads never wait for either. A listener thread
+    collects results, so callers only check `status()`. Finished jobs are
+    passed to `on_done(job)` (e.g. to log their energy to `mape_log.csv`).
+    The worker publishes models through `retrain.save_model_and_data`.
+    """
+
+    def __init__(self, on_done=None):
+        self.on_done = on_done
+        # Forked so that the caller's __main__ is not re-executed in the worker
+        context = mp.get_context("fork")
+        self.jobs = context.Queue()
+        self.results = context.Queue()
+        self.process = context.Process(target=worker_loop, args=(self.jobs, self.results), daemon=True)
+        self.listener = threading.Thread(target=self._listen, daemon=True)
+        self.lock = threading.Lock()
+        self.job_ids = itertools.count(1)
+        self.status_by_id = {}
+
+    def start(self):
+        self.process.start()
+        self.listener.start()
+        print(f"🛠️ Retrain worker started (pid {self.process.pid})")
+
+    def submit(self, model_name, reason="drift", action="retrain"):
+        """Queues a retrain (or `action="calibrate"`) of `model_name` and returns its job id (coalescing duplicates)."""
+        with self.lock:
+            for job in self.status_by_id.values():
+                if job["model"] == model_name and job["action"] == action and job["status"] in ("queued", "running"):
+                    print(f"🔁 {action.capitalize()} of {model_name} already {job['status']} (job {job['id']}). "
+                          f"Coalescing.")
+                    job["coalesced"] += 1
+                    return job["id"]
+
+            job = {"id": next(self.job_ids), "model": model_name, "action": action, "reason": reason, "status": "queued",
+                   "submitted": time.time(), "coalesced": 0, "duration": None, "energy": None, "error": None}
+            self.status_by_id[job["id"]] = job
+        self.jobs.put({"id": job["id"], "model": model_name, "action": action})
+        print(f"🚀 Queued {action} of {model_name} (job {job['id']}, {reason})")
+        return job["id"]
+
+    def status(self, job_id):
+        """Snapshot of a job's state, or None for an unknown id."""
+        with self.lock:
+            job = self.status_by_id.get(job_id)
+            return dict(job) if job else None
+
+    def busy(self):
+        with self.lock:
+            return any(job["status"] in ("queued", "running") for job in self.status_by_id.values())
+
+    def _listen(self):
+        while True:
+            try:
+                update = self.results.get(timeout=1.0)
+            except queue.Empty:
+                if not self.process.is_alive():
+                    print("❌ Retrain worker exited.")
+                    return
+                continue
+
+            with self.lock:
+                job = self.status_by_id[update["id"]]
+                job.update(update)
+                finished = job["status"] not in ("queued", "running")
+                if finished:
+                    # Only the latest finished job per model needs to be kept
+                    for other in list(self.status_by_id.values()):
+                        if other is not job and other["model"] == job["model"] and other["action"] == job["action"] \
+                                and other["status"] in JOB_STATES[2:]:
+                            del self.status_by_id[other["id"]]
+                job = dict(job)
+
+            if finished:
+                print(f"✔ {job['action'].capitalize()} job {job['id']} ({job['model']}) {job['status']} "
+                      f"in {job['duration']:.1f} s")
+                if job["error"]:
+                    print(job["error"])
+                if self.on_done:
+                    self.on_done(job)
+
+    def stop(self):
+        self.jobs.put(None)
+        self.process.join(timeout=5)
+
+worker = None
+
+def get_worker(on_done=None):
+    """Process-wide retrain worker, started on first use."""
+    global worker
+    if worker is None:
+        worker = RetrainWorker(on_done)
+        worker.start()
+    return worker
@@ -4,18 +4,36 @@ if [ "$#" -ne 1 ]; then
   echo "Usage: $0 <baseline>"
   echo "Possible baselines:"
   echo "  Dynamic: harmone, switch, switch+retrain"
+  echo "  Cascade: cascade (linear on every sample, LSTM when needed)"
+  echo "  Multi-station: stations (a model per station; run inference.py --stations)"
   echo "  Single Model: single-lstm, single-svm, single-linear"
   echo "  Single Model with Retraining: single-lstm+retrain, single-svm+retrain, single-linear+retrain"
   exit 1
 fi
 
 approach="$1"
+
+# Replace only the first line; trigger sections below it are kept
+sections=""
+if [ -f approach.conf ]; then
+    sections="$(tail -n +2 approach.conf)"
+fi
 echo "$approach" > approach.conf
+if [ -n "$sections" ]; then
+    echo "$sections" >> approach.conf
+fi
 
 case $approach in
     harmone|switch|switch+retrain)
         echo "Approach set to '$approach'. No changes to knowledge/model.csv needed."
         ;;
+    cascade)
+        echo "cascade" > knowledge/model.csv
+        echo "Approach set to '$approach'. Updated knowledge/model.csv to use 'cascade'."
+        ;;
+    stations)
+        echo "Approach set to '$approach'. Stations start on the model in knowledge/model.csv."
+        ;;
     single-lstm)
         echo "lstm" > knowledge/model.csv
         echo "Approach set to '$approach'. Updated knowledge/model.csv to use 'lstm'."
@@ -45,3 +63,8 @@ case $approach in
         exit 1
         ;;
 esac
+
+# The MAPE loop and inference read the model choice from the knowledge store
+if [[ "$approach" == single* || "$approach" == cascade ]]; then
+    python knowledge_store.py import model
+fi
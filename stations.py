@@ -0,0 +1,154 @@
+import time
+import numpy as np
+import pandas as pd
+from data_pipeline import create_sequences
+from knowledge_store import value_to_frame
+from model_registry import MODEL_FILES, predict_windows
+from model_store import get_model_store
+from prediction_writer import PREDICTION_COLUMNS
+
+# ---------------- Multi-Station Serving ----------------
+# One process serves many station streams: readings arrive interleaved as
+# (station, flow), windows are kept per station and predictions are batched
+# across all stations that use the same model.
+
+STATION_COLUMNS = ["station"] + PREDICTION_COLUMNS
+station_predictions_file = "knowledge/station_predictions.csv"
+
+def version_family(assignment):
+    """Model family of a station's assignment: "lstm/version_3" → "lstm", "svm" → "svm"."""
+    return assignment.split("/", 1)[0]
+
+class StationWindows:
+    """Sliding windows per station over an interleaved (station, value) stream.
+
+    Each station's last `seq_length` values are carried across chunks, so
+    every reading with `seq_length` earlier readings of the same station gets
+    exactly one window. Windows are returned in arrival order.
+    """
+
+    def __init__(self, seq_length=5):
+        self.seq_length = seq_length
+        self.carry = {}
+
+    def push(self, stations, values):
+        """Adds a chunk of readings. Returns (stations, windows, true values) for the readings that have a window."""
+        n = self.seq_length
+        stations = np.asarray(stations).astype(str)
+        values = np.asarray(values, dtype=np.float64)
+        order = np.argsort(stations, kind="stable")
+        keys, starts = np.unique(stations[order], return_index=True)
+        bounds = np.append(starts, len(order))
+
+        targets, windows = [], []
+        for k, station in enumerate(keys):
+            rows = order[bounds[k]:bounds[k + 1]]
+            carry = self.carry.get(station, values[:0])
+            series = np.concatenate([carry, values[rows]])
+            X, _ = create_sequences(series, n)
+            if len(X):
+                # Window i predicts series[i + n], i.e. the reading rows[i + n - len(carry)]
+                targets.append(rows[n - len(carry):])
+                windows.append(X)
+            self.carry[station] = series[-n:]
+
+        if not targets:
+            return stations[:0], np.empty((0, n)), values[:0]
+        targets = np.concatenate(targets)
+        arrival = np.argsort(targets)
+        targets = targets[arrival]
+        return stations[targets], np.concatenate(windows)[arrival], values[targets]
+
+class StationRouter:
+    """Predicts each station's windows with the model the knowledge base assigns to that station.
+
+    Assignments come from the "streams" knowledge key (see
+    `mape/streams.py`): a model family deployed in `models/` or a stored
+    version key such as "lstm/version_3". Stations without an assignment use
+    the global model. Rows are grouped by assignment and each group is
+    predicted with one batched call, so the cost per batch grows with the
+    number of distinct models, not with the number of stations. Versions
+    that are not deployed are loaded from the model store on first use and
+    kept while any station is assigned to them.
+    """
+
+    def __init__(self, registry, poll_interval=0.5):
+        self.registry = registry
+        self.store = registry.store
+        self.poll_interval = poll_interval
+        self.assignments = {}
+        self.versions = {}  # Version key → (model, scaler)
+        self.knowledge_version = None
+        self.last_poll = 0.0
+        self.refresh(force=True)
+
+    def default_model(self):
+        name = self.registry.active_name
+        if name not in self.registry.models:
+            return "lstm"  # The cascade keeps per-stream state and is not served in station mode
+        return name
+
+    def refresh(self, force=False):
+        """Re-reads the assignments if the knowledge store changed; at most once per `poll_interval`."""
+        now = time.monotonic()
+        if not force and now - self.last_poll < self.poll_interval:
+            return False
+        self.last_poll = now
+        self.registry.refresh(force)
+        version = self.store.data_version()
+        if version == self.knowledge_version and not force:
+            return False
+        self.knowledge_version = version
+
+        table = stations_table(self.store.get("streams"))
+        if table.empty:
+            self.assignments = {}
+        else:
+            assigned = table["version"].where(table["version"].notna(), table["model"])
+            self.assignments = {station: a for station, a in zip(table["station"], assigned) if isinstance(a, str)}
+        in_use = set(self.assignments.values())
+        self.versions = {key: loaded for key, loaded in self.versions.items() if key in in_use}
+        return True
+
+    def resolve(self, assignment):
+        """(family, model, scaler) for an assignment, falling back to the deployed family if a version is gone."""
+        family = version_family(assignment)
+        if family not in MODEL_FILES or family not in self.registry.models:
+            family = self.default_model()
+        if "/" in assignment and family == version_family(assignment):
+            if assignment not in self.versions:
+                store = get_model_store()
+                entry = store.load_manifest()["versions"].get(assignment)
+                if entry is not None and store.has_blobs(entry):
+                    model, scaler = store.load_version(entry)
+                    self.versions[assignment] = (model, scaler or self.registry.scalers[family])
+                else:
+                    print(f"⚠️ Stations: version {assignment} not found, using the deployed {family}.")
+                    self.versions[assignment] = None
+            if self.versions[assignment] is not None:
+                return (family,) + self.versions[assignment]
+        return family, self.registry.models[family], self.registry.scalers[family]
+
+    def predict(self, stations, windows):
+        """Predicts a batch of raw windows (flow units). Returns (model family used per row, predictions)."""
+        self.refresh()
+        assigned = pd.Series(stations).map(self.assignments).fillna(self.default_model()).to_numpy()
+        keys, inverse = np.unique(assigned, return_inverse=True)
+        predictions = np.empty(len(stations))
+        used = np.empty(len(stations), dtype=object)
+        for k, assignment in enumerate(keys):
+            rows = inverse == k
+            family, model, scaler = self.resolve(assignment)
+            predictions[rows] = predict_windows(family, model, scaler, windows[rows])
+            used[rows] = family
+        return used, predictions
+
+# ---------------- Station Knowledge ----------------
+
+def stations_table(streams):
+    """The per-station knowledge (one row per station) stored under the "streams" key, as a DataFrame."""
+    if not streams or not streams.get("stations"):
+        return pd.DataFrame(columns=["station", "model", "version"])
+    table = value_to_frame(streams["stations"])
+    table["station"] = table["station"].astype(str)
+    return table
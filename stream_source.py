@@ -0,0 +1,176 @@
+import sys
+import time
+import socket
+import numpy as np
+import pandas as pd
+
+# ---------------- Stream Sources ----------------
+# Every source yields the flow series as bounded 1-D float chunks, so memory use
+# does not depend on the size of the underlying file or stream.
+
+class CSVChunkSource:
+    """Reads one column of a CSV file `chunksize` rows at a time."""
+
+    def __init__(self, path, column="flow", chunksize=10000):
+        self.path = path
+        self.column = column
+        self.chunksize = chunksize
+
+    def chunks(self):
+        for df in pd.read_csv(self.path, usecols=[self.column], chunksize=self.chunksize):
+            yield df[self.column].to_numpy(dtype=np.float64)
+
+class StationCSVSource:
+    """Reads interleaved (station, value) readings from a CSV file `chunksize` rows at a time.
+
+    Unlike the single-series sources, `chunks()` yields (stations, values)
+    pairs; `inference.py --stations` keeps the windows per station.
+    """
+
+    def __init__(self, path, station_column="station", column="flow", chunksize=10000):
+        self.path = path
+        self.station_column = station_column
+        self.column = column
+        self.chunksize = chunksize
+
+    def chunks(self):
+        for df in pd.read_csv(self.path, usecols=[self.station_column, self.column],
+                              dtype={self.station_column: str}, chunksize=self.chunksize):
+            yield df[self.station_column].to_numpy(), df[self.column].to_numpy(dtype=np.float64)
+
+class MemmapSource:
+    """Reads a memory-mapped binary series (`.npy`, or raw values of `dtype`)."""
+
+    def __init__(self, path, dtype="float64", chunksize=65536):
+        self.path = path
+        self.dtype = dtype
+        self.chunksize = chunksize
+
+    def chunks(self):
+        if self.path.endswith(".npy"):
+            data = np.load(self.path, mmap_mode="r")
+        else:
+            data = np.memmap(self.path, dtype=self.dtype, mode="r")
+        for start in range(0, len(data), self.chunksize):
+            # Copy only the current chunk out of the page cache
+            yield np.asarray(data[start:start + self.chunksize], dtype=np.float64)
+
+class SocketSource:
+    """Reads newline-separated values from a TCP (`host:port`) or Unix socket."""
+
+    def __init__(self, address, bufsize=65536):
+        self.address = address
+        self.bufsize = bufsize
+
+    def _connect(self):
+        host, sep, port = self.address.rpartition(":")
+        if sep and port.isdigit():
+            return socket.create_connection((host or "localhost", int(port)))
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.address)
+        return sock
+
+    def chunks(self):
+        with self._connect() as sock:
+            pending = b""
+            while True:
+                data = sock.recv(self.bufsize)
+                if not data:
+                    break
+                chunk, pending = parse_lines(pending + data)
+                if len(chunk):
+                    yield chunk
+            if pending.strip():
+                yield parse_lines(pending + b"\n")[0]
+
+class PipeSource:
+    """Reads newline-separated values from a named pipe/file, or stdin for `-`.
+
+    Values are yielded every `chunk_lines` lines; keep it small for live feeds.
+    """
+
+    def __init__(self, path="-", chunk_lines=1):
+        self.path = path
+        self.chunk_lines = chunk_lines
+
+    def chunks(self):
+        stream = sys.stdin.buffer if self.path == "-" else open(self.path, "rb")
+        try:
+            lines = []
+            for line in stream:
+                lines.append(line)
+                if len(lines) >= self.chunk_lines:
+                    yield parse_lines(b"".join(lines))[0]
+                    lines = []
+            if lines:
+                yield parse_lines(b"".join(lines) + b"\n")[0]
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+
+def parse_lines(buffer):
+    """Parses complete lines of `buffer` into floats. Returns (values, incomplete tail)."""
+    head, sep, tail = buffer.rpartition(b"\n")
+    values = []
+    for line in head.split(b"\n"):
+        line = line.strip()
+        try:
+            values.append(float(line))
+        except ValueError:
+            continue  # Skip blank lines and headers such as `flow`
+    return np.array(values, dtype=np.float64), tail
+
+def open_source(kind, path, column="flow", dtype="float64", chunksize=10000):
+    """Builds a stream source by name: csv, memmap, socket or pipe."""
+    if kind == "csv":
+        return CSVChunkSource(path, column=column, chunksize=chunksize)
+    if kind == "memmap":
+        return MemmapSource(path, dtype=dtype, chunksize=chunksize)
+    if kind == "socket":
+        return SocketSource(path)
+    if kind == "pipe":
+        return PipeSource(path)
+    raise ValueError(f"Unknown stream source '{kind}'")
+
+SOURCE_KINDS = ("csv", "memmap", "socket", "pipe")
+
+# ---------------- Replay Rate ----------------
+
+class ReplayPacer:
+    """Paces samples at real time (`interval` s/sample), N× speed or as fast as possible.
+
+    `rate` is "realtime", "<N>x" (e.g. "10x") or "max". Deadlines are absolute, so
+    time spent on inference is not added on top of the interval.
+    """
+
+    def __init__(self, rate="realtime", interval=0.15):
+        self.period = parse_rate(rate, interval)
+        self.next_deadline = None
+
+    def wait(self):
+        if self.period <= 0:
+            return
+        now = time.monotonic()
+        if self.next_deadline is None:
+            self.next_deadline = now
+        self.next_deadline += self.period
+        delay = self.next_deadline - now
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            # Running behind: do not try to catch up with a burst
+            self.next_deadline = now
+
+def parse_rate(rate, interval):
+    """Converts a replay rate string into seconds per sample (0 means no pacing)."""
+    rate = str(rate).strip().lower()
+    if rate == "max":
+        return 0.0
+    if rate == "realtime":
+        return interval
+    if rate.endswith("x"):
+        speed = float(rate[:-1])
+        if speed <= 0:
+            raise ValueError(f"Replay speed must be positive, got '{rate}'")
+        return interval / speed
+    raise ValueError(f"Unknown replay rate '{rate}', expected 'realtime', '<N>x' or 'max'")
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The shared modules live in the repository root and the MAPE modules in mape/, as for `python mape/manage.py`
+repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(repo_root, "mape"))
+sys.path.insert(0, repo_root)
@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+from drift_monitor import StreamingDriftMonitor, StationDriftMonitor
+
+def chunks(values, rng, max_size):
+    """Splits `values` into random-size chunks (1..max_size)."""
+    start = 0
+    while start < len(values):
+        size = int(rng.integers(1, max_size + 1))
+        yield values[start:start + size]
+        start += size
+
+def reference_counts(monitor, values):
+    """Histograms of the last two windows recomputed from scratch on the monitor's edges."""
+    recent = values[-monitor.capacity:]
+    bins = np.clip(np.floor((recent - monitor.low) / monitor.width), 0, monitor.bins - 1).astype(int)
+    split = len(recent) - monitor.window_size
+    return (np.bincount(bins[:split], minlength=monitor.bins), np.bincount(bins[split:], minlength=monitor.bins))
+
+# ---------------- StreamingDriftMonitor ----------------
+
+@pytest.mark.parametrize("max_chunk", [1, 7, 50, 130])
+def test_incremental_histograms_match_recomputation(max_chunk):
+    rng = np.random.default_rng(max_chunk)
+    values = np.concatenate([rng.normal(100, 10, 600), rng.normal(140, 20, 600)])
+    monitor = StreamingDriftMonitor(None, window_size=50, bins=10, value_range=(0, 250))
+
+    seen = np.empty(0)
+    for chunk in chunks(values, rng, max_chunk):
+        monitor.ingest_values(chunk)
+        seen = np.concatenate([seen, chunk])
+        if monitor.ready():
+            ref, cur = reference_counts(monitor, seen)
+            np.testing.assert_array_equal(monitor.ref_counts, ref)
+            np.testing.assert_array_equal(monitor.cur_counts, cur)
+    assert monitor.count == len(values)
+
+def test_clipped_count_tracks_the_current_window():
+    monitor = StreamingDriftMonitor(None, window_size=20, bins=5, value_range=(0, 10))
+    values = np.concatenate([np.full(40, 5.0), np.full(7, 50.0), np.full(30, 5.0)])
+    expected = []
+    for k, value in enumerate(values, start=1):
+        monitor.ingest_values([value])
+        current = values[max(0, k - 20):k]
+        expected.append(int(((current < 0) | (current >= 10)).sum()))
+        assert monitor.cur_clipped == expected[-1]
+    assert max(expected) == 7
+
+def test_rebase_rebuilds_counts_from_the_buffered_values():
+    rng = np.random.default_rng(0)
+    monitor = StreamingDriftMonitor(None, window_size=40, bins=8, rebase_fraction=0.05)
+    values = np.concatenate([rng.normal(10, 1, 80), rng.normal(40, 1, 40)])
+    for chunk in chunks(values, rng, 9):
+        monitor.ingest_values(chunk)
+    ref, cur = reference_counts(monitor, values)
+    assert monitor.ready()
+    assert monitor.low + monitor.bins * monitor.width > 40  # Edges moved to cover the new values
+    np.testing.assert_array_equal(monitor.ref_counts, ref)
+    np.testing.assert_array_equal(monitor.cur_counts, cur)
+
+# ---------------- StationDriftMonitor ----------------
+
+def interleaved_readings(rng, n_stations, n_readings):
+    """Readings from stations with uneven rates, as (stations, values) in arrival order."""
+    weights = rng.uniform(0.2, 1.0, n_stations)
+    stations = rng.choice([f"S{k}" for k in range(n_stations)], size=n_readings, p=weights / weights.sum())
+    return stations, rng.normal(100, 15, n_readings)
+
+@pytest.mark.parametrize("max_chunk", [1, 13, 400])
+def test_station_windows_keep_the_newest_readings_in_order(max_chunk):
+    rng = np.random.default_rng(max_chunk)
+    stations, values = interleaved_readings(rng, 6, 1500)
+    monitor = StationDriftMonitor(window_size=30, bins=10)
+
+    start = 0
+    for chunk in chunks(np.arange(len(values)), rng, max_chunk):
+        monitor.ingest(stations[chunk], values[chunk])
+        start += len(chunk)
+
+        # Reference: each station's readings so far, newest `capacity` of them, oldest first
+        ready, windows = monitor.windows()
+        history = {s: values[:start][stations[:start] == s] for s in set(stations[:start])}
+        assert sorted(ready) == sorted(s for s, h in history.items() if len(h) >= monitor.capacity)
+        for station, window in zip(ready, windows):
+            np.testing.assert_array_equal(window, history[station][-monitor.capacity:])
+
+def test_station_ring_wraps_within_one_batch():
+    monitor = StationDriftMonitor(window_size=4, bins=4)
+    values = np.arange(25, dtype=float)
+    monitor.ingest(["A"] * 25, values)  # More than three times the ring capacity in one call
+    ready, windows = monitor.windows()
+    assert ready == ["A"]
+    np.testing.assert_array_equal(windows[0], values[-8:])
+    _, current = monitor.current_windows(["A"])
+    np.testing.assert_array_equal(current[0], values[-4:])
+
+def test_station_kl_matches_the_streaming_monitor():
+    rng = np.random.default_rng(3)
+    window_size, bins = 200, 20
+    values = np.concatenate([rng.normal(100, 10, window_size), rng.normal(115, 14, window_size)])
+
+    streaming = StreamingDriftMonitor(None, window_size=window_size, bins=bins)
+    streaming.ingest_values(values)
+    stations = StationDriftMonitor(window_size=window_size, bins=bins)
+    stations.ingest(["A"] * len(values), values)
+
+    ready, kl = stations.kl_divergences()
+    assert ready == ["A"]
+    assert kl[0] == pytest.approx(streaming.kl_divergence(), rel=1e-9)
+
+def test_station_kl_is_per_station():
+    rng = np.random.default_rng(4)
+    window_size = 100
+    steady = rng.normal(50, 5, 2 * window_size)
+    shifted = np.concatenate([rng.normal(50, 5, window_size), rng.normal(90, 5, window_size)])
+    monitor = StationDriftMonitor(window_size=window_size, bins=10)
+    monitor.ingest(np.repeat(["steady", "shifted"], 2 * window_size), np.concatenate([steady, shifted]))
+
+    kl = dict(zip(*monitor.kl_divergences()))
+    for station, values in (("steady", steady), ("shifted", shifted)):
+        single = StationDriftMonitor(window_size=window_size, bins=10)
+        single.ingest([station] * len(values), values)
+        assert kl[station] == pytest.approx(single.kl_divergences()[1][0], rel=1e-9)
+    assert kl["shifted"] > 10 * kl["steady"]
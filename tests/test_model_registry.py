@@ -0,0 +1,45 @@
+import os
+import pickle
+import numpy as np
+import pytest
+from sklearn.linear_model import Ridge
+from sklearn.preprocessing import MinMaxScaler
+from model_registry import ModelRegistry, MODEL_FILES, scaler_file, save_scaler
+
+class StaticStore:
+    """Knowledge store stand-in that always selects `model`."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def get(self, key, default=None):
+        return self.model if key == "model" else default
+
+    def data_version(self):
+        return 0, 0
+
+    def subscribe(self, listener):
+        pass
+
+def linear_only_dir(tmp_path):
+    rng = np.random.default_rng(0)
+    with open(os.path.join(tmp_path, MODEL_FILES["linear"]), "wb") as f:
+        pickle.dump(Ridge().fit(rng.random((50, 5)), rng.random(50)), f)
+    save_scaler(MinMaxScaler().fit(rng.normal(100, 10, (200, 1))), os.path.join(tmp_path, scaler_file("linear")))
+    return str(tmp_path)
+
+def test_missing_family_falls_back_to_a_loaded_one(tmp_path):
+    registry = ModelRegistry(model_dir=linear_only_dir(tmp_path), store=StaticStore("lstm"))
+    name, prediction = registry.predict(np.full(5, 100.0))
+    assert name == "linear" and np.isfinite(prediction)
+
+def test_no_loaded_model_raises_a_clear_error(tmp_path):
+    registry = ModelRegistry(model_dir=str(tmp_path), store=StaticStore("lstm"))
+    with pytest.raises(RuntimeError, match="No model"):
+        registry.predict(np.full(5, 100.0))
+
+def test_predict_does_not_poll(tmp_path, monkeypatch):
+    registry = ModelRegistry(model_dir=linear_only_dir(tmp_path), store=StaticStore("linear"))
+    monkeypatch.setattr(registry, "refresh", lambda force=False: pytest.fail("predict polled for changes"))
+    registry.last_poll = 0.0  # The poll interval has lapsed
+    assert registry.predict(np.full(5, 100.0))[0] == "linear"
@@ -0,0 +1,31 @@
+import numpy as np
+from sklearn.linear_model import Ridge
+from sklearn.preprocessing import MinMaxScaler
+from model_store import ModelStore, version_key
+
+def add(store, candidate=False, retention=None):
+    rng = np.random.default_rng()
+    data = rng.normal(100, 10, 200)
+    model = Ridge().fit(rng.random((20, 5)), rng.random(20))
+    return store.add_version("linear", model, MinMaxScaler().fit(data.reshape(-1, 1)), data,
+                             publish=not candidate, candidate=candidate, retention=retention)
+
+def test_candidates_do_not_evict_published_versions(tmp_path):
+    store = ModelStore(root=str(tmp_path / "store"), deploy_dir=str(tmp_path / "models"))
+    retention = {"keep_per_model": 2, "keep_candidates": 3}
+    published = [add(store, retention=retention)["version"] for _ in range(2)]
+    candidates = [add(store, candidate=True, retention=retention)["version"] for _ in range(5)]
+
+    versions = {e["version"] for e in store.entries("linear")}
+    assert set(published) <= versions  # Five newer candidates, yet both published versions are kept
+    assert versions - set(published) == set(candidates[-3:])
+
+def test_published_candidate_is_retained_as_a_version(tmp_path):
+    store = ModelStore(root=str(tmp_path / "store"), deploy_dir=str(tmp_path / "models"))
+    retention = {"keep_per_model": 1, "keep_candidates": 1}
+    candidate = add(store, candidate=True, retention=retention)["version"]
+    store.publish(version_key("linear", candidate))
+    add(store, candidate=True, retention=retention)
+
+    entries = {e["version"]: e for e in store.entries("linear")}
+    assert candidate in entries and "candidate" not in entries[candidate]
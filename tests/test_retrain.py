@@ -0,0 +1,22 @@
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pytest
+import torch
+import training
+from retrain import limit_threads, train_candidate
+
+BUDGET = 2  # Must differ from training.DEFAULT_THREADS, so that a reset to the default would show
+
+def candidate_threads(X, y):
+    """Trains an LSTM candidate in the worker and reports the worker's torch thread count afterwards."""
+    train_candidate("lstm", {"lr": 0.003}, X[:80], y[:80], X[80:], y[80:], threads=BUDGET)
+    return torch.get_num_threads()
+
+def test_lstm_candidate_keeps_the_worker_thread_budget():
+    if training.DEFAULT_THREADS == BUDGET:
+        pytest.skip("the budget matches the default thread count here")
+    rng = np.random.default_rng(0)
+    X, y = rng.random((100, 5)), rng.random(100)
+    with ProcessPoolExecutor(1, mp_context=mp.get_context("fork"), initializer=limit_threads, initargs=(BUDGET,)) as pool:
+        assert pool.submit(candidate_threads, X, y).result() == BUDGET
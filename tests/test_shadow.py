@@ -0,0 +1,13 @@
+import pytest
+from shadow import DEFAULT_SHADOW, shadow_config
+
+def test_shadow_config_fills_in_defaults():
+    assert shadow_config({}) == DEFAULT_SHADOW
+    assert shadow_config({"shadow": {"cpu_budget": 1}})["cpu_budget"] == 1
+
+@pytest.mark.parametrize("setting, value", [("cpu_budget", 0), ("cpu_budget", -0.1), ("cpu_budget", 1.5),
+                                            ("sample_rate", -0.2), ("sample_rate", 2),
+                                            ("batch_size", 0), ("batch_size", 2.5)])
+def test_shadow_config_rejects_unusable_settings(setting, value):
+    with pytest.raises(ValueError, match=setting):
+        shadow_config({"shadow": {setting: value}})
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import r2_score
+from stations import StationWindows
+from streams import MODELS, EMA_COLUMNS, STATION_TABLE_COLUMNS, score_stations, plan_switches
+from plan import MODEL_ENERGY_EFFICIENCY
+
+THRESHOLDS = {"E_m": 0, "E_M": 25000, "beta": 0.95}
+
+def interleaved_readings(rng, n_stations, n_readings):
+    weights = rng.uniform(0.2, 1.0, n_stations)
+    stations = rng.choice([f"S{k}" for k in range(n_stations)], size=n_readings, p=weights / weights.sum())
+    return stations, rng.normal(100, 15, n_readings)
+
+# ---------------- StationWindows ----------------
+
+def reference_windows(stations, values, seq_length):
+    """One window per reading that has `seq_length` earlier readings of its station, in arrival order."""
+    history, out_stations, out_windows, out_values = {}, [], [], []
+    for station, value in zip(stations, values):
+        past = history.setdefault(station, [])
+        if len(past) >= seq_length:
+            out_stations.append(station)
+            out_windows.append(past[-seq_length:])
+            out_values.append(value)
+        past.append(value)
+    return out_stations, np.array(out_windows).reshape(-1, seq_length), np.array(out_values)
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 17, 1000])
+def test_station_windows_match_a_per_station_loop(chunk_size):
+    rng = np.random.default_rng(chunk_size)
+    stations, values = interleaved_readings(rng, 7, 600)
+    windows = StationWindows(seq_length=5)
+
+    got_stations, got_windows, got_values = [], [], []
+    for start in range(0, len(values), chunk_size):
+        s, w, v = windows.push(stations[start:start + chunk_size], values[start:start + chunk_size])
+        got_stations.extend(s)
+        got_windows.append(w)
+        got_values.append(v)
+
+    ref_stations, ref_windows, ref_values = reference_windows(stations, values, 5)
+    assert got_stations == ref_stations
+    np.testing.assert_array_equal(np.concatenate(got_windows), ref_windows)
+    np.testing.assert_array_equal(np.concatenate(got_values), ref_values)
+
+def test_station_windows_wait_for_enough_readings():
+    windows = StationWindows(seq_length=3)
+    stations, batch, values = windows.push(["A", "B", "A"], [1.0, 10.0, 2.0])
+    assert len(stations) == 0 and batch.shape == (0, 3) and len(values) == 0
+    stations, batch, values = windows.push(["A", "B", "A"], [3.0, 20.0, 4.0])
+    assert list(stations) == ["A"]
+    np.testing.assert_array_equal(batch, [[1.0, 2.0, 3.0]])
+    np.testing.assert_array_equal(values, [4.0])
+
+# ---------------- Bulk scoring ----------------
+
+def prediction_rows(rng, n_stations, n_rows):
+    stations, true_value = interleaved_readings(rng, n_stations, n_rows)
+    return pd.DataFrame({"station": stations, "true_value": true_value,
+                         "predicted_value": true_value + rng.normal(0, 8, n_rows),
+                         "model_used": rng.choice(MODELS, n_rows), "inference_time": 1e-4,
+                         "energy": rng.uniform(100, 3000, n_rows)})
+
+def test_score_stations_matches_per_station_metrics():
+    rng = np.random.default_rng(0)
+    df = prediction_rows(rng, 9, 2000)
+    stats = score_stations(df, THRESHOLDS)
+
+    for station, rows in df.groupby("station"):
+        r2 = r2_score(rows["true_value"], rows["predicted_value"])
+        energy = (rows["energy"].mean() - THRESHOLDS["E_m"]) / (THRESHOLDS["E_M"] - THRESHOLDS["E_m"])
+        assert stats.loc[station, "rows"] == len(rows)
+        assert stats.loc[station, "r2"] == pytest.approx(r2, rel=1e-9)
+        assert stats.loc[station, "normalized_energy"] == pytest.approx(energy, rel=1e-12)
+        assert stats.loc[station, "score"] == pytest.approx(0.95 * r2 + 0.05 * (1 - energy), rel=1e-9)
+        assert stats.loc[station, "model"] == rows["model_used"].iloc[-1]
+
+def test_score_stations_handles_constant_stations():
+    df = pd.DataFrame({"station": ["A", "A", "B", "B"], "true_value": [5.0, 5.0, 1.0, 3.0],
+                       "predicted_value": [5.0, 6.0, 1.0, 3.0], "model_used": "linear", "energy": 100.0})
+    stats = score_stations(df, THRESHOLDS)
+    assert stats.loc["A", "r2"] == 0.0  # No variance to explain
+    assert stats.loc["B", "r2"] == pytest.approx(1.0)
+
+# ---------------- Bulk planning ----------------
+
+def efficiency(model_name):
+    return MODEL_ENERGY_EFFICIENCY.get(model_name, np.inf)
+
+def reference_choice(current, scores, energy_violated, score_violated):
+    """`plan_switches` for one station, written as the single-stream planner would (no exploration)."""
+    if energy_violated:
+        cheaper = [m for m in MODELS if efficiency(m) < efficiency(current)]
+        if cheaper:
+            chosen = max(cheaper, key=lambda m: (scores[m], -MODELS.index(m)))
+        else:
+            chosen = min(MODELS, key=lambda m: (efficiency(m), MODELS.index(m)))
+    elif score_violated:
+        chosen = max(MODELS, key=lambda m: (scores[m], -MODELS.index(m)))
+    else:
+        return current
+    return chosen
+
+def test_plan_switches_matches_a_per_station_loop():
+    rng = np.random.default_rng(1)
+    n = 300
+    stations = pd.Index([f"S{k}" for k in range(n)])
+    table = pd.DataFrame(index=stations, columns=STATION_TABLE_COLUMNS)
+    table["model"] = rng.choice(MODELS, n)
+    table[EMA_COLUMNS] = rng.uniform(0.5, 1.0, (n, len(MODELS)))
+    table.loc[stations[::7], EMA_COLUMNS[0]] = np.nan  # Unscored models fall back to the default score
+    energy_violated = rng.random(n) < 0.3
+    score_violated = rng.random(n) < 0.3
+
+    expected = []
+    for k, station in enumerate(stations):
+        scores = {m: table.loc[station, c] for m, c in zip(MODELS, EMA_COLUMNS)}
+        scores = {m: 0.5 if pd.isna(s) else s for m, s in scores.items()}
+        expected.append(reference_choice(table.loc[station, "model"], scores, energy_violated[k], score_violated[k]))
+    before = table["model"].copy()
+
+    switched = plan_switches(table, stations, energy_violated, score_violated, alpha=0.0)
+    assert list(table["model"]) == expected
+    assert switched == int((table["model"] != before).sum())
+    assert table.loc[table["model"] != before, "version"].isna().all()
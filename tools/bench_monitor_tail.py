@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+# Make the MAPE modules importable when run as `python tools/<script>.py`
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mape"))
+
+import numpy as np
+import pandas as pd
+from tail_reader import read_appended
+
+COLUMNS = ["true_value", "predicted_value", "model_used", "inference_time", "energy"]
+
+def synthetic_rows(n, seed=0):
+    """Synthetic predictions in the same format inference.py writes."""
+    rng = np.random.default_rng(seed)
+    true_value = rng.uniform(0, 600, n)
+    return pd.DataFrame({
+        "true_value": true_value,
+        "predicted_value": true_value + rng.normal(0, 15, n),
+        "model_used": rng.choice(["lstm", "linear", "svm"], n),
+        "inference_time": rng.uniform(1e-4, 2e-3, n),
+        "energy": rng.uniform(1000, 20000, n)
+    }, columns=COLUMNS)
+
+def write_log(path, existing_rows, block_rows=1_000_000):
+    """Writes a predictions log with `existing_rows` rows by repeating one formatted block."""
+    block = synthetic_rows(min(block_rows, existing_rows)).to_csv(header=False, index=False)
+    with open(path, "w") as f:
+        f.write(",".join(COLUMNS) + "\n")
+        remaining = existing_rows
+        while remaining > 0:
+            n = min(block_rows, remaining)
+            f.write(block if n == block_rows else synthetic_rows(n).to_csv(header=False, index=False))
+            remaining -= n
+
+def main(existing_rows, new_rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "predictions.csv")
+        print(f"Writing {existing_rows:,} existing rows...")
+        write_log(path, existing_rows)
+
+        # State after the previous cycle: every existing row already processed
+        _, state = read_appended(path, None, None, existing_rows)
+        synthetic_rows(new_rows, seed=1).to_csv(path, mode="a", header=False, index=False)
+
+        start_time = time.perf_counter()
+        legacy = pd.read_csv(path, skiprows=range(1, existing_rows + 1))
+        legacy_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        df, _ = read_appended(path, state["last_offset"], state["last_inode"], state["last_line"])
+        tail_time = time.perf_counter() - start_time
+
+        assert len(df) == len(legacy) == new_rows
+        assert np.allclose(df["true_value"].values, legacy["true_value"].values)
+
+        print(f"Cycle with {new_rows:,} new rows after {existing_rows:,} processed rows:")
+        print(f"  skiprows re-scan : {legacy_time * 1000:10.2f} ms")
+        print(f"  byte-offset tail : {tail_time * 1000:10.2f} ms")
+        print(f"  speed-up         : {legacy_time / max(tail_time, 1e-9):10.0f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark one monitor_mape read cycle on a large predictions log.")
+    parser.add_argument("--existing_rows", type=int, default=10_000_000,
+                        help="Rows already processed in predictions.csv (default: 10M).")
+    parser.add_argument("--new_rows", type=int, default=270,
+                        help="Rows appended since the last cycle (default: 270, about 40 s at 0.15 s/sample).")
+    args = parser.parse_args()
+    main(args.existing_rows, args.new_rows)
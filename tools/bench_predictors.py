@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+# Make the shared modules in the repository root importable when run as `python tools/<script>.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import torch
+from benchmark import synthetic_series, train_synthetic_models
+from data_pipeline import create_sequences
+from model_registry import MODEL_FILES, ModelRegistry, predict_windows
+from compiled import max_deviation
+
+def latencies(predict, windows, calls):
+    predict(windows[0])  # Warm-up
+    times = np.empty(calls)
+    for i in range(calls):
+        window = windows[i % len(windows)]
+        start_time = time.perf_counter()
+        predict(window)
+        times[i] = time.perf_counter() - start_time
+    return times * 1e6
+
+def main(model_dir, calls, threads):
+    torch.set_num_threads(threads)
+    with tempfile.TemporaryDirectory() as tmp:
+        if not all(os.path.exists(os.path.join(model_dir, f)) for f in MODEL_FILES.values()):
+            print(f"⚠️ Models missing in {model_dir}: benchmarking models trained on synthetic data.")
+            model_dir = tmp
+            train_synthetic_models(model_dir, epochs=2)
+        registry = ModelRegistry(model_dir)
+    windows, _ = create_sequences(synthetic_series(5000, seed=1), 5)
+
+    print(f"{'model':<8} {'reference p50/p99 (µs)':>24} {'compiled p50/p99 (µs)':>23} {'speedup':>8} {'max deviation':>14}")
+    for name in MODEL_FILES:
+        predictor = registry.compiled.get(name)
+        if predictor is None:
+            print(f"{name:<8} not compiled")
+            continue
+        model, scaler = registry.models[name], registry.scalers[name]
+        reference = latencies(lambda w: registry.predict_reference(name, w), windows, calls)
+        compiled = latencies(predictor, windows, calls)
+        deviation = max_deviation(predictor, lambda w: predict_windows(name, model, scaler, w), scaler, windows[:1000])
+        print(f"{name:<8} {np.percentile(reference, 50):11.1f} / {np.percentile(reference, 99):9.1f}"
+              f" {np.percentile(compiled, 50):10.1f} / {np.percentile(compiled, 99):9.1f}"
+              f" {np.median(reference) / np.median(compiled):7.1f}x {deviation:14.2e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Single-sample latency of compiled vs sklearn/torch predictors.")
+    parser.add_argument("--model_dir", default="models", help="Deployed models (synthetic ones if missing).")
+    parser.add_argument("--calls", type=int, default=5000, help="Predictions per model and path (default: 5000).")
+    parser.add_argument("--threads", type=int, default=1, help="Torch threads (default: 1).")
+    args = parser.parse_args()
+    main(args.model_dir, args.calls, args.threads)
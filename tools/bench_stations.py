@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+# Make the shared and MAPE modules importable when run as `python tools/<script>.py`
+repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(repo_root, "mape"))
+sys.path.insert(0, repo_root)
+
+import numpy as np
+import pandas as pd
+import torch
+from benchmark import train_synthetic_models, quiet
+from knowledge_store import KnowledgeStore, frame_to_value
+from model_registry import ModelRegistry
+from stations import StationWindows, StationRouter
+from drift_monitor import StationDriftMonitor
+from streams import MODELS, STATION_TABLE_COLUMNS, score_stations, update_scores, plan_switches
+
+THRESHOLDS = {"E_m": 0, "E_M": 25000, "beta": 0.95, "gamma": 0.8, "min_score": 0.78, "max_energy": 1}
+
+def synthetic_readings(n_stations, ticks, seed=0):
+    """Interleaved (station, flow) readings: one per station per tick, each station at its own level."""
+    rng = np.random.default_rng(seed)
+    station = np.tile(np.arange(n_stations), ticks)
+    tick = np.repeat(np.arange(ticks), n_stations)
+    level = rng.uniform(100, 500, n_stations)
+    flow = level[station] * (1 + 0.5 * np.sin(2 * np.pi * tick / 288 + station)) + rng.normal(0, 10, len(station))
+    return np.char.add("S", station.astype(str)), flow
+
+def bench_serving(registry, n_stations, ticks):
+    """Predictions/s of the batched station path vs. one single-window prediction per reading."""
+    stations, values = synthetic_readings(n_stations, ticks)
+    assigned = {f"S{s}": MODELS[s % len(MODELS)] for s in range(n_stations)}
+    table = pd.DataFrame({"station": list(assigned), "model": list(assigned.values()), "version": None})
+    registry.store.set("streams", {"stations": frame_to_value(table)})
+    router = StationRouter(registry)
+
+    windows = StationWindows()
+    start_time = time.perf_counter()
+    batch_stations, batch_windows, _ = windows.push(stations, values)
+    router.predict(batch_stations, batch_windows)
+    batched = len(batch_stations) / (time.perf_counter() - start_time)
+
+    # One process per station would predict every reading on its own
+    sample = min(len(batch_stations), 2000)
+    start_time = time.perf_counter()
+    for station, window in zip(batch_stations[:sample], batch_windows[:sample]):
+        registry.predict_with(assigned[station], window)
+    per_reading = sample / (time.perf_counter() - start_time)
+    return batched, per_reading
+
+def bench_cycle(n_stations, rows_per_station):
+    """Milliseconds of one bulk monitor/analyse/plan/drift cycle over all stations."""
+    stations, values = synthetic_readings(n_stations, rows_per_station, seed=1)
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({"station": stations, "true_value": values,
+                       "predicted_value": values + rng.normal(0, 15, len(values)),
+                       "model_used": rng.choice(MODELS, len(values)), "inference_time": 1e-5,
+                       "energy": rng.uniform(100, 2000, len(values))})
+    drift = StationDriftMonitor(window_size=rows_per_station // 2)
+    start_time = time.perf_counter()
+    drift.ingest(df["station"].values, df["true_value"].values)
+    stats = score_stations(df, THRESHOLDS)
+    table = pd.DataFrame(index=stats.index, columns=STATION_TABLE_COLUMNS)
+    table["model"] = stats["model"]
+    energy_violated, score_violated = update_scores(table, stats, THRESHOLDS)
+    plan_switches(table, stats.index, energy_violated, score_violated, 0.1)
+    drift.kl_divergences()
+    return (time.perf_counter() - start_time) * 1000
+
+def main(station_counts, ticks, threads):
+    torch.set_num_threads(threads)
+    with tempfile.TemporaryDirectory() as tmp:
+        with quiet():
+            train_synthetic_models(tmp, epochs=2)
+            registry = ModelRegistry(tmp, store=KnowledgeStore(os.path.join(tmp, "knowledge.db")))
+
+        print(f"{'stations':>9} {'batched (pred/s)':>17} {'per reading (pred/s)':>21} {'speedup':>8} {'MAPE cycle (ms)':>16}")
+        for n_stations in station_counts:
+            batched, per_reading = bench_serving(registry, n_stations, ticks)
+            cycle_ms = bench_cycle(n_stations, 2 * ticks)
+            print(f"{n_stations:>9,} {batched:>17,.0f} {per_reading:>21,.0f} {batched / per_reading:>7.1f}x {cycle_ms:>16.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-station serving throughput and bulk MAPE cycle cost.")
+    parser.add_argument("--stations", type=int, nargs="+", default=[10, 100, 1000],
+                        help="Station counts to benchmark (default: 10 100 1000).")
+    parser.add_argument("--ticks", type=int, default=50, help="Readings per station (default: 50).")
+    parser.add_argument("--threads", type=int, default=1, help="Torch threads (default: 1).")
+    args = parser.parse_args()
+    main(args.stations, args.ticks, args.threads)
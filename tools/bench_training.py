@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+import argparse
+
+# Make the shared modules in the repository root importable when run as `python tools/<script>.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import DataLoader, TensorDataset
+from sklearn.preprocessing import MinMaxScaler
+from data_pipeline import create_sequences
+from model_registry import LSTMModel
+from training import train_lstm, set_thread_budget
+
+try:
+    import pyRAPL
+    pyRAPL.setup()
+except Exception:
+    pyRAPL = None
+
+def load_series(path, rows):
+    """Scaled flow series from `path`, or a synthetic daily pattern with noise if it does not exist."""
+    if path and os.path.exists(path):
+        data = pd.read_csv(path)["flow"].values[:rows]
+    else:
+        rng = np.random.default_rng(0)
+        t = np.arange(rows)
+        data = 300 + 200 * np.sin(2 * np.pi * t / 288) + rng.normal(0, 20, rows)
+    return MinMaxScaler().fit_transform(data.reshape(-1, 1)).flatten()
+
+def legacy_train(model, X_train, y_train, epochs):
+    """The original loop: DataLoader(batch_size=16, shuffle=True), Adam(lr=0.001)."""
+    X_tensor = torch.tensor(X_train, dtype=torch.float32).unsqueeze(-1)
+    y_tensor = torch.tensor(y_train, dtype=torch.float32).unsqueeze(-1)
+    criterion = nn.MSELoss()
+    optimizer = optim.Adam(model.parameters(), lr=0.001)
+    train_loader = DataLoader(TensorDataset(X_tensor, y_tensor), batch_size=16, shuffle=True)
+    for epoch in range(epochs):
+        for X_batch, y_batch in train_loader:
+            optimizer.zero_grad()
+            loss = criterion(model(X_batch), y_batch)
+            loss.backward()
+            optimizer.step()
+    return model
+
+def test_mse(model, X_test, y_test):
+    model.eval()
+    with torch.inference_mode():
+        predictions = model(torch.tensor(X_test, dtype=torch.float32).unsqueeze(-1)).numpy().flatten()
+    return float(np.mean((predictions - y_test) ** 2))
+
+def measure(label, train, epochs, n_samples, X_test, y_test):
+    torch.manual_seed(0)
+    meter = pyRAPL.Measurement(label) if pyRAPL else None
+    if meter:
+        meter.begin()
+    start_time = time.perf_counter()
+    model = train(LSTMModel())
+    wall_time = time.perf_counter() - start_time
+    if meter:
+        meter.end()
+
+    joules = meter.result.pkg[0] / 1e6 / epochs if meter else None
+    print(f"  {label:<28} {n_samples * epochs / wall_time:12,.0f} samples/s  "
+          f"{wall_time / epochs * 1000:9.1f} ms/epoch  "
+          f"{'%10.2f J/epoch' % joules if joules is not None else '       n/a J/epoch'}  "
+          f"test MSE {test_mse(model, X_test, y_test):.5f}")
+
+def main(path, rows, epochs, batch_sizes, threads):
+    threads = set_thread_budget(threads)
+    data = load_series(path, rows)
+    split_idx = int(len(data) * 0.8)
+    X_train, y_train = create_sequences(data[:split_idx], 5)
+    X_test, y_test = create_sequences(data[split_idx:], 5)
+    n_samples = len(X_train)
+
+    print(f"{n_samples:,} training windows, {epochs} epochs, {threads} torch threads"
+          f"{'' if pyRAPL else ' (pyRAPL unavailable: no energy)'}")
+    measure("legacy DataLoader (bs=16)", lambda m: legacy_train(m, X_train, y_train, epochs),
+            epochs, n_samples, X_test, y_test)
+    for batch_size in batch_sizes:
+        measure(f"index batches (bs={batch_size})",
+                lambda m: train_lstm(m, X_train, y_train, epochs=epochs, batch_size=batch_size, seed=0)[0],
+                epochs, n_samples, X_test, y_test)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the LSTM training engine against the DataLoader loop.")
+    parser.add_argument("--input", default="data/pems/flow_data_train.csv",
+                        help="CSV with a `flow` column (synthetic data if missing).")
+    parser.add_argument("--rows", type=int, default=20000, help="Rows of the series to use (default: 20000).")
+    parser.add_argument("--epochs", type=int, default=10, help="Epochs per run (default: 10).")
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[64, 128, 256],
+                        help="Batch sizes for the engine (default: 64 128 256).")
+    parser.add_argument("--threads", type=int, default=None, help="Torch thread budget (default: min(4, cores)).")
+    args = parser.parse_args()
+    main(args.input, args.rows, args.epochs, args.batch_sizes, args.threads)
@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+# Make the shared modules in the repository root importable when run as `python tools/<script>.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from data_pipeline import create_sequences, iter_sequences
+
+def create_sequences_legacy(data, seq_length=5):
+    """The list-of-slices implementation previously copied into each script."""
+    X, y = [], []
+    for i in range(len(data) - seq_length):
+        X.append(data[i:i+seq_length])
+        y.append(data[i+seq_length])
+    return np.array(X), np.array(y)
+
+def measure(fn):
+    """Returns (seconds, peak traced bytes). Timing runs untraced, since tracemalloc slows allocations."""
+    start_time = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start_time
+    del result
+
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak
+
+def consume_chunks(data, seq_length, chunk_rows):
+    """Windows the series chunk by chunk and touches every window (sum of y)."""
+    chunks = (data[i:i + chunk_rows] for i in range(0, len(data), chunk_rows))
+    total = 0.0
+    for X, y in iter_sequences(chunks, seq_length):
+        total += float(y.sum())
+    return total
+
+def main(rows, seq_length, chunk_rows):
+    print(f"Generating {rows:,} synthetic rows...")
+    data = np.random.default_rng(0).random(rows)
+
+    results = {}
+    for name, fn in [
+        ("legacy list + np.array", lambda: create_sequences_legacy(data, seq_length)),
+        ("sliding_window_view", lambda: create_sequences(data, seq_length)),
+        (f"iter_sequences ({chunk_rows:,}-row chunks)", lambda: consume_chunks(data, seq_length, chunk_rows)),
+    ]:
+        elapsed, peak = measure(fn)
+        results[name] = (elapsed, peak)
+        print(f"{name:<40} time: {elapsed:8.3f} s   peak memory: {peak / 2**20:10.1f} MiB")
+
+    legacy_time, legacy_peak = results["legacy list + np.array"]
+    view_time, view_peak = results["sliding_window_view"]
+    print(f"\nStrided view saves {legacy_time - view_time:.3f} s ({legacy_time / max(view_time, 1e-9):,.0f}x faster) "
+          f"and {(legacy_peak - view_peak) / 2**20:,.1f} MiB of peak memory at {rows:,} rows.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark time series windowing (legacy lists vs strided views).")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Number of rows in the series (default: 10M).")
+    parser.add_argument("--seq_length", type=int, default=5, help="Window length (default: 5).")
+    parser.add_argument("--chunk_rows", type=int, default=100_000, help="Chunk size for the iterator path (default: 100k).")
+    args = parser.parse_args()
+    main(args.rows, args.seq_length, args.chunk_rows)
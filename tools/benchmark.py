@@ -0,0 +1,296 @@
+import os
+import io
+import sys
+import json
+import time
+import pickle
+import socket
+import platform
+import argparse
+import resource
+import tempfile
+import subprocess
+import contextlib
+
+# Make the shared modules in the repository root importable when run as `python tools/<script>.py`
+repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_root)
+
+import numpy as np
+import torch
+from sklearn.svm import SVR
+from sklearn.linear_model import Ridge
+from sklearn.preprocessing import MinMaxScaler
+from bench_monitor_tail import write_log, synthetic_rows  # Also makes the MAPE modules importable
+from data_pipeline import create_sequences
+from model_registry import (MODEL_FILES, LSTM_FAMILIES, QUANTIZED_LSTM, LSTMModel, scaler_file, save_scaler, load_model,
+                            load_scaler, predict_windows, quantize_lstm, model_state)
+from training import train_lstm
+import model_store
+from model_store import ModelStore
+from drift_monitor import StreamingDriftMonitor
+import monitor
+import analyse
+
+BATCH_SIZES = [1, 8, 64, 512, 4096]
+LOG_SIZES = [10_000, 100_000, 1_000_000]
+VERSION_COUNTS = [10, 50, 200]
+
+COLD_LOAD = """
+import sys, time, json, resource
+start_time = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+from model_registry import load_model, load_scaler
+imported = time.perf_counter()
+load_model(sys.argv[2], sys.argv[3])
+load_scaler(sys.argv[4])
+loaded = time.perf_counter()
+print(json.dumps({"import_s": imported - start_time, "load_s": loaded - imported,
+                  "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+def synthetic_series(n, seed=0, level=300.0):
+    """Daily traffic-like pattern with noise, in flow units."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n)
+    return level + 200 * np.sin(2 * np.pi * t / 288) + rng.normal(0, 20, n)
+
+def percentiles(seconds):
+    seconds = np.asarray(seconds) * 1000
+    return {"p50_ms": float(np.percentile(seconds, 50)), "p95_ms": float(np.percentile(seconds, 95)),
+            "p99_ms": float(np.percentile(seconds, 99))}
+
+def median_time(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start_time)
+    return float(np.median(times))
+
+@contextlib.contextmanager
+def quiet():
+    """Keeps the MAPE functions' progress prints out of the benchmark output."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+# ---------------- Models ----------------
+
+def train_synthetic_models(model_dir, epochs):
+    """Trains every family on synthetic data (latency does not depend on accuracy) and saves it to `model_dir`."""
+    data = synthetic_series(5000)
+    scaler = MinMaxScaler().fit(data.reshape(-1, 1))
+    X, y = create_sequences(scaler.transform(data.reshape(-1, 1)).flatten(), 5)
+    lstm = train_lstm(LSTMModel(), X, y, epochs=epochs, seed=0)[0]
+    models = {
+        "lstm": lstm,
+        "lstm-q": quantize_lstm(lstm),
+        "linear": Ridge(alpha=256).fit(X, y),
+        "svm": SVR(kernel="linear", C=0.05, tol=0.16).fit(X, y)
+    }
+    for name, model in models.items():
+        path = os.path.join(model_dir, MODEL_FILES[name])
+        if name in LSTM_FAMILIES:
+            torch.save(model_state(name, model), path)
+        else:
+            with open(path, "wb") as f:
+                pickle.dump(model, f)
+        save_scaler(scaler, os.path.join(model_dir, scaler_file(name)))
+    return models, scaler
+
+def bench_models(model_dir, models, scaler, windows, targets, calls, batch_sizes):
+    results = {}
+    for name, model in models.items():
+        path = os.path.join(model_dir, MODEL_FILES[name])
+        scaler_path = os.path.join(model_dir, scaler_file(name))
+
+        # Cold: a fresh interpreter (imports + deserialization); warm: deserialization only
+        child = subprocess.run([sys.executable, "-c", COLD_LOAD, repo_root, name, path, scaler_path],
+                               capture_output=True, text=True, check=True)
+        cold = json.loads(child.stdout.strip().splitlines()[-1])
+        warm_s = median_time(lambda: (load_model(name, path), load_scaler(scaler_path)), 20)
+
+        # Single-sample latency, as in the streaming loop
+        predict_windows(name, model, scaler, windows[:1])
+        latencies = []
+        for i in range(calls):
+            start_time = time.perf_counter()
+            predict_windows(name, model, scaler, windows[i % len(windows)][None])
+            latencies.append(time.perf_counter() - start_time)
+
+        throughput = {}
+        for batch_size in batch_sizes:
+            n_calls = max(3, 20_000 // batch_size)
+            batch = windows[:batch_size]
+            seconds = median_time(lambda: predict_windows(name, model, scaler, batch), n_calls)
+            throughput[str(batch_size)] = len(batch) / seconds
+
+        results[name] = {
+            "mae": float(np.mean(np.abs(predict_windows(name, model, scaler, windows) - targets))),
+            "file_kb": os.path.getsize(path) / 1024,
+            "cold_load": cold,
+            "warm_load_ms": warm_s * 1000,
+            "latency_ms": percentiles(latencies),
+            "throughput_samples_per_s": throughput
+        }
+        print(f"🔬 {name:<7} cold load {cold['import_s'] + cold['load_s']:.2f} s "
+              f"(RSS {cold['peak_rss_mb']:.0f} MB), warm load {warm_s * 1000:.2f} ms, "
+              f"p50 {results[name]['latency_ms']['p50_ms']:.3f} ms, p99 {results[name]['latency_ms']['p99_ms']:.3f} ms, "
+              f"bs={batch_sizes[-1]} {throughput[str(batch_sizes[-1])]:,.0f} samples/s")
+
+    # What the quantized LSTM trades: MAE for file size (derived from the figures above; it computes like the LSTM)
+    if "lstm" in results and QUANTIZED_LSTM in results:
+        full, quantized = results["lstm"], results[QUANTIZED_LSTM]
+        print(f"🔬 lstm-q vs lstm: MAE {quantized['mae'] / full['mae'] - 1:+.2%}, "
+              f"p50 {quantized['latency_ms']['p50_ms'] / full['latency_ms']['p50_ms']:.2f}x lstm's, "
+              f"file {quantized['file_kb'] / full['file_kb']:.0%} of the size")
+    return results
+
+# ---------------- MAPE Overhead ----------------
+
+def bench_monitors(tmp, log_sizes, new_rows=270):
+    """Cost of one monitor_mape cycle and one drift poll as predictions.csv grows."""
+    results = {"monitor_mape_ms": {}, "monitor_drift_first_ms": {}, "monitor_drift_ms": {}}
+    thresholds = {"E_m": 0, "E_M": 25000, "beta": 0.95, "gamma": 0.8}
+    for rows in log_sizes:
+        path = os.path.join(tmp, f"predictions_{rows}.csv")
+        write_log(path, rows)
+        size = os.path.getsize(path)
+        synthetic_rows(new_rows, seed=1).to_csv(path, mode="a", header=False, index=False)
+
+        # State after the previous cycle: every row before the new ones already processed
+        monitor.predictions_file = path
+        def cycle():
+            kb = {"model": "lstm", "thresholds": thresholds,
+                  "mape_info": {"last_line": rows, "last_offset": size, "last_inode": os.stat(path).st_ino,
+                                "ema_scores": {"lstm": 0.8, "linear": 0.8, "svm": 0.8}}}
+            with quiet():
+                monitor.monitor_mape(kb)
+        results["monitor_mape_ms"][str(rows)] = median_time(cycle, 5) * 1000
+
+        drift = StreamingDriftMonitor(path, window_size=1200)
+        start_time = time.perf_counter()
+        with quiet():
+            drift.poll()
+        results["monitor_drift_first_ms"][str(rows)] = (time.perf_counter() - start_time) * 1000
+
+        # Steady state: each 3 s check ingests the few rows appended since the last one
+        # (KL only once both windows are full, as the drift thread does; small logs never fill them)
+        polls = []
+        for _ in range(20):
+            synthetic_rows(20, seed=2).to_csv(path, mode="a", header=False, index=False)
+            with quiet():
+                polls.append(median_time(lambda: (drift.poll(), drift.ready() and drift.kl_divergence()), 1))
+        results["monitor_drift_ms"][str(rows)] = float(np.median(polls)) * 1000
+        os.remove(path)
+
+        print(f"📈 {rows:>10,} rows: monitor_mape {results['monitor_mape_ms'][str(rows)]:.2f} ms, "
+              f"drift first poll {results['monitor_drift_first_ms'][str(rows)]:.2f} ms, "
+              f"drift poll {results['monitor_drift_ms'][str(rows)]:.3f} ms"
+              f"{'' if drift.ready() else ' (windows not full, no KL)'}")
+    return results
+
+def bench_versions(tmp, version_counts, scaler):
+    """Cost of get_best_version as versionedMR grows."""
+    results = {}
+    cwd = os.getcwd()
+    for count in version_counts:
+        root = os.path.join(tmp, f"store_{count}")
+        os.makedirs(os.path.join(root, "knowledge"))
+        store = ModelStore(os.path.join(root, "versionedMR"), os.path.join(root, "models"))
+        with quiet():
+            for v in range(count):
+                data = synthetic_series(1500, seed=v, level=100 + 400 * v / max(count - 1, 1))
+                X, y = create_sequences(scaler.transform(data.reshape(-1, 1)).flatten(), 5)
+                store.add_version("linear", Ridge(alpha=200).fit(X, y), scaler, data,
+                                  retention={"keep_per_model": None})
+
+        drift_data = synthetic_series(1200, seed=count + 1, level=250)
+        os.chdir(root)
+        try:
+            model_store.stores.clear()
+            with quiet():
+                results[str(count)] = median_time(lambda: analyse.get_best_version("linear", drift_data, "all"), 5) * 1000
+        finally:
+            os.chdir(cwd)
+            model_store.stores.clear()
+        print(f"🗂️ {count:>5} versions: get_best_version {results[str(count)]:.2f} ms")
+    return results
+
+# ---------------- Comparison ----------------
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare(old, new, tolerance):
+    """Prints relative changes and returns the metrics that regressed by more than `tolerance`."""
+    old_flat, new_flat = flatten(old["results"]), flatten(new["results"])
+    regressions = []
+    print(f"\n{'metric':<70} {'old':>12} {'new':>12} {'change':>8}")
+    for name in sorted(set(old_flat) & set(new_flat)):
+        before, after = old_flat[name], new_flat[name]
+        if before == 0:
+            continue
+        change = (after - before) / before
+        higher_is_better = "per_s" in name
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<70} {before:>12.4g} {after:>12.4g} {change:>+7.1%}{'  ⚠️' if regressed else ''}")
+    print(f"\n{len(regressions)} regression(s) beyond {tolerance:.0%}")
+    return regressions
+
+def main(args):
+    torch.set_num_threads(args.threads)
+    report = {
+        "meta": {"timestamp": time.time(), "host": socket.gethostname(), "python": platform.python_version(),
+                 "torch": torch.__version__, "threads": args.threads, "args": vars(args)},
+        "results": {}
+    }
+    windows, targets = create_sequences(synthetic_series(20_000, seed=3), 5)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = os.path.join(tmp, "models")
+        os.makedirs(model_dir)
+        print("Training synthetic models...")
+        models, scaler = train_synthetic_models(model_dir, args.lstm_epochs)
+        report["results"]["models"] = bench_models(model_dir, models, scaler, windows, targets, args.calls,
+                                                 args.batch_sizes)
+        report["results"]["mape"] = bench_monitors(tmp, args.log_sizes)
+        report["results"]["mape"]["get_best_version_ms"] = bench_versions(tmp, args.version_counts, scaler)
+
+    report["results"]["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✔ Results written to {args.output} (peak RSS {report['results']['peak_rss_mb']:.0f} MB)")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HarmonE benchmark suite on synthetic data (no PEMS dataset needed).")
+    parser.add_argument("--output", default="knowledge/benchmark.json", help="JSON results file (default: %(default)s).")
+    parser.add_argument("--compare", default=None, help="Previous results JSON to diff against; exits 1 on regressions.")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Relative change counted as a regression (default: 0.2).")
+    parser.add_argument("--calls", type=int, default=2000, help="Single-sample predictions per model (default: 2000).")
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=BATCH_SIZES,
+                        help="Batch sizes for throughput (default: 1 8 64 512 4096).")
+    parser.add_argument("--log_sizes", type=int, nargs="+", default=LOG_SIZES,
+                        help="predictions.csv sizes in rows for the MAPE overhead (default: 10k 100k 1M).")
+    parser.add_argument("--version_counts", type=int, nargs="+", default=VERSION_COUNTS,
+                        help="Stored versions for get_best_version (default: 10 50 200).")
+    parser.add_argument("--lstm_epochs", type=int, default=2, help="Epochs for the synthetic LSTM (default: 2).")
+    parser.add_argument("--threads", type=int, default=1, help="Torch threads (default: 1).")
+    args = parser.parse_args()
+    main(args)
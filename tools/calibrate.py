@@ -0,0 +1,71 @@
+import os
+import sys
+import argparse
+
+# Make the shared modules in the repository root importable when run as `python tools/<script>.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge_store import get_store
+from model_registry import MODEL_FILES, scaler_file, load_model, load_scaler, fit_fallback_scaler, model_dir
+from model_store import get_model_store, version_key
+from calibration import (BATCH_SIZES, default_input, pyRAPL, load_windows, new_profile, calibrate,
+                         recalibrate_published)
+
+def main(input_path, batch_sizes, calls, versions):
+    windows = load_windows(input_path)
+    store = get_model_store()
+    current = store.load_current()
+    profile = new_profile(batch_sizes)
+    if pyRAPL is None:
+        print("⚠️ pyRAPL unavailable: calibrating latency only.")
+
+    fallback_scaler = None
+    for model_name, model_file in MODEL_FILES.items():
+        path = os.path.join(model_dir, model_file)
+        if not os.path.exists(path):
+            print(f"⚠️ {path} not found, skipping {model_name}.")
+            continue
+        scaler_path = os.path.join(model_dir, scaler_file(model_name))
+        if os.path.exists(scaler_path):
+            scaler = load_scaler(scaler_path)
+        else:
+            fallback_scaler = fallback_scaler or fit_fallback_scaler()
+            scaler = fallback_scaler
+        result = calibrate(model_name, load_model(model_name, path), scaler, windows, batch_sizes, calls)
+        result["version"] = current.get(model_name)
+        profile["models"][model_name] = result
+        energy = f"{result['energy_uJ']:.1f} µJ" if result["energy_uJ"] is not None else "n/a"
+        print(f"🔬 {model_name:<7} p50 {result['latency_ms']['p50_ms']:.3f} ms  "
+              f"p99 {result['latency_ms']['p99_ms']:.3f} ms  energy/prediction {energy}")
+
+    if versions:
+        for entry in store.entries():
+            key = version_key(entry["model"], entry["version"])
+            model, scaler = store.load_version(entry)
+            if scaler is None:
+                fallback_scaler = fallback_scaler or fit_fallback_scaler()
+                scaler = fallback_scaler
+            profile["versions"][key] = calibrate(entry["model"], model, scaler, windows, batch_sizes, calls)
+            print(f"🔬 {key:<20} p50 {profile['versions'][key]['latency_ms']['p50_ms']:.3f} ms")
+
+    get_store().set("profile", profile)
+    print(f"✔ Calibration profile for {len(profile['models'])} models and {len(profile['versions'])} versions "
+          f"stored in the knowledge base")
+    return profile
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark each model on this machine and store a calibration profile.")
+    parser.add_argument("--input", default=default_input,
+                        help="CSV with a `flow` column to draw windows from (synthetic data if missing).")
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=BATCH_SIZES,
+                        help="Batch sizes to measure (default: 1 16 256).")
+    parser.add_argument("--calls", type=int, default=500, help="Predict calls per batch size (default: 500).")
+    parser.add_argument("--no_versions", action="store_true",
+                        help="Only calibrate the deployed models, not every stored version.")
+    parser.add_argument("--models", nargs="+", choices=list(MODEL_FILES), default=None,
+                        help="Only re-measure the published versions of these families, keeping the rest of the profile.")
+    args = parser.parse_args()
+    if args.models:
+        recalibrate_published(args.models, args.batch_sizes, args.calls, load_windows(args.input))
+    else:
+        main(args.input, args.batch_sizes, args.calls, not args.no_versions)
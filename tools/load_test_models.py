@@ -1,11 +1,18 @@
+import os
+import sys
+
+# Make the shared modules in the repository root importable when run as `python tools/<script>.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import torch
 import torch.nn as nn
 import pickle
-import numpy as np
 import pandas as pd
-import time
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.metrics import r2_score
+from data_pipeline import create_sequences
+
+# Accuracy check only; latency, throughput and load times are measured by tools/benchmark.py
 
 # ---------------- Load Dataset ----------------
 print("Loading dataset...")
@@ -23,14 +30,6 @@ train_data, test_data = data_scaled[:split_idx], data_scaled[split_idx:]
 
 print("Dataset loaded and split into train/test.")
 
-# Create time series sequences
-def create_sequences(data, seq_length=10):
-    X, y = [], []
-    for i in range(len(data) - seq_length):
-        X.append(data[i:i+seq_length])
-        y.append(data[i+seq_length])
-    return np.array(X), np.array(y)
-
 # Prepare test sequences
 seq_length = 5
 X_test, y_test = create_sequences(test_data, seq_length)
@@ -57,37 +56,27 @@ lstm_model.eval()
 
 # Convert test data to tensor
 X_test_tensor = torch.tensor(X_test, dtype=torch.float32).unsqueeze(-1)
-
-# Measure LSTM inference time
-start_time = time.time()
 y_pred_lstm = lstm_model(X_test_tensor).detach().numpy().flatten()
-lstm_inference_time = time.time() - start_time
 
-print(f"LSTM model loaded. Inference time: {lstm_inference_time:.6f} seconds.")
+print("LSTM model loaded.")
 
 # ---------------- Load Linear Regression Model ----------------
 print("Loading Linear Regression model...")
 with open("models/lr_model.pkl", "rb") as f:
     lr_model = pickle.load(f)
 
-# Measure Linear Regression inference time
-start_time = time.time()
 y_pred_lr = lr_model.predict(X_test)
-lr_inference_time = time.time() - start_time
 
-print(f"Linear Regression model loaded. Inference time: {lr_inference_time:.6f} seconds.")
+print("Linear Regression model loaded.")
 
 # ---------------- Load SVM Model ----------------
 print("Loading SVM model...")
 with open("models/svm_model.pkl", "rb") as f:
     svm_model = pickle.load(f)
 
-# Measure SVM inference time
-start_time = time.time()
 y_pred_svm = svm_model.predict(X_test)
-svm_inference_time = time.time() - start_time
 
-print(f"SVM model loaded. Inference time: {svm_inference_time:.6f} seconds.")
+print("SVM model loaded.")
 
 # ---------------- Denormalize Predictions ----------------
 y_test_actual = scaler.inverse_transform(y_test.reshape(-1, 1)).flatten()
@@ -102,12 +91,6 @@ print(f"LSTM Predicted: {y_pred_lstm_actual[:10]}")
 print(f"Linear Regression Predicted: {y_pred_lr_actual[:10]}")
 print(f"SVM Predicted: {y_pred_svm_actual[:10]}")
 
-# ---------------- Print Inference Time ----------------
-print("\nInference Time Summary:")
-print(f"LSTM Inference Time: {lstm_inference_time:.6f} seconds")
-print(f"Linear Regression Inference Time: {lr_inference_time:.6f} seconds")
-print(f"SVM Inference Time: {svm_inference_time:.6f} seconds")
-
 # ---------------- Evaluate Models ----------------
 
 print("\nEvaluation Scores:")
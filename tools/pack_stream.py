@@ -0,0 +1,39 @@
+import os
+import sys
+import argparse
+
+# Make the shared modules in the repository root importable when run as `python tools/<script>.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from stream_source import CSVChunkSource
+
+def main(input_path, output_path, column, chunksize):
+    """Converts a flow CSV into a `.npy` file that `inference.py --source memmap` can map."""
+    source = CSVChunkSource(input_path, column=column, chunksize=chunksize)
+
+    # First pass counts rows so the output can be preallocated on disk
+    total_rows = sum(len(chunk) for chunk in source.chunks())
+    out = np.lib.format.open_memmap(output_path, mode="w+", dtype=np.float64, shape=(total_rows,))
+
+    offset = 0
+    for chunk in source.chunks():
+        out[offset:offset + len(chunk)] = chunk
+        offset += len(chunk)
+    out.flush()
+    del out
+
+    print(f"Packed {total_rows} rows from {input_path} into {output_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Pack a flow CSV into a binary .npy series for memory-mapped replay."
+    )
+    parser.add_argument("--input", default="data/pems/flow_data_test.csv",
+                        help="CSV file to convert (default: data/pems/flow_data_test.csv).")
+    parser.add_argument("--output", default="data/pems/flow_data_test.npy",
+                        help="Output .npy file (default: data/pems/flow_data_test.npy).")
+    parser.add_argument("--column", default="flow", help="Column to extract (default: flow).")
+    parser.add_argument("--chunksize", type=int, default=100000, help="Rows per read (default: 100000).")
+    args = parser.parse_args()
+    main(args.input, args.output, args.column, args.chunksize)
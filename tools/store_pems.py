@@ -1,39 +1,60 @@
+import os
 import pandas as pd
 import glob
 import argparse
 
+STATION_COLUMN = "Station"  # Present in multi-station exports; otherwise the file name is the station id
+
+def read_station_file(file):
+    """Reads one PEMS CSV as (station, flow) rows."""
+    columns = pd.read_csv(file, nrows=0).columns
+    if STATION_COLUMN in columns:
+        df = pd.read_csv(file, usecols=[STATION_COLUMN, "Flow (Veh/5 Minutes)"])
+        df.rename(columns={STATION_COLUMN: "station"}, inplace=True)
+    else:
+        df = pd.read_csv(file, usecols=["Flow (Veh/5 Minutes)"])
+        df.insert(0, "station", os.path.splitext(os.path.basename(file))[0])
+    df.rename(columns={"Flow (Veh/5 Minutes)": "flow"}, inplace=True)
+    df["station"] = df["station"].astype(str)
+    return df
+
 def main(train_ratio):
     # Path to your CSV files (please place your PEMS CSV files in this folder)
     file_paths = sorted(glob.glob("data/pems/raw/*.csv"))
-    
+
     if not file_paths:
         print("No CSV files found in data/pems/raw/. Please place your PEMS CSV files there.")
         return
 
-    # Read and concatenate the 'Flow (Veh/5 Minutes)' column from each file
+    # Read the 'Flow (Veh/5 Minutes)' column of each file, keeping the station it belongs to
     flow_data = []
     for file in file_paths:
         print(f"Processing file: {file}")
-        df = pd.read_csv(file, usecols=["Flow (Veh/5 Minutes)"])
-        flow_data.append(df)
-    
-    # Concatenate all data into a single DataFrame and rename the column to 'flow'
+        flow_data.append(read_station_file(file))
     merged_df = pd.concat(flow_data, ignore_index=True)
-    merged_df.rename(columns={"Flow (Veh/5 Minutes)": "flow"}, inplace=True)
-    
-    total_rows = merged_df.shape[0]
-    train_rows = int(total_rows * train_ratio)
-    
-    # Split into training and test data
-    train_df = merged_df.iloc[:train_rows]
-    test_df = merged_df.iloc[train_rows:]
-    
+
+    # Single-stream data: the first `train_ratio` of the concatenated series trains, the rest is replayed
+    train_rows = int(len(merged_df) * train_ratio)
+    train_df = merged_df[["flow"]].iloc[:train_rows]
+    test_df = merged_df[["flow"]].iloc[train_rows:]
+
     # Save training data (used for training the first version of models) and test data (used for system simulation)
     train_df.to_csv("data/pems/flow_data_train.csv", index=False)
     test_df.to_csv("data/pems/flow_data_test.csv", index=False)
-    
-    print(f"Saved {train_rows} rows to data/pems/flow_data_train.csv")
-    print(f"Saved {total_rows - train_rows} rows to data/pems/flow_data_test.csv")
+
+    # Multi-station replay (`inference.py --stations`): the part of each station's series after its own
+    # `train_ratio`, one reading per station per 5-minute step
+    position = merged_df.groupby("station", sort=False).cumcount()
+    length = merged_df.groupby("station", sort=False)["flow"].transform("size")
+    stations_test = merged_df[position >= (length * train_ratio).astype(int)]
+    tick = stations_test.groupby("station", sort=False).cumcount()
+    stations_df = stations_test.assign(tick=tick.values).sort_values("tick", kind="stable").drop(columns="tick")
+    stations_df.to_csv("data/pems/flow_data_stations_test.csv", index=False)
+
+    print(f"Saved {len(train_df)} rows to data/pems/flow_data_train.csv")
+    print(f"Saved {len(test_df)} rows to data/pems/flow_data_test.csv")
+    print(f"Saved {len(stations_df)} rows from {merged_df['station'].nunique()} stations "
+          f"to data/pems/flow_data_stations_test.csv")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -41,7 +62,8 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "--train_ratio", type=float, default=0.1,
-        help="Proportion of data to be used as training data (default: 0.1). "
+        help="Proportion of data to be used as training data (default: 0.1), and of each station's data "
+             "held back from the multi-station replay. "
              "Training data is used to train the first version of models, while the remaining test data is used to simulate the system."
     )
     args = parser.parse_args()
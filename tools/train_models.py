@@ -1,60 +1,34 @@
 import os
+import sys
 import time
+
+# Make the shared modules in the repository root importable when run as `python tools/<script>.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import numpy as np
 import pandas as pd
 import torch
-import torch.nn as nn
-import torch.optim as optim
-import pickle
 from tqdm import tqdm
 from sklearn.svm import SVR
 from sklearn.linear_model import Ridge
 from sklearn.metrics import mean_absolute_error
 from sklearn.preprocessing import MinMaxScaler
-from torch.utils.data import DataLoader, TensorDataset
-
-# Ensure base directories exist
-base_dir = "versionedMR"
-os.makedirs(base_dir, exist_ok=True)
-original_model_dir = "models"
-os.makedirs(original_model_dir, exist_ok=True)
-
-def get_next_version(model_name):
-    """Finds the next version number for a given model."""
-    model_dir = os.path.join(base_dir, model_name)
-    os.makedirs(model_dir, exist_ok=True)  # Ensure model-specific directory exists
-    existing_versions = [d for d in os.listdir(model_dir) if d.startswith("version_")]
-    
-    if existing_versions:
-        existing_versions = sorted([int(v.split("_")[-1]) for v in existing_versions])
-        return existing_versions[-1] + 1
-    return 1  # Start from version_1 if none exists
-
-def save_model_and_data(model, model_name, train_data_scaled, scaler):
-    """Saves the trained model and corresponding training data in both the versioned and original directory."""
-    version = get_next_version(model_name)
-    version_path = os.path.join(base_dir, model_name, f"version_{version}")
-    os.makedirs(version_path, exist_ok=True)
-
-    # Save model in both locations
-    if model_name == "lstm":
-        model_path = os.path.join(original_model_dir, f"{model_name}.pth")
-        torch.save(model.state_dict(), model_path)
-        torch.save(model.state_dict(), os.path.join(version_path, f"{model_name}.pth"))
-    else:
-        model_path = os.path.join(original_model_dir, f"{model_name}.pkl")
-        with open(model_path, "wb") as f:
-            pickle.dump(model, f)
-        with open(os.path.join(version_path, f"{model_name}.pkl"), "wb") as f:
-            pickle.dump(model, f)
+from data_pipeline import create_sequences
+from model_registry import LSTMModel, quantize_lstm
+from model_store import get_model_store
+from training import train_lstm
 
+def save_model_and_data(model, model_name, train_data_scaled, scaler, metrics=None):
+    """Stores the trained model, its scaler and its (original-scale) training data as a new version in `models/` and `versionedMR/`."""
     # Inverse transform before saving
     train_data_original = scaler.inverse_transform(train_data_scaled["train_data"].values.reshape(-1, 1)).flatten()
-    train_df = pd.DataFrame({"train_data": train_data_original})
+    get_model_store().add_version(model_name, model, scaler, train_data_original, metrics=metrics)
 
-    train_df.to_csv(os.path.join(version_path, "data.csv"), index=False)
-
-    print(f"{model_name} saved at {version_path} and {model_path}")
+def test_metrics(predictions):
+    """Hold-out error in flow units, recorded in the version manifest."""
+    y_true = scaler.inverse_transform(y_test.reshape(-1, 1)).flatten()
+    y_pred = scaler.inverse_transform(np.reshape(predictions, (-1, 1))).flatten()
+    return {"test_mae": float(mean_absolute_error(y_true, y_pred))}
 
 # Load the dataset
 df = pd.read_csv("data/pems/flow_data_train.csv")
@@ -68,51 +42,33 @@ data_scaled = scaler.fit_transform(data.reshape(-1, 1)).flatten()
 split_idx = int(len(data) * 0.8)
 train_data, test_data = data_scaled[:split_idx], data_scaled[split_idx:]
 
-# Create time series sequences
-def create_sequences(data, seq_length=10):
-    X, y = [], []
-    for i in range(len(data) - seq_length):
-        X.append(data[i:i+seq_length])
-        y.append(data[i+seq_length])
-    return np.array(X), np.array(y)
-
 seq_length = 5
 X_train, y_train = create_sequences(train_data, seq_length)
 X_test, y_test = create_sequences(test_data, seq_length)
 
 # ---------------- LSTM Model ----------------
-class LSTMModel(nn.Module):
-    def __init__(self):
-        super(LSTMModel, self).__init__()
-        self.lstm = nn.LSTM(input_size=1, hidden_size=50, batch_first=True)
-        self.fc = nn.Linear(50, 1)
-
-    def forward(self, x):
-        _, (h_n, _) = self.lstm(x)
-        return self.fc(h_n[-1])
-
-X_train_tensor = torch.tensor(X_train, dtype=torch.float32).unsqueeze(-1)
-y_train_tensor = torch.tensor(y_train, dtype=torch.float32).unsqueeze(-1)
-
-lstm_model = LSTMModel()
-criterion = nn.MSELoss()
-optimizer = optim.Adam(lstm_model.parameters(), lr=0.001)
-train_loader = DataLoader(TensorDataset(X_train_tensor, y_train_tensor), batch_size=16, shuffle=True)
-
-# Train LSTM
+# Train LSTM (shared engine: shuffled index batches over pre-built tensors)
 print("Training LSTM model...")
 num_epochs = 50
-for epoch in tqdm(range(num_epochs), desc="LSTM Training Progress"):
-    for X_batch, y_batch in train_loader:
-        optimizer.zero_grad()
-        output = lstm_model(X_batch)
-        loss = criterion(output, y_batch)
-        loss.backward()
-        optimizer.step()
+with tqdm(total=num_epochs, desc="LSTM Training Progress") as progress:
+    lstm_model, history = train_lstm(LSTMModel(), X_train, y_train, epochs=num_epochs,
+                                     on_epoch=lambda epoch, train_loss, val_loss: progress.update(1))
+print(f"LSTM trained in {history['wall_time']:.1f} s ({history['samples_per_s']:,.0f} samples/s)")
 
 # Save LSTM model with versioning and in the original directory
 train_df = pd.DataFrame({"train_data": train_data})  # Convert training data to dataframe
-save_model_and_data(lstm_model, "lstm", train_df, scaler)
+with torch.inference_mode():
+    lstm_test = lstm_model(torch.tensor(np.ascontiguousarray(X_test), dtype=torch.float32).unsqueeze(-1)).numpy()
+save_model_and_data(lstm_model, "lstm", train_df, scaler, test_metrics(lstm_test))
+
+# ---------------- Quantized LSTM (int8 weights) ----------------
+print("Quantizing LSTM model...")
+lstm_q_model = quantize_lstm(lstm_model)
+with torch.inference_mode():
+    lstm_q_test = lstm_q_model(torch.tensor(np.ascontiguousarray(X_test), dtype=torch.float32).unsqueeze(-1)).numpy()
+lstm_q_metrics = test_metrics(lstm_q_test)
+print(f"LSTM-Q test MAE {lstm_q_metrics['test_mae']:.3f} (LSTM {test_metrics(lstm_test)['test_mae']:.3f})")
+save_model_and_data(lstm_q_model, "lstm-q", train_df, scaler, lstm_q_metrics)
 
 # ---------------- Linear Regression ----------------
 print("Training Linear Regression model...")
@@ -120,7 +76,7 @@ lr_model = Ridge(alpha=256)
 lr_model.fit(X_train, y_train)
 
 # Save Linear Regression model with versioning and in the original directory
-save_model_and_data(lr_model, "linear", train_df, scaler)
+save_model_and_data(lr_model, "linear", train_df, scaler, test_metrics(lr_model.predict(X_test)))
 
 # ---------------- Support Vector Machine (SVM) ----------------
 print("Training SVM model...")
@@ -128,4 +84,4 @@ svm_model = SVR(kernel="linear", C=0.05, tol=0.16)
 svm_model.fit(X_train, y_train)
 
 # Save SVM model with versioning and in the original directory
-save_model_and_data(svm_model, "svm", train_df, scaler)
+save_model_and_data(svm_model, "svm", train_df, scaler, test_metrics(svm_model.predict(X_test)))
@@ -0,0 +1,126 @@
+import os
+import copy
+import time
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+
+DEFAULT_EPOCHS = 50
+DEFAULT_BATCH_SIZE = 128
+DEFAULT_LR = 0.003      # Larger batches take fewer steps per epoch, so the base rate is higher than the old 0.001
+DEFAULT_THREADS = min(4, os.cpu_count() or 1)
+SCHEDULERS = (None, "cosine", "plateau")
+
+def set_thread_budget(threads=None):
+    """Pins torch's intra-op thread pool (small LSTMs gain nothing from every core). Returns the budget."""
+    threads = threads or DEFAULT_THREADS
+    torch.set_num_threads(threads)
+    return threads
+
+def to_tensors(X, y):
+    """Pre-builds contiguous (N, seq, 1) inputs and (N, 1) targets once, outside the epoch loop."""
+    X_tensor = torch.from_numpy(np.ascontiguousarray(X, dtype=np.float32)).unsqueeze(-1)
+    y_tensor = torch.from_numpy(np.ascontiguousarray(y, dtype=np.float32)).unsqueeze(-1)
+    return X_tensor, y_tensor
+
+def make_scheduler(name, optimizer, epochs):
+    if name is None:
+        return None
+    if name == "cosine":
+        return optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=epochs)
+    if name == "plateau":
+        return optim.lr_scheduler.ReduceLROnPlateau(optimizer, factor=0.5, patience=2)
+    raise ValueError(f"Unknown scheduler '{name}'. Expected one of {SCHEDULERS}.")
+
+def train_lstm(model, X_train, y_train, epochs=DEFAULT_EPOCHS, batch_size=DEFAULT_BATCH_SIZE, lr=DEFAULT_LR,
+               scheduler="cosine", clip_norm=None, X_val=None, y_val=None, patience=None,
+               threads=None, seed=None, on_epoch=None, keep_initial=False):
+    """Trains `model` on in-memory windows with shuffled index batches (no DataLoader).
+
+    Each epoch draws one permutation and slices pre-built tensors with it, so
+    the per-batch Python cost is a single `index_select`. Optional gradient
+    clipping (`clip_norm`) and learning-rate scheduling ("cosine" or
+    "plateau"). With a validation set and `patience`, training stops after
+    `patience` epochs without improvement and the best weights are restored.
+    With `keep_initial` (fine-tuning) the starting weights compete as well,
+    so the model is returned unchanged if no epoch beats its validation loss.
+    `on_epoch(epoch, train_loss, val_loss)` is called after every epoch.
+
+    Returns (model, history) where history holds "epochs", "train_loss",
+    "val_loss", "wall_time" and "samples_per_s".
+    """
+    set_thread_budget(threads)
+    generator = torch.Generator()
+    if seed is not None:
+        generator.manual_seed(seed)
+
+    X_tensor, y_tensor = to_tensors(X_train, y_train)
+    has_val = X_val is not None and len(X_val) > 0
+    if has_val:
+        X_val_tensor, y_val_tensor = to_tensors(X_val, y_val)
+
+    criterion = nn.MSELoss()
+    optimizer = optim.Adam(model.parameters(), lr=lr)
+    lr_scheduler = make_scheduler(scheduler, optimizer, epochs)
+
+    n_samples = len(X_tensor)
+    best_loss, best_state, stale = float("inf"), None, 0
+    if has_val and patience and keep_initial:
+        model.eval()
+        with torch.inference_mode():
+            best_loss = criterion(model(X_val_tensor), y_val_tensor).item()
+        best_state = copy.deepcopy(model.state_dict())
+    train_loss = val_loss = None
+    start_time = time.perf_counter()
+
+    for epoch in range(epochs):
+        model.train()
+        total_loss = torch.zeros(())
+        for batch in torch.randperm(n_samples, generator=generator).split(batch_size):
+            X_batch = X_tensor.index_select(0, batch)
+            y_batch = y_tensor.index_select(0, batch)
+            optimizer.zero_grad(set_to_none=True)
+            loss = criterion(model(X_batch), y_batch)
+            loss.backward()
+            if clip_norm:
+                nn.utils.clip_grad_norm_(model.parameters(), clip_norm)
+            optimizer.step()
+            total_loss += loss.detach() * len(batch)
+        train_loss = total_loss.item() / n_samples
+
+        if has_val:
+            model.eval()
+            with torch.inference_mode():
+                val_loss = criterion(model(X_val_tensor), y_val_tensor).item()
+
+        if isinstance(lr_scheduler, optim.lr_scheduler.ReduceLROnPlateau):
+            lr_scheduler.step(val_loss if has_val else train_loss)
+        elif lr_scheduler is not None:
+            lr_scheduler.step()
+
+        if on_epoch:
+            on_epoch(epoch, train_loss, val_loss)
+
+        if has_val and patience:
+            if val_loss < best_loss:
+                best_loss, best_state, stale = val_loss, copy.deepcopy(model.state_dict()), 0
+            else:
+                stale += 1
+                if stale >= patience:
+                    break
+
+    wall_time = time.perf_counter() - start_time
+    if best_state is not None:
+        model.load_state_dict(best_state)
+        val_loss = best_loss
+    model.eval()
+
+    epochs_run = epoch + 1 if epochs else 0
+    return model, {
+        "epochs": epochs_run,
+        "train_loss": train_loss,
+        "val_loss": val_loss,
+        "wall_time": wall_time,
+        "samples_per_s": n_samples * epochs_run / wall_time if wall_time else None
+    }